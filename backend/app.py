@@ -1,7 +1,20 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import (Flask, request, jsonify, send_from_directory, g, Response, has_request_context,
+                   abort, make_response)
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
+import functools
+import json
 import os
-from vm_core import VM, VMError
+import tempfile
+import time
+from vm_core import VMError
+from vm_sessions import SessionPool, SessionError, DEFAULT_SESSION
+from vm_jobs import JobManager
+import vm_profile
+import vm_objfile
+import vm_trace
+import vm_metrics
+from vm_stream import OutputStream
 
 HERE = os.path.dirname(os.path.abspath(__file__))
 FRONTEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "frontend"))
@@ -9,7 +22,164 @@ FRONTEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "fr
 app = Flask(__name__, static_folder=FRONTEND_DIR, static_url_path='')
 CORS(app)
 
-vm = VM()
+# uma VM por sessão (id emitido por /load); clientes sem id usam a sessão padrão
+sessions = SessionPool.from_env()
+
+# métricas (/metrics): observadas nas fronteiras das requisições e execuções
+metrics = vm_metrics.Registry()
+HTTP_REQUESTS = metrics.counter('mvd_http_requests_total', "Requisições HTTP",
+                                ('endpoint', 'method', 'status'))
+HTTP_SECONDS = metrics.histogram('mvd_http_request_seconds', "Latência das requisições HTTP",
+                                 ('endpoint',))
+JSON_SECONDS = metrics.histogram('mvd_json_serialize_seconds',
+                                 "Tempo de serialização das respostas JSON (snapshots, deltas...)",
+                                 ('endpoint',))
+RESPONSE_BYTES = metrics.histogram('mvd_response_bytes', "Tamanho das respostas", ('endpoint',),
+                                   vm_metrics.BYTES_BUCKETS)
+RUN_SECONDS = metrics.histogram('mvd_run_seconds', "Duração das execuções (/run, jobs, /stream)",
+                                ('mode', 'status'))
+RUN_RATE = metrics.histogram('mvd_run_instructions_per_second', "Instruções por segundo de cada execução",
+                             ('mode',), vm_metrics.RATE_BUCKETS)
+LOAD_SECONDS = metrics.histogram('mvd_load_seconds', "Tempo de carga (montagem ou arquivo objeto)",
+                                 ('kind',))
+PROGRAM_SIZE = metrics.histogram('mvd_program_instructions', "Tamanho dos programas carregados",
+                                 (), vm_metrics.SIZE_BUCKETS)
+VM_INSTRUCTIONS = metrics.counter('mvd_vm_instructions_total', "Instruções executadas pelas VMs")
+VM_SECONDS = metrics.counter('mvd_vm_execution_seconds_total', "Tempo das VMs executando instruções")
+SESSIONS_ACTIVE = metrics.gauge('mvd_sessions_active', "Sessões ativas")
+SESSIONS_BUSY = metrics.gauge('mvd_sessions_busy', "Sessões com execução em segundo plano")
+MEMORY_CELLS = metrics.gauge('mvd_vm_memory_cells', "Células de memória em uso (soma das VMs)")
+MEMORY_CELLS_MAX = metrics.gauge('mvd_vm_memory_cells_max', "Maior memória entre as VMs (células)")
+CACHE_LOOKUPS = metrics.counter('mvd_program_cache_lookups_total', "Consultas ao cache de programas",
+                                ('result',))
+CACHE_ENTRIES = metrics.gauge('mvd_program_cache_entries', "Programas no cache em memória")
+
+
+@metrics.collector
+def collect_sessions():
+    stats = sessions.stats()
+    SESSIONS_ACTIVE.set(stats['active'])
+    SESSIONS_BUSY.set(stats['busy'])
+    VM_INSTRUCTIONS.set(stats['executed'])
+    VM_SECONDS.set(round(stats['exec_seconds'], 6))
+    MEMORY_CELLS.set(stats['memory_cells'])
+    MEMORY_CELLS_MAX.set(stats['max_memory_cells'])
+    cache = sessions.program_cache
+    if cache is not None:
+        stats = cache.stats()
+        for result in ('hits', 'disk_hits', 'misses'):
+            CACHE_LOOKUPS.set(stats[result], result)
+        CACHE_ENTRIES.set(stats['entries'])
+
+
+def observe_run(mode, status, seconds, steps):
+    RUN_SECONDS.observe(seconds, mode, status)
+    if seconds > 0 and steps:
+        RUN_RATE.observe(steps / seconds, mode)
+
+
+def run_status(status, halted, last_error):
+    # rótulo "status" das métricas: erro com a VM esperando input (last_error
+    # sem halted, como em enqueue_input) vira "input"
+    return 'input' if status == 'error' and last_error and not halted else status
+
+
+def observe_job(job):
+    observe_run('async', run_status(job.status, job.snapshot['halted'], job.snapshot['last_error']),
+                job.finished - job.started, job.steps)
+
+
+def observe_load(kind, seconds, vm):
+    LOAD_SECONDS.observe(seconds, kind)
+    PROGRAM_SIZE.observe(len(vm.code))
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    # mede a serialização de cada resposta JSON, por endpoint
+    def dumps(self, obj, **kwargs):
+        start = time.perf_counter()
+        text = super().dumps(obj, **kwargs)
+        if has_request_context():
+            JSON_SECONDS.observe(time.perf_counter() - start, request.endpoint or '')
+        return text
+
+
+app.json = TimedJSONProvider(app)
+
+# /run assíncrono: jobs num pool de threads, com progresso e cancelamento
+jobs = JobManager(max_workers=int(os.environ.get('MVD_RUN_WORKERS', 4)),
+                  on_finish=observe_job)
+
+# maior "count" aceito por /step em lote
+MAX_BATCH_STEPS = 10000
+# maior arquivo objeto aceito por /load_object (bytes, comprimido)
+MAX_OBJECT_BYTES = int(os.environ.get('MVD_MAX_OBJECT_BYTES', 4 * 1024 * 1024))
+# limites de /run e /stream: o cliente escolhe valores menores, nunca maiores
+MAX_RUN_STEPS = int(os.environ.get('MVD_MAX_RUN_STEPS', 10 ** 9))
+MAX_RUN_TIMEOUT = float(os.environ.get('MVD_MAX_RUN_TIMEOUT', 300))
+DEFAULT_RUN_TIMEOUT = 30
+# passos gravados por trace de /trace: depois disso a gravação para (o
+# arquivo fica no diretório temporário até a sessão ser descartada)
+MAX_TRACE_STEPS = int(os.environ.get('MVD_MAX_TRACE_STEPS', 10 ** 7))
+
+
+def session_id():
+    # id da sessão: header X-Session-Id, ?session=... ou campo "session" do JSON
+    sid = request.headers.get('X-Session-Id') or request.args.get('session')
+    if not sid:
+        data = request.get_json(silent=True) or {}
+        sid = data.get('session')
+    return sid or DEFAULT_SESSION
+
+
+def with_session(view):
+    # injeta a VM da sessão e serializa as requisições da mesma sessão
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        try:
+            session = sessions.get(session_id())
+        except SessionError as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 404
+        with session.lock:
+            g.session = session
+            return view(session.vm, *args, **kwargs)
+    return wrapper
+
+
+def busy_response(session):
+    # a VM da sessão está sendo executada por um job assíncrono
+    return jsonify({'status': 'error', 'message': 'Execução em andamento',
+                    'job': session.job.id}), 409
+
+
+def load_session():
+    # /load e /upload_program: reaproveita a sessão informada ou cria uma nova
+    sid = session_id()
+    if sid != DEFAULT_SESSION:
+        try:
+            return sessions.get(sid)
+        except SessionError:
+            pass
+    return sessions.create()
+
+@app.before_request
+def start_timer():
+    g.started = time.perf_counter()
+
+@app.after_request
+def observe_request(response):
+    endpoint = request.endpoint or ''
+    HTTP_REQUESTS.inc(1, endpoint, request.method, response.status_code)
+    if 'started' in g:
+        HTTP_SECONDS.observe(time.perf_counter() - g.started, endpoint)
+    if response.content_length is not None:
+        RESPONSE_BYTES.observe(response.content_length, endpoint)
+    return response
+
+@app.get('/metrics')
+def metrics_text():
+    # formato texto do Prometheus
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/')
 def index():
@@ -24,8 +194,14 @@ def upload_program():
     try:
         data = request.get_json()
         program = data.get("program", "")
-        vm.load_program(program)
-        return jsonify({"status": "ok"})
+        session = load_session()
+        with session.lock:
+            if session.busy:
+                return busy_response(session)
+            start = time.perf_counter()
+            session.vm.load_program(program)
+            observe_load('asm', time.perf_counter() - start, session.vm)
+        return jsonify({"status": "ok", "session": session.id})
     except Exception as e:
         return jsonify({"status": "error", "error": str(e)})
 
@@ -33,54 +209,448 @@ def upload_program():
 def load_program():
     data = request.get_json(silent=True) or {}
     asm = data.get('asm', '')
+    session = load_session()
+    if session.busy:
+        return busy_response(session)
     try:
-        vm.load_program(asm)
-        return jsonify({'status': 'ok', 'prog_len': len(vm.P)})
+        with session.lock:
+            vm = session.vm
+            if 'memory' in data:
+                vm.set_memory_model(data['memory'])
+            if 'compiled' in data:
+                vm.compiled = bool(data['compiled'])
+            if 'optimize' in data:
+                vm.optimize = bool(data['optimize'])
+            if 'history' in data:
+                if data['history']:
+                    vm.enable_history()
+                else:
+                    vm.disable_history()
+            start = time.perf_counter()
+            vm.load_program(asm)
+            observe_load('asm', time.perf_counter() - start, vm)
+            if 'input' in data:
+                # fluxo de input já na carga (lista ou texto separado por espaços)
+                vm.enqueue_inputs(data['input'])
+            payload = {'status': 'ok', 'prog_len': len(vm.P), 'session': session.id}
+            if data.get('verify'):
+                payload['diagnostics'] = vm.analyze()['diagnostics']
+            return jsonify(payload)
     except VMError as e:
-        return jsonify({'status': 'error', 'message': str(e)}), 400
+        return jsonify({'status': 'error', 'message': str(e), 'session': session.id}), 400
     except Exception as e:
-        return jsonify({'status': 'error', 'message': str(e)}), 500
+        return jsonify({'status': 'error', 'message': str(e), 'session': session.id}), 500
+
+@app.post('/load_object')
+def load_object():
+    # corpo = arquivo objeto (.mvdo) gerado por GET /object ou vm_objfile.py;
+    # instala o programa sem passar pelo montador
+    if (request.content_length or 0) > MAX_OBJECT_BYTES:
+        return jsonify({'status': 'error', 'message': 'Arquivo objeto grande demais'}), 413
+    # lido com limite: o corpo pode vir sem Content-Length (chunked)
+    data = request.stream.read(MAX_OBJECT_BYTES + 1)
+    if len(data) > MAX_OBJECT_BYTES:
+        return jsonify({'status': 'error', 'message': 'Arquivo objeto grande demais'}), 413
+    session = load_session()
+    if session.busy:
+        return busy_response(session)
+    try:
+        start = time.perf_counter()
+        program = vm_objfile.loads(data)
+        with session.lock:
+            vm = session.vm
+            vm.load_assembled(program)
+            observe_load('object', time.perf_counter() - start, vm)
+            return jsonify({'status': 'ok', 'prog_len': len(vm.P), 'session': session.id})
+    except VMError as e:
+        return jsonify({'status': 'error', 'message': str(e), 'session': session.id}), 400
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e), 'session': session.id}), 500
+
+@app.get('/object')
+@with_session
+def download_object(vm):
+    # programa carregado na sessão como arquivo objeto
+    program = vm_objfile.Program(vm.P, vm.labels, vm.code)
+    return Response(vm_objfile.dumps(program), mimetype='application/octet-stream',
+                    headers={'Content-Disposition': 'attachment; filename=programa.mvdo'})
+
+def limit_param(params):
+    # "limit" de /run e /stream, limitado a MAX_RUN_STEPS; ValueError se inválido
+    limit = int(params.get('limit', 1000000))
+    if limit < 0:
+        raise ValueError(limit)
+    return min(limit, MAX_RUN_STEPS)
+
+def timeout_param(params):
+    # "timeout" do /run assíncrono: segundos > 0, no máximo MAX_RUN_TIMEOUT
+    # (não há como desligar o tempo limite); ValueError se inválido
+    timeout = params.get('timeout', DEFAULT_RUN_TIMEOUT)
+    if isinstance(timeout, bool):
+        raise ValueError(timeout)
+    timeout = float(timeout)
+    if not timeout > 0:
+        raise ValueError(timeout)
+    return min(timeout, MAX_RUN_TIMEOUT)
+
+def since_param():
+    # versão já conhecida pelo cliente (?since=N ou campo "since" do JSON)
+    since = request.args.get('since')
+    if since is None:
+        since = (request.get_json(silent=True) or {}).get('since')
+    if since is None:
+        return None
+    try:
+        return int(since)
+    except (TypeError, ValueError):
+        # interrompe a rota com 400, como as outras validações de parâmetros
+        abort(make_response(jsonify({'status': 'error', 'message': 'Parâmetro since inválido'}), 400))
+
+def state_payload(vm, since):
+    # snapshot completo ou, se o cliente informou uma versão, só o delta
+    if since is None:
+        return {'snapshot': vm.snapshot()}
+    vm.enable_change_tracking()
+    return {'delta': vm.delta(since)}
 
 @app.get('/state')
-def state():
+@with_session
+def state(vm):
+    since = since_param()
+    if since is not None:
+        vm.enable_change_tracking()
+        return jsonify(vm.delta(since))
     return jsonify(vm.snapshot())
 
 @app.post('/step')
-def step():
+@with_session
+def step(vm):
+    if g.session.busy:
+        return busy_response(g.session)
+    since = since_param()
     if vm.halted:
-        return jsonify({'status': 'halted', 'snapshot': vm.snapshot()})
+        return jsonify({'status': 'halted', **state_payload(vm, since)})
+    body = request.get_json(silent=True) or {}
+    if 'count' in body:
+        return step_batch(vm, body, since)
     try:
         vm.step()
-        return jsonify({'status': 'ok', 'snapshot': vm.snapshot()})
+        return jsonify({'status': 'ok', **state_payload(vm, since)})
     except VMError as e:
-        return jsonify({'status': 'error', 'message': str(e), 'snapshot': vm.snapshot()}), 200
+        return jsonify({'status': 'error', 'message': str(e), **state_payload(vm, since)}), 200
+
+def step_batch(vm, body, since):
+    # /step com "count": vários passos numa chamada, com trace compacto
+    try:
+        count = max(1, min(int(body['count']), MAX_BATCH_STEPS))
+        breakpoints = [vm.address_of(t) for t in body.get('breakpoints', [])]
+        pc_range = body.get('pc_range')
+        watch = body.get('watch')
+        trace, reason = vm.step_many(
+            count,
+            breakpoints=breakpoints,
+            pc_range=[vm.address_of(t) for t in pc_range] if pc_range else None,
+            watch=int(watch) if watch is not None else None,
+            stop_on_output=bool(body.get('stop_on_output')),
+        )
+    except (VMError, ValueError, TypeError) as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    resp = {'status': 'ok', 'stop': reason, 'trace': trace, **state_payload(vm, since)}
+    if reason == 'error':
+        resp.update(status='error', message=vm.last_error)
+    elif reason == 'halted':
+        resp['status'] = 'halted'
+    return jsonify(resp)
+
+@app.post('/step_back')
+@with_session
+def step_back(vm):
+    # desfaz instruções ({"count": n}, padrão 1) usando o histórico de execução
+    if g.session.busy:
+        return busy_response(g.session)
+    since = since_param()
+    body = request.get_json(silent=True) or {}
+    try:
+        step = vm.step_back(int(body.get('count', 1)))
+    except (VMError, ValueError, TypeError) as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    return jsonify({'status': 'ok', 'step': step, **state_payload(vm, since)})
+
+@app.post('/goto')
+@with_session
+def goto(vm):
+    # vai ao estado depois de N instruções: ?step=N ou {"step": N}
+    if g.session.busy:
+        return busy_response(g.session)
+    since = since_param()
+    target = request.args.get('step')
+    if target is None:
+        target = (request.get_json(silent=True) or {}).get('step')
+    try:
+        step = vm.goto(int(target))
+    except (ValueError, TypeError):
+        return jsonify({'status': 'error', 'message': 'Passo inválido'}), 400
+    except VMError as e:
+        if vm.history is None:
+            return jsonify({'status': 'error', 'message': str(e)}), 400
+        # erro da VM ao avançar: mesmo formato de /step
+        return jsonify({'status': 'error', 'message': str(e), 'step': vm.history.steps,
+                        **state_payload(vm, since)})
+    return jsonify({'status': 'ok', 'step': step, **state_payload(vm, since)})
+
+@app.get('/history')
+@with_session
+def history(vm):
+    if vm.history is None:
+        return jsonify({'enabled': False})
+    return jsonify({'enabled': True, **vm.history.stats()})
+
+@app.get('/analyze')
+@with_session
+def analyze(vm):
+    # verificador estático: profundidade da pilha por instrução, diagnósticos
+    # (underflow, código inalcançável, ALLOC/DALLOC) e instruções seguras
+    return jsonify(vm.analyze())
 
 @app.post('/run')
-def run():
+@with_session
+def run(vm):
+    if g.session.busy:
+        return busy_response(g.session)
     if vm.halted:
         return jsonify({'status': 'halted', 'snapshot': vm.snapshot()})
     body = request.get_json(silent=True) or {}
-    limit = int(body.get('limit', 1000000))
+    try:
+        limit = limit_param(body)
+        timeout = timeout_param(body) if body.get('async') else None
+    except (TypeError, ValueError):
+        return jsonify({'status': 'error', 'message': 'Parâmetro inválido'}), 400
+    if 'input' in body:
+        try:
+            vm.enqueue_inputs(body['input'])
+        except VMError as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 400
+    if body.get('async'):
+        # roda em segundo plano; o cliente acompanha por /jobs/<id>
+        job = jobs.submit(g.session, step_limit=limit, timeout=timeout)
+        return jsonify({'status': 'started', 'job': job.id}), 202
+    start = time.perf_counter()
+    executed = vm.executed
     try:
         vm.run(step_limit=limit)
-        return jsonify({'status': 'ok', 'snapshot': vm.snapshot()})
     except VMError as e:
+        observe_run('sync', run_status('error', vm.halted, vm.last_error), time.perf_counter() - start,
+                    vm.executed - executed)
         return jsonify({'status': 'error', 'message': str(e), 'snapshot': vm.snapshot()}), 200
+    observe_run('sync', vm.stop_reason or 'ok', time.perf_counter() - start, vm.executed - executed)
+    if vm.stop_reason:
+        # parou num breakpoint/watchpoint
+        return jsonify({'status': 'ok', 'stop': vm.stop_reason,
+                        'stop_info': vm.stop_info, 'snapshot': vm.snapshot()})
+    return jsonify({'status': 'ok', 'snapshot': vm.snapshot()})
+
+@app.route('/stream', methods=['GET', 'POST'])
+@with_session
+def stream(vm):
+    # executa a VM enviando eventos (SSE) à medida que acontecem: saída nova,
+    # espera por input, parada e o estado final; ?limit=N, ?offset=N (saída já recebida)
+    if g.session.busy:
+        return busy_response(g.session)
+    params = {**(request.get_json(silent=True) or {}), **request.args.to_dict()}
+    try:
+        limit = limit_param(params)
+        offset = int(params.get('offset', 0))
+    except (TypeError, ValueError):
+        return jsonify({'status': 'error', 'message': 'Parâmetro inválido'}), 400
+    run = OutputStream(g.session, limit, offset)
+
+    def sse():
+        start = time.perf_counter()
+        status = 'cancelled'    # cliente desconectou antes do evento final
+        try:
+            yield f"event: start\ndata: {json.dumps({'stream': run.id, 'pc': vm.pc})}\n\n"
+            for event, data in run.events():
+                if event not in ('output', 'progress', 'waiting', 'keepalive'):
+                    status = event
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        finally:
+            observe_run('stream', status, time.perf_counter() - start, run.steps)
+
+    response = Response(sse(), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    response.call_on_close(run.close)
+    return response
+
+@app.post('/stream/cancel')
+@with_session
+def stream_cancel(vm):
+    run = g.session.job
+    if isinstance(run, OutputStream) and run.running:
+        run.cancel()
+    return jsonify({'status': 'ok'})
 
 @app.post('/reset')
-def reset():
+@with_session
+def reset(vm):
+    if g.session.busy:
+        return busy_response(g.session)
     vm.reset()
     return jsonify({'status': 'ok', 'snapshot': vm.snapshot()})
 
 @app.post('/input')
-def input_value():
-    data = request.get_json(silent=True) or {}
+@with_session
+def input_value(vm):
+    # {"value": v} enfileira um valor; {"values": [...]} ou {"values": "1 2 3"}
+    # (ou um corpo text/plain) enfileira vários de uma vez
+    data = request.get_json(silent=True)
     try:
-        v = int(data.get('value'))
-        vm.enqueue_input(v)
-        return jsonify({'status': 'ok', 'input_queue': vm.input_queue})
-    except Exception:
+        if data is None:
+            vm.enqueue_inputs(request.get_data(as_text=True))
+        elif 'values' in data:
+            vm.enqueue_inputs(data['values'])
+        else:
+            vm.enqueue_input(int(data.get('value')))
+    except (VMError, TypeError, ValueError):
         return jsonify({'status': 'error', 'message': 'Valor inválido'}), 400
+    g.session.input_ready.set()
+    return jsonify({'status': 'ok', 'queued': len(vm.input_queue),
+                    'input_queue': list(vm.input_queue)})
+
+@app.get('/breakpoints')
+@with_session
+def list_breakpoints(vm):
+    return jsonify({
+        'breakpoints': [{'addr': addr, 'condition': cond}
+                        for addr, (cond, _) in sorted(vm.breakpoints.items())],
+        'watchpoints': [{'addr': addr, 'value': value}
+                        for addr, value in sorted(vm.watchpoints.items())],
+    })
+
+@app.post('/breakpoints')
+@with_session
+def add_breakpoint(vm):
+    # {"target": endereço ou rótulo, "condition": "M[3] == 10"} (condição opcional)
+    data = request.get_json(silent=True) or {}
+    try:
+        addr = vm.set_breakpoint(data.get('target'), data.get('condition'))
+    except (VMError, ValueError, TypeError) as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    return jsonify({'status': 'ok', 'addr': addr})
+
+@app.delete('/breakpoints')
+@with_session
+def remove_breakpoint(vm):
+    # ?target=... remove um breakpoint; sem target remove todos
+    target = request.args.get('target')
+    if target is not None and target.lstrip('-').isdigit() and target not in vm.labels:
+        target = int(target)
+    try:
+        vm.clear_breakpoint(target)
+    except VMError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    return jsonify({'status': 'ok'})
+
+@app.post('/watchpoints')
+@with_session
+def add_watchpoint(vm):
+    # {"addr": 5} para em qualquer mudança; {"addr": 5, "value": 0} quando M[5] virar 0
+    data = request.get_json(silent=True) or {}
+    try:
+        vm.set_watchpoint(data['addr'], data.get('value'))
+    except (KeyError, ValueError, TypeError):
+        return jsonify({'status': 'error', 'message': 'Endereço inválido'}), 400
+    return jsonify({'status': 'ok'})
+
+@app.delete('/watchpoints')
+@with_session
+def remove_watchpoint(vm):
+    addr = request.args.get('addr')
+    try:
+        vm.clear_watchpoint(None if addr is None else int(addr))
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'Endereço inválido'}), 400
+    return jsonify({'status': 'ok'})
+
+@app.get('/profile')
+@with_session
+def profile(vm):
+    # relatório do profiler; ?format=text devolve a listagem anotada
+    profiler = vm_profile.profiler_of(vm)
+    if profiler is None:
+        return jsonify({'enabled': False})
+    if request.args.get('format') == 'text':
+        return Response(profiler.listing(), mimetype='text/plain')
+    try:
+        top = int(request.args.get('top', 20))
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'Parâmetro inválido'}), 400
+    return jsonify({'enabled': True, **profiler.report(top), 'listing': profiler.listing()})
+
+@app.post('/profile')
+@with_session
+def set_profile(vm):
+    # {"enabled": true} liga o profiler (execução instrumentada), false desliga
+    data = request.get_json(silent=True) or {}
+    if data.get('enabled', True):
+        vm_profile.enable(vm)
+    else:
+        vm_profile.disable(vm)
+    return jsonify({'status': 'ok', 'enabled': vm_profile.profiler_of(vm) is not None})
+
+def trace_path(session):
+    # um arquivo de trace por sessão, no diretório temporário
+    return os.path.join(tempfile.gettempdir(), f"mvd-trace-{session.id}{vm_trace.EXTENSION}")
+
+@app.post('/trace')
+@with_session
+def set_trace(vm):
+    # {"enabled": true} grava cada instrução executada num trace (vm_trace);
+    # false encerra a gravação e deixa o arquivo pronto para GET /trace;
+    # grava no máximo MAX_TRACE_STEPS passos
+    if g.session.busy:
+        return busy_response(g.session)
+    data = request.get_json(silent=True) or {}
+    if data.get('enabled', True):
+        g.session.trace_path = trace_path(g.session)
+        vm_trace.enable(vm, g.session.trace_path, max_steps=MAX_TRACE_STEPS)
+    else:
+        vm_trace.disable(vm)
+    return jsonify({'status': 'ok', 'enabled': vm_trace.recorder_of(vm) is not None})
+
+@app.get('/trace')
+@with_session
+def download_trace(vm):
+    path = trace_path(g.session)
+    if vm_trace.recorder_of(vm) is not None:
+        return jsonify({'status': 'error', 'message': 'Gravação em andamento: desligue o trace antes'}), 409
+    if not os.path.exists(path):
+        return jsonify({'status': 'error', 'message': 'Nenhum trace gravado'}), 404
+    return send_from_directory(os.path.dirname(path), os.path.basename(path), as_attachment=True,
+                               download_name='execucao' + vm_trace.EXTENSION)
+
+@app.get('/jobs/<job_id>')
+def job_progress(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'status': 'error', 'message': 'Job não encontrado'}), 404
+    try:
+        since = int(request.args.get('since', 0))
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'Parâmetro inválido'}), 400
+    return jsonify(job.progress(since=since))
+
+@app.post('/jobs/<job_id>/cancel')
+def job_cancel(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'status': 'error', 'message': 'Job não encontrado'}), 404
+    job.cancel()
+    return jsonify({'status': 'ok', 'job': job.id})
+
+@app.post('/close')
+def close_session():
+    sessions.remove(session_id())
+    return jsonify({'status': 'ok'})
 
 @app.get('/examples')
 def examples():
@@ -89,4 +659,4 @@ def examples():
     })
 
 if __name__ == '__main__':
-    app.run(port=5000, debug=True)
+    app.run(port=5000, debug=True, threaded=True)
@@ -0,0 +1,7 @@
+# backend/bench
+# Micro-benchmarks e suíte de regressão do interpretador da MVD.
+#
+# Uso (a partir de backend/):
+#   python -m bench                       # roda o corpus e mostra a tabela
+#   python -m bench --save base.json      # grava a linha de base
+#   python -m bench --compare base.json   # compara e falha se houver regressão
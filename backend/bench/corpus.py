@@ -0,0 +1,211 @@
+# backend/bench/corpus.py
+# Corpus de programas MVD para os benchmarks
+#
+# Cada entrada é Program(nome, asm, inputs, descrição). Os programas seguem o
+# formato gerado pelo compilador da disciplina: START/HLT, variáveis globais
+# alocadas com ALLOC/DALLOC, rótulos "Ln NULL" e procedimentos via CALL/RETURN.
+
+from collections import namedtuple
+
+Program = namedtuple('Program', 'name asm inputs description')
+
+
+def loop_sum(n=50000):
+    # soma = 0; i = 0; enquanto i < n: soma := soma + i; i := i + 1
+    return Program('loop_sum', f"""START
+ALLOC 0 2
+LDC 0
+STR 0
+LDC 0
+STR 1
+L1 NULL
+LDV 1
+LDC {n}
+CME
+JMPF L2
+LDV 0
+LDV 1
+ADD
+STR 0
+LDV 1
+LDC 1
+ADD
+STR 1
+JMP L1
+L2 NULL
+LDV 0
+PRN
+DALLOC 0 2
+HLT""", [], f"laço aritmético apertado ({n} iterações)")
+
+
+def fib_rec(n=18):
+    # procedimento recursivo com variável local salva por ALLOC/DALLOC
+    return Program('fib_rec', f"""START
+ALLOC 0 2
+LDC {n}
+STR 0
+CALL L1
+LDV 1
+PRN
+DALLOC 0 2
+HLT
+L1 NULL
+ALLOC 2 1
+LDV 0
+STR 2
+LDV 2
+LDC 2
+CME
+JMPF L2
+LDV 2
+STR 1
+JMP L3
+L2 NULL
+LDV 2
+LDC 1
+SUB
+STR 0
+CALL L1
+LDV 1
+LDV 2
+LDC 2
+SUB
+STR 0
+CALL L1
+LDV 1
+ADD
+STR 1
+L3 NULL
+DALLOC 2 1
+RETURN""", [], f"fibonacci recursivo (n={n}) com CALL/RETURN e ALLOC/DALLOC")
+
+
+def fact_rec(n=200, reps=20):
+    # fatorial recursivo: inteiros grandes e quadros de ativação profundos
+    return Program('fact_rec', f"""START
+ALLOC 0 3
+LDC {reps}
+STR 2
+L1 NULL
+LDV 2
+LDC 0
+CMA
+JMPF L2
+LDC {n}
+STR 0
+CALL L3
+LDV 2
+LDC 1
+SUB
+STR 2
+JMP L1
+L2 NULL
+LDV 1
+PRN
+DALLOC 0 3
+HLT
+L3 NULL
+ALLOC 3 1
+LDV 0
+STR 3
+LDV 3
+LDC 1
+CMEQ
+JMPF L4
+LDC 1
+STR 1
+JMP L5
+L4 NULL
+LDV 3
+LDC 1
+SUB
+STR 0
+CALL L3
+LDV 1
+LDV 3
+MULT
+STR 1
+L5 NULL
+DALLOC 3 1
+RETURN""", [], f"fatorial recursivo de {n}, {reps} vezes (inteiros grandes)")
+
+
+def prn_heavy(n=20000):
+    # imprime 0..n-1
+    return Program('prn_heavy', f"""START
+ALLOC 0 1
+LDC 0
+STR 0
+L1 NULL
+LDV 0
+LDC {n}
+CME
+JMPF L2
+LDV 0
+PRN
+LDV 0
+LDC 1
+ADD
+STR 0
+JMP L1
+L2 NULL
+DALLOC 0 1
+HLT""", [], f"saída intensa ({n} PRN)")
+
+
+def rd_sum(n=20000):
+    # lê n valores com RD e imprime a soma
+    return Program('rd_sum', f"""START
+ALLOC 0 2
+LDC 0
+STR 0
+LDC {n}
+STR 1
+L1 NULL
+LDV 1
+LDC 0
+CMA
+JMPF L2
+LDV 0
+RD
+ADD
+STR 0
+LDV 1
+LDC 1
+SUB
+STR 1
+JMP L1
+L2 NULL
+LDV 0
+PRN
+DALLOC 0 2
+HLT""", list(range(n)), f"entrada intensa ({n} RD)")
+
+
+def large_generated(blocks=2000):
+    # programa grande gerado: muitos rótulos e blocos retos (estressa o montador)
+    lines = ["START", "ALLOC 0 4"]
+    for b in range(blocks):
+        lines += [
+            f"L{b} NULL",
+            f"LDV {b % 4}",
+            f"LDC {b}",
+            "ADD",
+            f"STR {b % 4}",
+            f"LDV {(b + 1) % 4}",
+            "LDC 1",
+            "CMA",
+            f"JMPF L{b + 1}",
+            f"LDV {(b + 2) % 4}",
+            "LDC 3",
+            "MULT",
+            f"STR {(b + 2) % 4}",
+        ]
+    lines += [f"L{blocks} NULL", "LDV 0", "PRN", "DALLOC 0 4", "HLT"]
+    return Program('large_generated', "\n".join(lines), [],
+                   f"programa gerado com {len(lines)} linhas e {blocks + 1} rótulos")
+
+
+def corpus():
+    return [loop_sum(), fib_rec(), fact_rec(), prn_heavy(), rd_sum(), large_generated()]
@@ -0,0 +1,213 @@
+# backend/bench/runner.py
+# Executor dos benchmarks da MVD
+#
+# Para cada programa do corpus mede:
+#  - load:  tempo de VM.load_program e pico de memória alocada (tracemalloc)
+#  - cached load / object load: VM.load_program com o programa já no cache
+#    (vm_objfile.ProgramCache) e leitura do arquivo objeto (vm_objfile.loads)
+#  - step:  instruções/s executando com VM.step() (caminho do depurador)
+#  - run:   instruções/s de VM.run() e pico de memória da execução
+#  - optimized / compiled: instruções/s de VM.run() com o otimizador
+#    (vm.optimize) e com o nível compilado (vm.compiled)
+# Tempos são o melhor de --repeat repetições. Com --compare, métricas que
+# pioram mais que --tolerance em relação à linha de base são regressões.
+
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+
+from vm_core import VM, VMError
+import vm_objfile
+
+from bench.corpus import corpus
+
+FORMAT_VERSION = 1
+STEP_SAMPLE = 20000     # passos medidos no modo step (o resto é irrelevante)
+STEP_LIMIT = 50000000
+LOAD_NOISE_S = 0.0005   # diferenças de carga abaixo disso são ruído de medição
+
+# métricas comparadas com a linha de base: nome -> True se "maior é melhor"
+METRICS = {
+    'load_s': False,
+    'cached_load_s': False,
+    'object_load_s': False,
+    'step_ips': True,
+    'run_ips': True,
+    'optimized_ips': True,
+    'compiled_ips': True,
+}
+
+
+def _fresh_vm(prog, compiled=False, optimize=False):
+    vm = VM()
+    vm.compiled = compiled
+    vm.optimize = optimize
+    vm.load_program(prog.asm)
+    vm.enqueue_inputs(prog.inputs)
+    return vm
+
+
+def _best(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def _peak(fn):
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench_program(prog, repeat=3):
+    vm = VM()
+    load_s = _best(lambda: vm.load_program(prog.asm), repeat)
+    load_peak = _peak(lambda: VM().load_program(prog.asm))
+    cached_vm = VM()
+    cached_vm.program_cache = vm_objfile.ProgramCache()
+    cached_vm.load_program(prog.asm)
+    cached_load_s = _best(lambda: cached_vm.load_program(prog.asm), repeat)
+    obj = vm_objfile.dumps(VM.assemble(prog.asm))
+    object_load_s = _best(lambda: VM().load_assembled(vm_objfile.loads(obj)), repeat)
+
+    # quantidade de instruções executadas (determinística)
+    instructions = _fresh_vm(prog).execute(STEP_LIMIT)
+
+    # step(): amostra dos primeiros STEP_SAMPLE passos
+    def stepping():
+        v = _fresh_vm(prog)
+        for _ in range(min(STEP_SAMPLE, instructions)):
+            v.step()
+    step_s = _best(stepping, repeat)
+
+    # run(): programa inteiro (carga fora da medição); o nível compilado é
+    # medido com os blocos já em cache (compilados na primeira execução)
+    def timed_run(compiled=False, optimize=False):
+        best = None
+        for _ in range(repeat):
+            run_vm = _fresh_vm(prog, compiled, optimize)
+            t0 = time.perf_counter()
+            run_vm.run(step_limit=STEP_LIMIT)
+            elapsed = time.perf_counter() - t0
+            best = elapsed if best is None else min(best, elapsed)
+        return best, run_vm.output
+
+    run_s, output = timed_run()
+    optimized_s, optimized_output = timed_run(optimize=True)
+    _fresh_vm(prog, compiled=True).run(step_limit=STEP_LIMIT)
+    compiled_s, compiled_output = timed_run(compiled=True)
+    if optimized_output != output or compiled_output != output:
+        raise VMError("saída do código otimizado/compilado difere do interpretador")
+
+    run_vm = _fresh_vm(prog)
+    run_peak = _peak(lambda: run_vm.run(step_limit=STEP_LIMIT))
+
+    return {
+        'lines': len(vm.P),
+        'instructions': instructions,
+        'load_s': load_s,
+        'load_peak_kb': load_peak / 1024,
+        'cached_load_s': cached_load_s,
+        'object_load_s': object_load_s,
+        'object_kb': len(obj) / 1024,
+        'step_ips': min(STEP_SAMPLE, instructions) / step_s if step_s else 0.0,
+        'run_s': run_s,
+        'run_ips': instructions / run_s if run_s else 0.0,
+        'run_peak_kb': run_peak / 1024,
+        'optimized_ips': instructions / optimized_s if optimized_s else 0.0,
+        'compiled_ips': instructions / compiled_s if compiled_s else 0.0,
+        'output_tail': output[-1:] if output else [],
+    }
+
+
+def run_all(names=None, repeat=3):
+    results = {}
+    for prog in corpus():
+        if names and prog.name not in names:
+            continue
+        try:
+            results[prog.name] = bench_program(prog, repeat)
+        except VMError as e:
+            results[prog.name] = {'error': str(e)}
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Lista de regressões (programa, métrica, base, atual, variação)."""
+    regressions = []
+    for name, cur in results.items():
+        base = baseline.get(name)
+        if not base or 'error' in cur or 'error' in base:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            b, c = base.get(metric), cur.get(metric)
+            if not b or c is None:
+                continue
+            change = (c - b) / b
+            if not higher_is_better and c - b < LOAD_NOISE_S:
+                continue
+            if (higher_is_better and change < -tolerance) or (not higher_is_better and change > tolerance):
+                regressions.append((name, metric, b, c, change))
+    return regressions
+
+
+def print_table(results, out=sys.stdout):
+    header = f"{'programa':<16} {'linhas':>7} {'instr':>10} {'load ms':>9} {'load KB':>9} " \
+             f"{'cache ms':>9} {'obj ms':>9} {'obj KB':>8} " \
+             f"{'step ips':>11} {'run ips':>11} {'opt ips':>11} {'comp ips':>11} {'run KB':>9}"
+    print(header, file=out)
+    print('-' * len(header), file=out)
+    for name, r in results.items():
+        if 'error' in r:
+            print(f"{name:<16} ERRO: {r['error']}", file=out)
+            continue
+        print(f"{name:<16} {r['lines']:>7} {r['instructions']:>10} {r['load_s'] * 1000:>9.2f} "
+              f"{r['load_peak_kb']:>9.1f} {r['cached_load_s'] * 1000:>9.2f} "
+              f"{r['object_load_s'] * 1000:>9.2f} {r['object_kb']:>8.1f} "
+              f"{r['step_ips']:>11,.0f} {r['run_ips']:>11,.0f} "
+              f"{r['optimized_ips']:>11,.0f} {r['compiled_ips']:>11,.0f} {r['run_peak_kb']:>9.1f}", file=out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m bench', description="Benchmarks da MVD")
+    parser.add_argument('programs', nargs='*', help="programas do corpus (padrão: todos)")
+    parser.add_argument('--repeat', type=int, default=3, help="repetições por medida (melhor tempo)")
+    parser.add_argument('--save', metavar='JSON', help="grava os resultados como linha de base")
+    parser.add_argument('--compare', metavar='JSON', help="compara com uma linha de base")
+    parser.add_argument('--tolerance', type=float, default=0.15,
+                        help="piora relativa tolerada antes de acusar regressão (padrão 0.15)")
+    parser.add_argument('--json', action='store_true', help="imprime os resultados em JSON")
+    args = parser.parse_args(argv)
+
+    results = run_all(args.programs, args.repeat)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_table(results)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'version': FORMAT_VERSION, 'results': results}, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            data = json.load(f)
+        if data.get('version') != FORMAT_VERSION:
+            print(f"linha de base incompatível (versão {data.get('version')})", file=sys.stderr)
+            return 2
+        regressions = compare(results, data['results'], args.tolerance)
+        for name, metric, b, c, change in regressions:
+            print(f"REGRESSÃO {name}.{metric}: {b:.6g} -> {c:.6g} ({change:+.1%})", file=sys.stderr)
+        if regressions:
+            return 1
+        print("sem regressões", file=sys.stderr)
+    return 0
@@ -0,0 +1,8 @@
+# backend/grade
+# Correção em lote: executa muitos programas da MVD contra vários casos de
+# teste (entradas e saída esperada) num pool de processos.
+#
+# Uso (a partir de backend/):
+#   python -m grade programas/ casos.json                 # relatório JSON
+#   python -m grade programas/ casos/ --format csv -o notas.csv
+#   python -m grade programas/ casos.json --jobs 8 --step-limit 200000 --timeout 2
@@ -0,0 +1,5 @@
+import sys
+
+from grade.grader import main
+
+sys.exit(main())
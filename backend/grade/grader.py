@@ -0,0 +1,356 @@
+# backend/grade/grader.py
+# Correção em lote de programas da MVD
+#
+# - Programas: arquivos de um diretório (.obj, .asm, .txt ou arquivo objeto
+#   .mvdo de vm_objfile), um por aluno.
+# - Casos: arquivo JSON com uma lista de {"name", "input", "expected"} (input
+#   e expected como lista de inteiros ou texto separado por espaços) ou um
+#   diretório com pares <caso>.in / <caso>.out.
+# - Cada programa é uma tarefa executada num processo worker próprio (até
+#   jobs ao mesmo tempo): é montado uma vez no worker e executado contra todos
+#   os casos (VM.reset entre eles). Sem estado compartilhado entre tarefas, o
+#   tempo cai com o número de núcleos.
+# - Cada execução tem limite de passos, de memória (max_cells, verificado pela
+#   própria VM em ALLOC) e de tempo (wall-clock, verificado entre fatias de
+#   CHUNK_STEPS passos de VM.execute()).
+# - O worker envia o resultado de cada caso assim que termina. Se um caso passa
+#   do tempo limite mais KILL_GRACE sem resposta (uma instrução que não acaba,
+#   por exemplo MULT com inteiros enormes), o worker é encerrado e o caso fica
+#   como timeout; se o worker morre (falta de memória, sinal), o caso fica como
+#   error. Os casos restantes do programa seguem num worker novo: uma falha
+#   nunca interrompe a correção dos demais.
+# - Resultado por execução: pass, fail (saída diferente), error (erro da VM),
+#   input (RD sem input), step_limit, timeout ou load_error.
+
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import Counter, deque
+from multiprocessing.connection import wait
+
+from vm_core import VM, VMError
+import vm_objfile
+
+EXTENSIONS = ('.obj', '.asm', '.txt', vm_objfile.EXTENSION)
+CHUNK_STEPS = 2000
+KILL_GRACE = 2.0    # segundos além do tempo limite antes de encerrar o worker
+STEP_LIMIT = 1000000
+TIMEOUT = 5.0
+MAX_CELLS = 1000000
+
+PASS = 'pass'
+FAIL = 'fail'
+ERROR = 'error'
+INPUT = 'input'
+STEP_LIMIT_HIT = 'step_limit'
+TIMEOUT_HIT = 'timeout'
+LOAD_ERROR = 'load_error'
+
+CSV_FIELDS = ('program', 'case', 'status', 'steps', 'time_ms', 'output', 'expected', 'message')
+
+
+# -----------------------
+# Entradas
+# -----------------------
+def parse_values(value):
+    """Lista de inteiros a partir de lista ou texto separado por espaços."""
+    if value is None:
+        return []
+    if isinstance(value, str):
+        value = value.split()
+    return [int(v) for v in value]
+
+
+def load_cases(path):
+    if os.path.isdir(path):
+        cases = []
+        for name in sorted(os.listdir(path)):
+            base, ext = os.path.splitext(name)
+            if ext != '.in':
+                continue
+            with open(os.path.join(path, name)) as f:
+                inputs = f.read()
+            expected = None
+            out_path = os.path.join(path, base + '.out')
+            if os.path.exists(out_path):
+                with open(out_path) as f:
+                    expected = f.read()
+            cases.append({'name': base, 'input': inputs, 'expected': expected})
+    else:
+        with open(path) as f:
+            cases = json.load(f)
+    return [
+        {
+            'name': str(case.get('name', i)),
+            'input': parse_values(case.get('input')),
+            'expected': None if case.get('expected') is None else parse_values(case['expected']),
+        }
+        for i, case in enumerate(cases)
+    ]
+
+
+def find_programs(directory):
+    return sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.lower().endswith(EXTENSIONS) and os.path.isfile(os.path.join(directory, name))
+    )
+
+
+# -----------------------
+# Execução (no processo do worker)
+# -----------------------
+def _load(vm, path):
+    if path.endswith(vm_objfile.EXTENSION):
+        vm.load_assembled(vm_objfile.load(path))
+    else:
+        with open(path, encoding='utf-8', errors='replace') as f:
+            vm.load_program(f.read())
+
+
+def run_case(vm, case, step_limit, timeout):
+    """Executa um caso na VM (já carregada): (status, passos, mensagem)."""
+    vm.reset()
+    vm.enqueue_inputs(case['input'])
+    deadline = time.monotonic() + timeout if timeout else None
+    # passos contados por vm.executed: com VMError, execute() também soma os
+    # passos da fatia interrompida (até a instrução que falhou, sem ela)
+    start = vm.executed
+    steps = 0
+    try:
+        while not vm.halted:
+            if steps >= step_limit:
+                return STEP_LIMIT_HIT, steps, "Limite de passos atingido"
+            if deadline is not None and time.monotonic() >= deadline:
+                return TIMEOUT_HIT, steps, "Tempo limite atingido"
+            vm.execute(min(CHUNK_STEPS, step_limit - steps))
+            steps = vm.executed - start
+            vm.check_memory()
+    except VMError as e:
+        return (ERROR if vm.halted else INPUT), vm.executed - start, str(e)
+    expected = case['expected']
+    if expected is not None and vm.output != expected:
+        return FAIL, steps, None
+    return PASS, steps, None
+
+
+def _grade_cases(path, cases, options):
+    """Resultados de um programa, um caso por vez (gerador)."""
+    name = os.path.basename(path)
+    vm = VM()
+    vm.max_cells = options['max_cells']
+    vm.compiled = options['engine'] == 'compiled'
+    vm.optimize = options['engine'] == 'optimize'
+    try:
+        _load(vm, path)
+    except (OSError, VMError) as e:
+        for case in cases:
+            yield _result(name, case, LOAD_ERROR, 0, 0.0, [], str(e))
+        return
+    for case in cases:
+        t0 = time.perf_counter()
+        try:
+            status, steps, message = run_case(vm, case, options['step_limit'], options['timeout'])
+        except Exception as e:
+            status, steps, message = ERROR, 0, f"Erro inesperado: {e}"
+        elapsed = time.perf_counter() - t0
+        yield _result(name, case, status, steps, elapsed, vm.output, message)
+
+
+def grade_program(path, cases, options):
+    """Todos os casos de um programa, no processo atual (sem limite rígido)."""
+    return list(_grade_cases(path, cases, options))
+
+
+def _worker(conn, path, cases, options):
+    # processo worker: um resultado por mensagem, None ao terminar
+    try:
+        for result in _grade_cases(path, cases, options):
+            conn.send(result)
+        conn.send(None)
+    finally:
+        conn.close()
+
+
+def _result(program, case, status, steps, elapsed, output, message):
+    return {
+        'program': program,
+        'case': case['name'],
+        'status': status,
+        'steps': steps,
+        'time_ms': round(elapsed * 1000, 3),
+        'output': list(output),
+        'expected': case['expected'],
+        'message': message,
+    }
+
+
+def grade(paths, cases, options, jobs=None):
+    """Resultados de todos os programas (ordem dos caminhos e dos casos)."""
+    jobs = max(1, min(jobs or os.cpu_count() or 1, len(paths)))
+    hard_limit = options['timeout'] + KILL_GRACE if options['timeout'] else None
+    by_path = {path: [] for path in paths}
+    pending = deque(paths)
+    running = {}    # conexão -> _Task
+    try:
+        while pending or running:
+            while pending and len(running) < jobs:
+                path = pending.popleft()
+                task = _Task(path, cases[len(by_path[path]):], options, hard_limit)
+                running[task.conn] = task
+            deadlines = [t.deadline for t in running.values() if t.deadline is not None]
+            timeout = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+            for conn in wait(list(running), timeout):
+                task = running[conn]
+                try:
+                    result = conn.recv()
+                except EOFError:
+                    # o worker morreu sem terminar o caso atual
+                    task.process.join(KILL_GRACE)
+                    result = task.stop(ERROR, "Worker encerrado inesperadamente "
+                                              f"(código {task.process.exitcode})")
+                if result is None:
+                    task.stop()
+                else:
+                    by_path[task.path].append(result)
+                    task.advance(hard_limit)
+                if task.done:
+                    del running[conn]
+                    if len(by_path[task.path]) < len(cases):
+                        pending.appendleft(task.path)
+            now = time.monotonic()
+            for conn, task in list(running.items()):
+                if task.deadline is not None and now >= task.deadline:
+                    by_path[task.path].append(task.stop(
+                        TIMEOUT_HIT, "Tempo limite atingido (worker encerrado)"))
+                    del running[conn]
+                    if len(by_path[task.path]) < len(cases):
+                        pending.appendleft(task.path)
+    finally:
+        for task in running.values():
+            task.stop()
+    return [r for path in paths for r in by_path[path]]
+
+
+class _Task:
+    """Um worker executando os casos restantes de um programa."""
+
+    def __init__(self, path, cases, options, hard_limit):
+        self.path = path
+        self.cases = cases
+        self.index = 0          # caso em execução
+        self.done = False
+        self.conn, child = multiprocessing.Pipe(duplex=False)
+        self.process = multiprocessing.Process(
+            target=_worker, args=(child, path, cases, options), daemon=True)
+        self.process.start()
+        child.close()
+        self._start_case(hard_limit)
+
+    def _start_case(self, hard_limit):
+        # prazo do caso atual; a montagem do programa entra no prazo do primeiro
+        self._started = time.monotonic()
+        self.deadline = self._started + hard_limit if hard_limit is not None else None
+
+    def advance(self, hard_limit):
+        self.index += 1
+        self._start_case(hard_limit)
+
+    def stop(self, status=None, message=None):
+        """Encerra o worker; com status, retorna a linha do caso interrompido."""
+        self.done = True
+        elapsed = time.monotonic() - self._started
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+        self.conn.close()
+        if status is None or self.index >= len(self.cases):
+            return None
+        case = self.cases[self.index]
+        return _result(os.path.basename(self.path), case, status, 0, elapsed, [], message)
+
+
+# -----------------------
+# Relatório
+# -----------------------
+def summary(results):
+    programs = {}
+    for r in results:
+        s = programs.setdefault(r['program'], {'passed': 0, 'total': 0})
+        s['total'] += 1
+        s['passed'] += r['status'] == PASS
+    return {
+        'programs': len(programs),
+        'runs': len(results),
+        'status': dict(Counter(r['status'] for r in results)),
+        'by_program': programs,
+    }
+
+
+def write_json(results, out):
+    json.dump({'summary': summary(results), 'results': results}, out, indent=2)
+    out.write('\n')
+
+
+def write_csv(results, out):
+    writer = csv.DictWriter(out, fieldnames=CSV_FIELDS)
+    writer.writeheader()
+    for r in results:
+        row = dict(r)
+        row['output'] = ' '.join(map(str, r['output']))
+        row['expected'] = '' if r['expected'] is None else ' '.join(map(str, r['expected']))
+        row['message'] = r['message'] or ''
+        writer.writerow(row)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m grade', description="Correção em lote da MVD")
+    parser.add_argument('programs', help="diretório com os programas (.obj/.asm/.txt/.mvdo)")
+    parser.add_argument('cases', help="casos: arquivo JSON ou diretório com pares .in/.out")
+    parser.add_argument('--jobs', '-j', type=int, default=None,
+                        help="processos em paralelo (padrão: nº de núcleos)")
+    parser.add_argument('--step-limit', type=int, default=STEP_LIMIT, help="passos por execução")
+    parser.add_argument('--timeout', type=float, default=TIMEOUT,
+                        help="segundos por execução (0 = sem limite)")
+    parser.add_argument('--max-cells', type=int, default=MAX_CELLS, help="células de memória por execução")
+    parser.add_argument('--engine', choices=('interp', 'optimize', 'compiled'), default='compiled',
+                        help="motor de execução (padrão: compiled)")
+    parser.add_argument('--format', choices=('json', 'csv'), default='json')
+    parser.add_argument('--output', '-o', help="arquivo do relatório (padrão: saída padrão)")
+    args = parser.parse_args(argv)
+
+    try:
+        cases = load_cases(args.cases)
+    except (OSError, ValueError) as e:
+        print(f"casos inválidos: {e}", file=sys.stderr)
+        return 2
+    paths = find_programs(args.programs)
+    if not paths:
+        print(f"nenhum programa em {args.programs}", file=sys.stderr)
+        return 2
+    options = {
+        'step_limit': args.step_limit,
+        'timeout': args.timeout or None,
+        'max_cells': args.max_cells,
+        'engine': args.engine,
+    }
+
+    t0 = time.perf_counter()
+    results = grade(paths, cases, options, args.jobs)
+    elapsed = time.perf_counter() - t0
+
+    write = write_csv if args.format == 'csv' else write_json
+    if args.output:
+        with open(args.output, 'w', newline='') as f:
+            write(results, f)
+    else:
+        write(results, sys.stdout)
+
+    s = summary(results)
+    passed = s['status'].get(PASS, 0)
+    print(f"{s['programs']} programas, {s['runs']} execuções, {passed} corretas "
+          f"em {elapsed:.2f}s", file=sys.stderr)
+    return 0
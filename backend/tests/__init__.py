@@ -0,0 +1,6 @@
+# backend/tests
+# Testes do backend (pytest). O diretório é um pacote para que o pytest ponha
+# backend/ no sys.path, como os módulos esperam (from vm_core import ...).
+#
+# Uso (a partir da raiz ou de backend/):
+#   python -m pytest -q
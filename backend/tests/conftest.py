@@ -0,0 +1,10 @@
+# Fixtures comuns: cliente de teste do Flask (app.py)
+
+import pytest
+
+
+@pytest.fixture
+def client():
+    # import tardio: app.py monta o pool de sessões e os jobs ao ser importado
+    import app
+    return app.app.test_client()
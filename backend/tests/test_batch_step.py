@@ -0,0 +1,54 @@
+# /step em lote: step_many com condições de parada e trace compacto
+
+from tests.util import load, make_vm
+
+COUNTER = """START
+ALLOC 0 1
+LDC 0
+STR 0
+L1 NULL
+LDV 0
+PRN
+LDV 0
+LDC 1
+ADD
+STR 0
+JMP L1"""
+
+
+def test_trace_rows_and_count():
+    vm = make_vm(COUNTER)
+    trace, reason = vm.step_many(4)
+    assert reason == 'count'
+    assert trace == [[0, 'START', -1, None], [1, 'ALLOC', 0, 0], [2, 'LDC', 1, 0], [3, 'STR', 0, 0]]
+
+
+def test_stop_conditions():
+    vm = make_vm(COUNTER)
+    assert vm.step_many(100, breakpoints=[vm.labels['L1']])[1] == 'breakpoint'
+    assert vm.pc == 4
+    trace, reason = vm.step_many(100, stop_on_output=True)
+    assert reason == 'output' and trace[-1][1] == 'PRN' and vm.output == [0]
+    assert vm.step_many(100, watch=0)[1] == 'watch' and vm.M[0] == 1
+    assert vm.step_many(100, pc_range=(6, 7))[1] == 'pc_range' and vm.pc == 6
+
+
+def test_halted_and_error():
+    vm = make_vm("START\nLDC 1\nPRN\nHLT")
+    trace, reason = vm.step_many(10)
+    assert reason == 'halted' and len(trace) == 4
+    vm = make_vm("START\nADD")
+    trace, reason = vm.step_many(10)
+    assert reason == 'error' and len(trace) == 1 and vm.last_error == "Pilha vazia"
+
+
+def test_batch_endpoint(client):
+    headers = load(client, COUNTER)
+    resp = client.post('/step', json={'count': 50, 'breakpoints': ['L1']}, headers=headers).get_json()
+    assert resp['stop'] == 'breakpoint' and len(resp['trace']) == 4
+    assert resp['snapshot']['pc'] == 4
+    resp = client.post('/step', json={'count': 10 ** 9}, headers=headers).get_json()
+    assert resp['stop'] == 'count' and len(resp['trace']) == 10000
+    assert client.post('/step', json={'count': 'x'}, headers=headers).status_code == 400
+    assert client.post('/step', json={'count': 5, 'breakpoints': ['nope']},
+                       headers=headers).status_code == 400
@@ -0,0 +1,56 @@
+# Corpus e executor dos benchmarks (bench/)
+
+import json
+
+from bench import corpus, runner
+
+from tests.util import make_vm
+
+
+def test_corpus_programs_compute_the_expected_output():
+    expected = {
+        'loop_sum': [sum(range(50000))],
+        'fib_rec': [2584],
+        'prn_heavy': list(range(20000)),
+        'rd_sum': [sum(range(20000))],
+    }
+    for prog in corpus.corpus():
+        vm = make_vm(prog.asm, prog.inputs)
+        vm.run(step_limit=runner.STEP_LIMIT)
+        assert vm.halted and vm.last_error is None, prog.name
+        if prog.name in expected:
+            assert vm.output == expected[prog.name], prog.name
+    fact = 1
+    for k in range(2, 201):
+        fact *= k
+    vm = make_vm(corpus.fact_rec().asm)
+    vm.run()
+    assert vm.output == [fact]
+
+
+def test_bench_program_reports_every_metric():
+    result = runner.bench_program(corpus.loop_sum(2000), repeat=1)
+    assert result['instructions'] == 28016
+    for metric in runner.METRICS:
+        assert result[metric] > 0, metric
+    assert result['output_tail'] == [sum(range(2000))]
+
+
+def test_compare_flags_regressions_only():
+    base = {'p': {'run_ips': 1000.0, 'load_s': 0.010}}
+    assert runner.compare({'p': {'run_ips': 900.0, 'load_s': 0.0101}}, base, 0.15) == []
+    regressions = runner.compare({'p': {'run_ips': 800.0, 'load_s': 0.02}}, base, 0.15)
+    assert sorted(metric for _, metric, *_ in regressions) == ['load_s', 'run_ips']
+
+
+def test_save_and_compare_baseline(tmp_path, capsys):
+    baseline = tmp_path / 'base.json'
+    assert runner.main(['prn_heavy', '--repeat', '1', '--save', str(baseline)]) == 0
+    data = json.loads(baseline.read_text())
+    assert data['version'] == runner.FORMAT_VERSION and list(data['results']) == ['prn_heavy']
+    # linha de base impossível de alcançar: tudo vira regressão
+    for metric in runner.METRICS:
+        data['results']['prn_heavy'][metric] = 1e12 if runner.METRICS[metric] else 1e-12
+    baseline.write_text(json.dumps(data))
+    assert runner.main(['prn_heavy', '--repeat', '1', '--compare', str(baseline)]) == 1
+    assert 'REGRESSÃO prn_heavy.run_ips' in capsys.readouterr().err
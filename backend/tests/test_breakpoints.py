@@ -0,0 +1,109 @@
+# Breakpoints e watchpoints avaliados dentro do laço de execução
+
+import random
+
+import pytest
+
+from vm_core import VMError
+
+from tests.util import make_vm, random_program, state, step_until_stop
+
+ENGINES = [{}, {'compiled': True}, {'optimize': True}]
+ENGINE_IDS = ['fast', 'compiled', 'optimize']
+
+COUNTER = """START
+ALLOC 0 1
+LDC 0
+STR 0
+L1 NULL
+LDV 0
+LDC 3
+CME
+JMPF L2
+LDV 0
+LDC 1
+ADD
+STR 0
+JMP L1
+L2 NULL
+DALLOC 0 1
+HLT"""
+
+
+def run_through_breakpoints(vm, limit=2000):
+    # roda até o fim, retomando a cada parada; retorna (paradas, passos, erro)
+    stops, steps = [], 0
+    while not vm.halted and steps < limit:
+        try:
+            steps += vm.execute(limit - steps)
+        except VMError as e:
+            return stops, None, str(e)
+        if vm.stop_reason:
+            stops.append(vm.stop_info['pc'])
+    return stops, steps, None
+
+
+@pytest.mark.parametrize('options', ENGINES, ids=ENGINE_IDS)
+@pytest.mark.parametrize('target', [100, -3, 4, 3])
+def test_breakpoint_on_return_out_of_program(options, target):
+    # o RETURN sob o breakpoint leva pc para fora do programa: para como sem o breakpoint
+    asm = f"START\nLDC {target}\nRETURN\nHLT"
+    ref = make_vm(asm)
+    steps, _ = step_until_stop(ref)
+    vm = make_vm(asm, **options)
+    vm.set_breakpoint(2)
+    vm.run()
+    assert vm.stop_reason == 'breakpoint' and vm.pc == 2
+    vm.run()
+    assert vm.halted and vm.last_error is None
+    assert state(vm) == state(ref) and vm.executed == steps
+
+
+@pytest.mark.parametrize('options', ENGINES, ids=ENGINE_IDS)
+def test_breakpoint_stops_before_and_resumes(options):
+    vm = make_vm(COUNTER, **options)
+    vm.set_breakpoint('L1')
+    stops, _, error = run_through_breakpoints(vm)
+    assert error is None and stops == [4, 4, 4, 4] and vm.M[0] == 3
+
+
+@pytest.mark.parametrize('options', ENGINES, ids=ENGINE_IDS)
+def test_conditional_breakpoint_and_watchpoint(options):
+    vm = make_vm(COUNTER, **options)
+    vm.set_breakpoint('L1', 'M[0] == 2')
+    vm.run()
+    assert vm.stop_reason == 'breakpoint' and vm.M[0] == 2
+    vm.clear_breakpoint()
+    vm.set_watchpoint(0, 3)
+    vm.run()
+    assert vm.stop_reason == 'watchpoint'
+    assert vm.stop_info == {'pc': 12, 'addr': 0, 'old': 2, 'new': 3}
+    vm.clear_watchpoint()
+    vm.run()
+    assert vm.halted and vm.last_error is None
+
+
+def test_invalid_breakpoints():
+    vm = make_vm(COUNTER)
+    with pytest.raises(VMError):
+        vm.set_breakpoint(99)
+    with pytest.raises(VMError):
+        vm.set_breakpoint('L9')
+    with pytest.raises(VMError):
+        vm.set_breakpoint(0, 'import os')
+
+
+@pytest.mark.parametrize('options', ENGINES, ids=ENGINE_IDS)
+def test_breakpoints_do_not_change_results(options):
+    rng = random.Random(8)
+    for _ in range(200):
+        asm = random_program(rng, rng.randint(5, 30))
+        ref = make_vm(asm, [1, 2])
+        _, error = step_until_stop(ref, 300)
+        vm = make_vm(asm, [1, 2], **options)
+        for addr in rng.sample(range(len(vm.code)), min(3, len(vm.code))):
+            vm.set_breakpoint(addr)
+        _, _, got = run_through_breakpoints(vm, 300)
+        if ref.halted or error:
+            assert got == error, asm
+            assert state(vm) == state(ref), asm
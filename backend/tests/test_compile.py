@@ -0,0 +1,53 @@
+# Nível compilado (vm_compile) contra step()
+
+import random
+
+import pytest
+
+import vm_compile
+from bench import corpus
+
+from tests.util import assert_same_as_step, make_vm, random_program, state
+
+
+def test_programs_without_return_match_step():
+    # sem RETURN: blocos gerados com as profundidades provadas (vm_verify)
+    rng = random.Random(102)
+    for _ in range(150):
+        asm = random_program(rng, rng.randint(5, 40))
+        asm = "\n".join(line for line in asm.splitlines() if line != 'RETURN')
+        inputs = [rng.randint(-2, 5) for _ in range(rng.randint(0, 3))]
+        assert_same_as_step(asm, inputs, limit=rng.choice([1, 7, 50, 500]), compiled=True)
+
+
+def test_loop_block_respects_step_budget():
+    prog = corpus.loop_sum(300)
+    for limit in (1, 13, 14, 15, 100, 1001):
+        ref = make_vm(prog.asm)
+        for _ in range(limit):
+            ref.step()
+        vm = make_vm(prog.asm, compiled=True)
+        assert vm.execute(limit) == limit
+        assert state(vm) == state(ref)
+
+
+def test_side_exits_then_resume():
+    # RD sem input sai do bloco; depois do /input o bloco continua
+    vm = make_vm("START\nLDC 6\nRD\nDIVI\nPRN\nHLT", compiled=True)
+    with pytest.raises(Exception, match="RD attempted"):
+        vm.execute(100)
+    assert not vm.halted and vm.pc == 2
+    vm.enqueue_input(0)
+    with pytest.raises(Exception, match="Divisão por zero"):
+        vm.execute(100)
+    assert vm.halted and vm.pc == 3
+
+
+def test_blocks_are_shared_between_vms():
+    vm_compile.clear_cache()
+    prog = corpus.loop_sum(10)
+    a, b = make_vm(prog.asm, compiled=True), make_vm(prog.asm, compiled=True)
+    a.run()
+    b.run()
+    assert a._blocks is b._blocks
+    assert vm_compile.compile_program(a.code, a.labels) is a._blocks
@@ -0,0 +1,64 @@
+# Montagem e decodificação (load_program -> P, labels, code)
+
+import pytest
+
+from vm_core import (VM, VMError, OP_ALLOC, OP_CALL, OP_ERR, OP_JMP, OP_JMPF,
+                     OP_LDC, OP_NULL, OP_START)
+
+from tests.util import make_vm, step_until_stop
+
+
+def test_labels_and_operands_decoded_once():
+    vm = make_vm("START\nJMP fim\nL1 NULL\nLDC 7\nALLOC 0 2\nJMPF L1\nCALL L1\nfim: HLT")
+    assert vm.labels['fim'] == 7
+    assert vm.labels['L1'] == 2
+    assert vm.code[0] == (OP_START, None, None)
+    assert vm.code[1] == (OP_JMP, 7, None)
+    assert vm.code[2] == (OP_NULL, None, None)
+    assert vm.code[3] == (OP_LDC, 7, None)
+    assert vm.code[4] == (OP_ALLOC, 0, 2)
+    assert vm.code[5] == (OP_JMPF, 2, None)
+    assert vm.code[6] == (OP_CALL, 2, None)
+    # P guarda o texto original (dump_program / snapshot)
+    assert vm.P[1] == ['JMP', 'fim']
+    assert vm.snapshot()['next_instr'] == 'START'
+
+
+def test_numeric_labels_get_L_alias():
+    vm = make_vm("START\nJMP 3\nHLT\n3 NULL\nJMP L3")
+    assert vm.labels['3'] == vm.labels['L3'] == 3
+
+
+def test_undefined_label_fails_at_load():
+    vm = VM()
+    with pytest.raises(VMError, match="rótulo 'L9' não encontrado"):
+        vm.load_program("START\nJMP L9\nHLT")
+
+
+def test_bad_line_fails_only_when_executed():
+    vm = make_vm("START\nJMP L1\nX: FOO\nL1 NULL\nLDC 2\nPRN\nHLT")
+    assert vm.code[2][0] == OP_ERR
+    step_until_stop(vm)
+    assert vm.output == [2] and vm.last_error is None
+
+    vm = make_vm("START\nX: FOO\nHLT")
+    steps, error = step_until_stop(vm)
+    assert (steps, error) == (2, "Instrução inválida: FOO")
+    assert vm.halted
+
+
+def test_missing_alloc_arguments_message():
+    vm = make_vm("START\nALLOC 0\nHLT")
+    _, error = step_until_stop(vm)
+    assert error == "ALLOC: argumentos ausentes"
+
+
+def test_assemble_is_shared_without_mutation():
+    program = VM.assemble("START\nLDC 1\nPRN\nHLT")
+    a, b = VM(), VM()
+    a.load_assembled(program)
+    b.load_assembled(program)
+    a.set_breakpoint(2)
+    step_until_stop(b)
+    assert b.output == [1]
+    assert program.code[2][0] != OP_ERR and a.code is program.code
@@ -0,0 +1,87 @@
+# Snapshots delta: versões do estado e mudanças desde uma versão
+
+import random
+
+from vm_core import CHANGE_LOG_SIZE, VMError
+
+from tests.util import load, make_vm, random_program
+
+
+def apply_delta(view, delta):
+    # o que o frontend faz com a resposta: snapshot completo ou só as mudanças
+    if delta['full']:
+        return {k: delta[k] for k in ('pc', 'mem', 'output', 'halted', 'last_error', 'next_instr')}
+    view = dict(view, mem=dict(view['mem']), output=list(view['output']))
+    view['mem'].update(delta['mem'])
+    view['output'] += delta['output']
+    for key in ('pc', 'halted', 'last_error', 'next_instr'):
+        view[key] = delta[key]
+    return view
+
+
+def test_deltas_rebuild_the_snapshot():
+    rng = random.Random(6)
+    for _ in range(200):
+        vm = make_vm(random_program(rng, rng.randint(5, 30)), [1, 2])
+        vm.enable_change_tracking()
+        version = vm.version
+        view = apply_delta(None, vm.delta(0))
+        for _ in range(60):
+            if vm.halted:
+                break
+            try:
+                vm.step()
+            except VMError:
+                pass
+            delta = vm.delta(version)
+            view = apply_delta(view, delta)
+            version = delta['version']
+            expected = vm.snapshot()
+            expected.pop('stack')
+            assert view == expected
+
+
+def test_delta_only_carries_what_changed():
+    vm = make_vm("START\nALLOC 0 3\nLDC 7\nSTR 1\nLDC 4\nPRN\nHLT")
+    vm.enable_change_tracking()
+    for _ in range(3):
+        vm.step()
+    version = vm.version
+    vm.step()       # STR 1
+    vm.step()       # LDC 4
+    vm.step()       # PRN
+    delta = vm.delta(version)
+    assert not delta['full']
+    assert delta['mem'] == {1: 7, 3: 4} and delta['output'] == [4] and delta['sp'] == 2
+
+
+def test_full_snapshot_when_history_does_not_cover():
+    vm = make_vm("START\nL1 NULL\nLDC 1\nSTR 0\nJMP L1")
+    vm.enable_change_tracking()
+    first = vm.version
+    for _ in range(CHANGE_LOG_SIZE + 5):
+        vm.step()
+    assert vm.delta(first)['full']
+    assert vm.delta(vm.version + 1)['full']
+    # execute() não registra endereços: a versão seguinte vale o estado todo
+    version = vm.version
+    vm.execute(10)
+    assert vm.delta(version)['full']
+
+
+def test_step_and_state_with_since(client):
+    headers = load(client, "START\nLDC 5\nPRN\nHLT")
+    state = client.get('/state?since=0', headers=headers).get_json()
+    assert state['full'] and state['pc'] == 0
+    resp = client.post('/step', json={'since': state['version']}, headers=headers).get_json()
+    assert resp['status'] == 'ok' and not resp['delta']['full']
+    assert resp['delta']['pc'] == 1 and resp['delta']['mem'] == {}
+
+
+def test_invalid_since_is_a_400(client):
+    headers = load(client, "START\nHLT")
+    for resp in (client.get('/state?since=abc', headers=headers),
+                 client.post('/step?since=abc', headers=headers),
+                 client.post('/step', json={'since': [1]}, headers=headers)):
+        assert resp.status_code == 400
+        assert resp.get_json() == {'status': 'error', 'message': 'Parâmetro since inválido'}
@@ -0,0 +1,55 @@
+# Motores de execução (execute: rápido, compilado, otimizado e memória em
+# array) contra o caminho de depuração (step)
+
+import random
+
+import pytest
+
+from bench import corpus
+
+from tests.util import (
+    ENGINES, SMALL_CORPUS, assert_same_as_step, engine_id, make_vm, random_program, state,
+    step_until_stop,
+)
+
+
+@pytest.mark.parametrize('options', ENGINES, ids=engine_id)
+@pytest.mark.parametrize('prog', SMALL_CORPUS, ids=lambda p: p.name)
+def test_corpus_matches_step(prog, options):
+    assert_same_as_step(prog.asm, prog.inputs, limit=1000000, **options)
+
+
+@pytest.mark.parametrize('options', ENGINES, ids=engine_id)
+@pytest.mark.parametrize('seed', range(4))
+def test_random_programs_match_step(seed, options):
+    rng = random.Random(seed)
+    for _ in range(150):
+        asm = random_program(rng, rng.randint(5, 40))
+        inputs = [rng.randint(-2, 5) for _ in range(rng.randint(0, 3))]
+        assert_same_as_step(asm, inputs, limit=rng.choice([1, 7, 50, 500]), **options)
+
+
+def test_step_limit_is_exact():
+    prog = corpus.loop_sum(300)
+    for limit in (1, 2, 5, 17, 100):
+        ref = make_vm(prog.asm)
+        for _ in range(limit):
+            ref.step()
+        vm = make_vm(prog.asm)
+        assert vm.execute(limit) == limit
+        assert state(vm) == state(ref)
+
+
+def test_run_reports_step_limit():
+    vm = make_vm("START\nL1 NULL\nJMP L1")
+    with pytest.raises(Exception, match="Limite de passos atingido"):
+        vm.run(step_limit=1000)
+    assert vm.pc in (1, 2)
+
+
+def test_errors_leave_same_partial_state():
+    # pilha vazia no meio do laço rápido: mesmo erro, pc e saída parcial
+    asm = "START\nLDC 4\nPRN\nADD\nHLT"
+    assert_same_as_step(asm)
+    ref = make_vm(asm)
+    assert step_until_stop(ref)[1] == "Pilha vazia"
@@ -0,0 +1,183 @@
+# Correção em lote (grade.grader): status, limites e falhas de worker
+
+import json
+import multiprocessing
+import os
+import time
+
+import pytest
+
+from grade import grader
+
+SUM = "START\nRD\nRD\nADD\nPRN\nHLT"
+
+# com fork o worker herda os monkeypatches do processo de teste
+needs_fork = pytest.mark.skipif(multiprocessing.get_start_method() != 'fork',
+                                reason="requer workers criados com fork")
+
+
+def options(**changes):
+    opts = {'step_limit': 100000, 'timeout': 5.0, 'max_cells': 1000, 'engine': 'compiled'}
+    opts.update(changes)
+    return opts
+
+
+def write_programs(tmp_path, **programs):
+    paths = []
+    for name, text in programs.items():
+        path = tmp_path / f"{name}.asm"
+        path.write_text(text)
+        paths.append(str(path))
+    return sorted(paths)
+
+
+def cases(*specs):
+    return [{'name': name, 'input': list(inputs), 'expected': expected}
+            for name, inputs, expected in specs]
+
+
+def statuses(results):
+    return [(r['program'], r['case'], r['status']) for r in results]
+
+
+@pytest.mark.parametrize('engine', ['interp', 'optimize', 'compiled'])
+def test_statuses(tmp_path, engine):
+    paths = write_programs(
+        tmp_path,
+        a_ok=SUM,
+        b_wrong="START\nRD\nRD\nMULT\nPRN\nHLT",
+        c_error="START\nRD\nRD\nDIVI\nPRN\nHLT",
+        d_loop="START\nL1 NULL\nJMP L1",
+        e_input="START\nRD\nRD\nRD\nHLT",
+        f_load="START\nJMP nada\nHLT",
+    )
+    results = grader.grade(paths, cases(('c1', [2, 0], [2])), options(engine=engine), jobs=2)
+    assert [r['status'] for r in results] == [
+        grader.PASS, grader.FAIL, grader.ERROR, grader.STEP_LIMIT_HIT, grader.INPUT,
+        grader.LOAD_ERROR]
+    assert results[0]['output'] == [2]
+    assert results[2]['message'] == "Divisão por zero"
+    assert results[3]['steps'] == 100000
+    # erro e espera por input contam as instruções executadas antes delas
+    assert results[2]['steps'] == 3
+    assert results[4]['steps'] == 3
+
+
+@pytest.mark.parametrize('engine', ['interp', 'optimize', 'compiled'])
+def test_input_row_counts_interrupted_slice(tmp_path, engine):
+    paths = write_programs(tmp_path, a=SUM)
+    results = grader.grade(paths, cases(('c1', [7], None)), options(engine=engine))
+    assert (results[0]['status'], results[0]['steps']) == (grader.INPUT, 2)
+
+
+def test_timeout_between_slices(tmp_path):
+    paths = write_programs(tmp_path, loop="START\nL1 NULL\nJMP L1")
+    results = grader.grade(paths, cases(('c1', [], None)),
+                           options(step_limit=10**12, timeout=0.2, engine='interp'))
+    assert results[0]['status'] == grader.TIMEOUT_HIT
+    assert results[0]['message'] == "Tempo limite atingido"
+
+
+def test_alloc_loop_stops_at_memory_cap(tmp_path):
+    # ALLOC é limitado dentro da VM: não passa de max_cells dentro de uma fatia
+    paths = write_programs(tmp_path, grow="START\nL1 NULL\nALLOC 0 500\nJMP L1")
+    for engine in ('interp', 'optimize', 'compiled'):
+        t0 = time.monotonic()
+        results = grader.grade(paths, cases(('c1', [], None)), options(engine=engine))
+        assert time.monotonic() - t0 < 5
+        assert results[0]['status'] == grader.ERROR
+        assert results[0]['message'] == "Limite de memória excedido"
+
+
+def test_results_keep_order(tmp_path):
+    paths = write_programs(tmp_path, **{f"p{i}": SUM for i in range(5)})
+    specs = cases(('x', [1, 2], [3]), ('y', [4, 5], [9]), ('z', [1, 1], [3]))
+    results = grader.grade(paths, specs, options(), jobs=3)
+    assert statuses(results) == [
+        (f"p{i}.asm", case, status)
+        for i in range(5) for case, status in (('x', 'pass'), ('y', 'pass'), ('z', 'fail'))]
+    # mesmos resultados que a execução no próprio processo (fora o tempo)
+    inline = [r for path in paths for r in grader.grade_program(path, specs, options())]
+    strip = lambda rows: [dict(r, time_ms=None) for r in rows]
+    assert strip(results) == strip(inline)
+
+
+@needs_fork
+def test_hung_case_is_killed_and_rest_continue(tmp_path, monkeypatch):
+    # um caso que não volta (ex.: uma instrução sem fim) é encerrado à força
+    run_case = grader.run_case
+
+    def hang(vm, case, step_limit, timeout):
+        if case['name'] == 'hang':
+            time.sleep(60)
+        return run_case(vm, case, step_limit, timeout)
+
+    monkeypatch.setattr(grader, 'run_case', hang)
+    monkeypatch.setattr(grader, 'KILL_GRACE', 0.3)
+    paths = write_programs(tmp_path, a=SUM, b=SUM)
+    specs = cases(('x', [1, 2], [3]), ('hang', [], None), ('y', [2, 2], [4]))
+    t0 = time.monotonic()
+    results = grader.grade(paths, specs, options(timeout=0.2), jobs=2)
+    assert time.monotonic() - t0 < 10
+    assert statuses(results) == [
+        ('a.asm', 'x', 'pass'), ('a.asm', 'hang', 'timeout'), ('a.asm', 'y', 'pass'),
+        ('b.asm', 'x', 'pass'), ('b.asm', 'hang', 'timeout'), ('b.asm', 'y', 'pass')]
+    assert results[1]['message'] == "Tempo limite atingido (worker encerrado)"
+
+
+@needs_fork
+def test_worker_crash_becomes_error_rows(tmp_path, monkeypatch):
+    run_case = grader.run_case
+
+    def crash(vm, case, step_limit, timeout):
+        if case['name'] == 'crash' and vm.P and 'SUB' in vm.P[3]:
+            os._exit(9)     # como um worker morto por falta de memória
+        return run_case(vm, case, step_limit, timeout)
+
+    monkeypatch.setattr(grader, 'run_case', crash)
+    paths = write_programs(tmp_path, a=SUM, b="START\nRD\nRD\nSUB\nPRN\nHLT", c=SUM)
+    specs = cases(('crash', [1, 2], [3]), ('y', [2, 2], [4]))
+    results = grader.grade(paths, specs, options(), jobs=2)
+    assert statuses(results) == [
+        ('a.asm', 'crash', 'pass'), ('a.asm', 'y', 'pass'),
+        ('b.asm', 'crash', 'error'), ('b.asm', 'y', 'fail'),
+        ('c.asm', 'crash', 'pass'), ('c.asm', 'y', 'pass')]
+    assert results[2]['message'] == "Worker encerrado inesperadamente (código 9)"
+
+
+def test_load_cases_from_directory_and_json(tmp_path):
+    (tmp_path / 'c1.in').write_text("1 2\n")
+    (tmp_path / 'c1.out').write_text("3\n")
+    (tmp_path / 'c2.in').write_text("5")
+    assert grader.load_cases(str(tmp_path)) == [
+        {'name': 'c1', 'input': [1, 2], 'expected': [3]},
+        {'name': 'c2', 'input': [5], 'expected': None}]
+    path = tmp_path / 'cases.json'
+    path.write_text(json.dumps([{'input': "4 5", 'expected': [9]}, {'name': 'b', 'input': [1]}]))
+    assert grader.load_cases(str(path)) == [
+        {'name': '0', 'input': [4, 5], 'expected': [9]},
+        {'name': 'b', 'input': [1], 'expected': None}]
+
+
+def test_main_writes_reports(tmp_path, capsys):
+    programs = tmp_path / 'programs'
+    programs.mkdir()
+    (programs / 'a.asm').write_text(SUM)
+    (programs / 'notes.md').write_text("ignorado")
+    cases_path = tmp_path / 'cases.json'
+    cases_path.write_text(json.dumps([{'name': 'c', 'input': [1, 2], 'expected': [3]}]))
+
+    assert grader.main([str(programs), str(cases_path), '-j', '1']) == 0
+    report = json.loads(capsys.readouterr().out)
+    assert report['summary'] == {'programs': 1, 'runs': 1, 'status': {'pass': 1},
+                                 'by_program': {'a.asm': {'passed': 1, 'total': 1}}}
+
+    out = tmp_path / 'report.csv'
+    assert grader.main([str(programs), str(cases_path), '--format', 'csv', '-o', str(out)]) == 0
+    lines = out.read_text().splitlines()
+    assert lines[0] == ','.join(grader.CSV_FIELDS)
+    assert lines[1].startswith('a.asm,c,pass,') and lines[1].endswith(',3,3,')
+
+    empty = tmp_path / 'empty'
+    empty.mkdir()
+    assert grader.main([str(empty), str(cases_path)]) == 2
@@ -0,0 +1,108 @@
+# Histórico de execução: voltar passos e ir ao passo N (vm_history)
+
+import random
+
+import pytest
+
+from bench import corpus
+from vm_core import VM, VMError
+from vm_sessions import SessionPool
+
+from tests.util import load, make_vm, random_program
+
+
+def timeline(asm, inputs, memory, limit=300):
+    # estados depois de cada passo de step(), sem histórico (a referência)
+    vm = make_vm(asm, inputs, memory)
+    states = [observed(vm)]
+    while not vm.halted and len(states) <= limit:
+        try:
+            vm.step()
+        except VMError:
+            if not vm.halted:
+                break       # RD esperando input: não é um passo
+        states.append(observed(vm))
+    return states
+
+
+def observed(vm):
+    snap = vm.snapshot()
+    snap.update(sp=vm.s, input_left=list(vm.input_queue))
+    if snap['last_error'] and not snap['halted']:
+        snap['last_error'] = None
+    return snap
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_goto_and_step_back_match_the_timeline(seed):
+    rng = random.Random(300 + seed)
+    for _ in range(120):
+        asm = random_program(rng, rng.randint(6, 40))
+        inputs = [rng.randint(-2, 5) for _ in range(rng.randint(0, 4))]
+        memory = rng.choice(['dict', 'array'])
+        states = timeline(asm, inputs, memory)
+        last = len(states) - 1
+        vm = make_vm(asm, inputs, memory, compiled=rng.random() < .3, optimize=rng.random() < .3)
+        history = vm.enable_history(interval=rng.randint(1, 12), undo_size=rng.randint(0, 30),
+                                    max_checkpoints=rng.randint(2, 6),
+                                    max_cells=rng.choice([None, 0, 20]))
+        for _ in range(20):
+            action = rng.random()
+            try:
+                if action < .3:
+                    vm.run(rng.randint(1, 60))
+                elif action < .55:
+                    for _ in range(rng.randint(1, 10)):
+                        vm.step()
+                elif action < .75:
+                    vm.step_back(rng.randint(1, 15))
+                else:
+                    vm.goto(rng.randint(0, last))
+            except VMError:
+                pass
+            if history.steps <= last:
+                assert observed(vm) == states[history.steps], asm
+
+
+def test_inputs_return_to_the_queue():
+    vm = make_vm(corpus.rd_sum(3).asm, [10, 20, 30])
+    vm.enable_history()
+    vm.run()
+    assert vm.output == [60] and not vm.input_queue
+    vm.goto(0)
+    assert list(vm.input_queue) == [10, 20, 30] and vm.output == []
+    vm.run()
+    assert vm.output == [60]
+
+
+def test_checkpoints_stay_within_the_cell_budget():
+    prog = corpus.fact_rec(60, 3)
+    vm = make_vm(prog.asm)
+    history = vm.enable_history(interval=10, max_cells=200)
+    vm.run()
+    assert history.cells <= 200 + len(vm.M)
+    assert history.cells == sum(len(c.mem) for c in history.checkpoints)
+    final = vm.snapshot()
+    vm.goto(history.steps // 2)
+    vm.goto(vm.executed)
+    assert vm.snapshot() == final
+
+
+def test_history_defaults_to_the_vm_cell_cap():
+    vm = VM()
+    vm.max_cells = 1234
+    assert vm.enable_history().max_cells == 1234
+
+
+def test_sessions_opt_in(client):
+    assert SessionPool().create().vm.history is None
+    assert SessionPool(history=True, max_cells=50).create().vm.history.max_cells == 50
+    headers = load(client, "START\nLDC 1\nLDC 2\nADD\nPRN\nHLT")
+    assert client.get('/history', headers=headers).get_json() == {'enabled': False}
+    assert client.post('/step_back', headers=headers).status_code == 400
+    headers = load(client, "START\nLDC 1\nLDC 2\nADD\nPRN\nHLT", history=True)
+    client.post('/run', headers=headers)
+    resp = client.post('/step_back', json={'count': 2}, headers=headers).get_json()
+    assert resp['step'] == 4 and resp['snapshot']['output'] == []
+    resp = client.post('/goto?step=6', headers=headers).get_json()
+    assert resp['snapshot']['output'] == [3] and resp['snapshot']['halted']
@@ -0,0 +1,92 @@
+# Fila de input: enqueue_inputs, RD sem input (InputWait) e a API de /input
+
+import pytest
+
+from vm_core import InputWait, VMError
+
+from tests.util import load, make_vm
+
+SUM = "START\nRD\nRD\nADD\nPRN\nHLT"
+
+
+def test_enqueue_inputs_list_and_text():
+    vm = make_vm(SUM)
+    assert vm.enqueue_inputs([1, '2']) == 2
+    assert vm.enqueue_inputs(" 3\n-4\t5 ") == 3
+    assert vm.enqueue_inputs("") == 0
+    assert list(vm.input_queue) == [1, 2, 3, -4, 5]
+
+
+@pytest.mark.parametrize('values', ["1 x 3", [1, None], [1, 'a']])
+def test_enqueue_inputs_all_or_nothing(values):
+    vm = make_vm(SUM, [9])
+    with pytest.raises(VMError, match="enqueue_inputs: valor inválido"):
+        vm.enqueue_inputs(values)
+    assert list(vm.input_queue) == [9]
+    with pytest.raises(VMError, match="enqueue_input: valor inválido"):
+        vm.enqueue_input('x')
+
+
+@pytest.mark.parametrize('engine', [{}, {'optimize': True}, {'compiled': True}])
+def test_rd_waits_and_resumes(engine):
+    vm = make_vm(SUM, [4], **engine)
+    with pytest.raises(InputWait, match="RD attempted but input queue empty"):
+        vm.execute(100)
+    # esperando input: erro sem halted, no RD que não leu
+    assert not vm.halted and vm.pc == 2 and vm.last_error
+    vm.enqueue_inputs("5")
+    assert vm.last_error is None
+    vm.execute(100)
+    assert vm.halted and vm.output == [9] and not vm.input_queue
+
+
+def test_step_waits_for_input():
+    vm = make_vm("START\nRD\nHLT")
+    vm.step()
+    with pytest.raises(InputWait):
+        vm.step()
+    assert vm.pc == 1 and not vm.halted
+    vm.enqueue_input(3)
+    vm.step()
+    assert vm.M[0] == 3
+
+
+def test_input_endpoint_forms(client):
+    headers = load(client, SUM)
+    assert client.post('/input', json={'value': 1}, headers=headers).get_json()['queued'] == 1
+    body = client.post('/input', json={'values': [2, 3]}, headers=headers).get_json()
+    assert body['input_queue'] == [1, 2, 3]
+    body = client.post('/input', json={'values': "4 5"}, headers=headers).get_json()
+    assert body['input_queue'] == [1, 2, 3, 4, 5]
+    resp = client.post('/input', data="6\n7", content_type='text/plain', headers=headers)
+    assert resp.get_json()['queued'] == 7
+
+
+@pytest.mark.parametrize('body', [{'value': 'x'}, {'values': "1 y"}, {'values': [1, None]}, {}])
+def test_input_endpoint_rejects_bad_values(client, body):
+    headers = load(client, SUM)
+    resp = client.post('/input', json=body, headers=headers)
+    assert resp.status_code == 400 and resp.get_json()['message'] == 'Valor inválido'
+    # nada foi enfileirado (uma lista vazia só consulta a fila)
+    assert client.post('/input', json={'values': []}, headers=headers).get_json()['input_queue'] == []
+
+
+def test_input_on_load_and_run(client):
+    headers = load(client, SUM, input="20 22")
+    body = client.post('/run', headers=headers).get_json()
+    assert body['snapshot']['output'] == [42]
+
+    headers = load(client, SUM)
+    body = client.post('/run', json={'input': [1, 2]}, headers=headers).get_json()
+    assert body['snapshot']['output'] == [3]
+    resp = client.post('/run', json={'input': "a"}, headers=load(client, SUM))
+    assert resp.status_code == 400
+
+
+def test_run_waits_then_continues_after_input(client):
+    headers = load(client, SUM, input=[1])
+    body = client.post('/run', headers=headers).get_json()
+    assert body['status'] == 'error' and not body['snapshot']['halted']
+    client.post('/input', json={'value': 2}, headers=headers)
+    body = client.post('/run', headers=headers).get_json()
+    assert body['status'] == 'ok' and body['snapshot']['output'] == [3]
@@ -0,0 +1,82 @@
+# /run assíncrono: jobs com progresso, cancelamento e tempo limite
+
+import pytest
+
+from bench import corpus
+
+from tests.util import load, wait_job
+
+LOOP = "START\nL1 NULL\nJMP L1"
+
+
+def test_async_run_finishes_with_output(client):
+    prog = corpus.prn_heavy(200)
+    headers = load(client, prog.asm)
+    resp = client.post('/run', json={'async': True}, headers=headers)
+    assert resp.status_code == 202
+    info = wait_job(client, resp.get_json()['job'])
+    assert info['status'] == 'done'
+    assert info['output'] == list(range(200)) and info['snapshot']['halted']
+    # polling incremental: só a saída que o cliente ainda não tem
+    tail = client.get(f"/jobs/{info['job']}?since=195").get_json()
+    assert tail['output'] == [195, 196, 197, 198, 199] and tail['output_len'] == 200
+
+
+def test_busy_session_and_cancel(client):
+    headers = load(client, LOOP)
+    job = client.post('/run', json={'async': True, 'limit': 10 ** 12, 'timeout': 60},
+                      headers=headers).get_json()['job']
+    assert client.post('/step', headers=headers).status_code == 409
+    assert client.post('/run', headers=headers).status_code == 409
+    assert client.post(f'/jobs/{job}/cancel').status_code == 200
+    info = wait_job(client, job)
+    assert info['status'] == 'cancelled' and info['message'] == "Execução cancelada"
+    assert client.post('/step', headers=headers).status_code == 200
+
+
+def test_timeout_and_step_limit(client):
+    headers = load(client, LOOP)
+    job = client.post('/run', json={'async': True, 'limit': 10 ** 12, 'timeout': 0.05},
+                      headers=headers).get_json()['job']
+    assert wait_job(client, job)['status'] == 'timeout'
+
+    headers = load(client, LOOP)
+    job = client.post('/run', json={'async': True, 'limit': 1000}, headers=headers).get_json()['job']
+    info = wait_job(client, job)
+    assert info['status'] == 'error' and info['message'] == "Limite de passos atingido"
+    assert info['steps'] == 1000
+
+
+def test_unknown_job_and_bad_since(client):
+    assert client.get('/jobs/nope').status_code == 404
+    assert client.post('/jobs/nope/cancel').status_code == 404
+    headers = load(client, "START\nHLT")
+    job = client.post('/run', json={'async': True}, headers=headers).get_json()['job']
+    wait_job(client, job)
+    resp = client.get(f'/jobs/{job}?since=abc')
+    assert resp.status_code == 400 and resp.get_json()['status'] == 'error'
+
+
+@pytest.mark.parametrize('body', [
+    {'timeout': 0}, {'timeout': None}, {'timeout': False}, {'timeout': -1},
+    {'timeout': 'abc'}, {'timeout': 'nan'}, {'limit': 'x'}, {'limit': -5},
+])
+def test_run_rejects_bad_limits(client, body):
+    headers = load(client, LOOP)
+    resp = client.post('/run', json={'async': True, **body}, headers=headers)
+    assert resp.status_code == 400 and resp.get_json()['message'] == 'Parâmetro inválido'
+    assert client.post('/step', headers=headers).status_code == 200
+
+
+def test_server_caps_timeout_and_limit(client, monkeypatch):
+    import app
+    monkeypatch.setattr(app, 'MAX_RUN_TIMEOUT', 0.05)
+    monkeypatch.setattr(app, 'MAX_RUN_STEPS', 1000)
+    headers = load(client, LOOP)
+    job = client.post('/run', json={'async': True, 'limit': 10 ** 12, 'timeout': 10 ** 6},
+                      headers=headers).get_json()['job']
+    assert app.jobs.get(job).timeout == 0.05
+    assert app.jobs.get(job).step_limit == 1000
+    wait_job(client, job)
+    body = client.post('/run', json={'limit': 10 ** 12}, headers=load(client, LOOP)).get_json()
+    assert body['message'] == "Limite de passos atingido"
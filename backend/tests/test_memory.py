@@ -0,0 +1,37 @@
+# Modelo de memória compacto (ArrayMemory); a comparação com step() fica em
+# test_engines (ENGINES)
+
+from vm_memory import MAX_GAP, ArrayMemory
+
+
+def test_zero_fill_and_sparse_addresses():
+    M = ArrayMemory()
+    M[3] = 7
+    assert [M[i] for i in range(4)] == [0, 0, 0, 7]
+    M[-5] = 1                       # negativo: dict esparso
+    M[10 + MAX_GAP * 2] = 2         # longe do fim: dict esparso
+    assert M.get(-5) == 1 and M[10 + MAX_GAP * 2] == 2
+    assert len(M) == 6 and -5 in M and 100 not in M
+    M[5] = 9                        # o array cresce; o esparso distante fica onde está
+    assert M[4] == 0 and M[5] == 9 and len(M) == 8
+
+
+def test_widens_for_big_integers():
+    M = ArrayMemory()
+    M[0] = 1
+    M[1] = 2 ** 80
+    assert M.wide and M[1] == 2 ** 80 and M[0] == 1
+
+
+def test_alloc_dalloc_blocks():
+    M = ArrayMemory()
+    for addr, value in enumerate([4, 5, 6]):
+        M[addr] = value
+    sp = M.alloc(2, 0, 3)
+    assert sp == 5 and [M[i] for i in range(6)] == [4, 5, 6, 4, 5, 6]
+    M[3], M[4], M[5] = 1, 2, 3
+    sp = M.dalloc(sp, 0, 3)
+    assert sp == 2 and [M[i] for i in range(3)] == [1, 2, 3]
+    # origem sobreposta ao destino: mesma semântica da cópia célula a célula
+    sp = M.alloc(1, 1, 3)
+    assert sp == 4 and [M[i] for i in range(5)] == [1, 2, 2, 2, 2]
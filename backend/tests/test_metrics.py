@@ -0,0 +1,170 @@
+# Métricas (vm_metrics e /metrics)
+
+import time
+
+import pytest
+
+import vm_metrics
+from vm_sessions import SessionPool
+
+from tests.util import load, make_vm, step_until_stop, wait_job
+
+PROGRAM = "START\nLDC 1\nPRN\nLDC 2\nPRN\nHLT"
+
+
+def samples(text):
+    """{'nome{rótulos}': valor} das linhas de amostra do texto do Prometheus."""
+    result = {}
+    for line in text.splitlines():
+        if line and not line.startswith('#'):
+            name, value = line.rsplit(' ', 1)
+            result[name] = float(value)
+    return result
+
+
+def scrape(client):
+    resp = client.get('/metrics')
+    assert resp.status_code == 200
+    assert resp.mimetype == 'text/plain'
+    return samples(resp.get_data(as_text=True))
+
+
+def wait_for(client, name, above, timeout=5.0):
+    # jobs observam a execução depois de publicar o status final
+    deadline = time.monotonic() + timeout
+    while True:
+        value = scrape(client).get(name, 0)
+        if value > above or time.monotonic() > deadline:
+            return value
+        time.sleep(0.01)
+
+
+def test_counter_gauge_histogram_text():
+    registry = vm_metrics.Registry()
+    requests = registry.counter('x_requests_total', "Requisições", ('path',))
+    size = registry.gauge('x_size', "Tamanho")
+    latency = registry.histogram('x_seconds', "Latência", ('path',), buckets=(0.1, 1))
+    requests.inc(1, '/a')
+    requests.inc(2, '/a')
+    requests.inc(1, 'b"\n\\')
+    size.set(7)
+    for value in (0.05, 0.5, 0.5, 3):
+        latency.observe(value, '/a')
+    text = registry.render()
+    assert text.splitlines()[:2] == ["# HELP x_requests_total Requisições",
+                                     "# TYPE x_requests_total counter"]
+    assert "# TYPE x_seconds histogram" in text
+    assert samples(text) == {
+        'x_requests_total{path="/a"}': 3,
+        'x_requests_total{path="b\\"\\n\\\\"}': 1,
+        'x_size': 7,
+        'x_seconds_bucket{path="/a",le="0.1"}': 1,
+        'x_seconds_bucket{path="/a",le="1.0"}': 3,
+        'x_seconds_bucket{path="/a",le="+Inf"}': 4,
+        'x_seconds_sum{path="/a"}': 4.05,
+        'x_seconds_count{path="/a"}': 4,
+    }
+    with pytest.raises(ValueError):
+        requests.inc(1)
+
+
+def test_collectors_run_on_render():
+    registry = vm_metrics.Registry()
+    gauge = registry.gauge('x_calls', "Coletas")
+    calls = []
+
+    @registry.collector
+    def collect():
+        calls.append(1)
+        gauge.set(len(calls))
+
+    registry.render()
+    assert samples(registry.render()) == {'x_calls': 2}
+
+
+def test_session_stats_include_retired_vms():
+    pool = SessionPool(max_sessions=2)
+    a = pool.create()
+    a.vm.load_program(PROGRAM)
+    a.vm.execute(100)
+    b = pool.create()
+    b.vm.load_program("START\nALLOC 0 3\nHLT")
+    b.vm.execute(100)
+    stats = pool.stats()
+    assert (stats['active'], stats['busy'], stats['executed']) == (2, 0, 9)
+    assert stats['max_memory_cells'] == 3
+    pool.create()                   # LRU: descarta a, mas as instruções dela continuam
+    stats = pool.stats()
+    assert stats['active'] == 2 and stats['executed'] == 9
+    pool.remove(b.id)
+    assert pool.stats()['executed'] == 9
+
+
+def test_load_and_run_metrics(client):
+    before = scrape(client)
+    headers = load(client, PROGRAM)
+    client.post('/run', headers=headers)
+    obj = client.get('/object', headers=headers).data
+    client.post('/load_object', data=obj, headers=headers)
+    client.post('/run', json={'limit': 2}, headers=headers)
+    after = scrape(client)
+
+    def delta(name):
+        return after.get(name, 0) - before.get(name, 0)
+
+    assert delta('mvd_load_seconds_count{kind="asm"}') == 1
+    assert delta('mvd_load_seconds_count{kind="object"}') == 1
+    assert delta('mvd_program_instructions_count') == 2
+    assert delta('mvd_run_seconds_count{mode="sync",status="ok"}') == 1
+    assert delta('mvd_run_seconds_count{mode="sync",status="error"}') == 1
+    assert delta('mvd_vm_instructions_total') == 8
+    assert delta('mvd_http_requests_total{endpoint="run",method="POST",status="200"}') == 2
+    assert delta('mvd_http_request_seconds_count{endpoint="load_program"}') == 1
+    assert after['mvd_sessions_active'] >= 1
+
+
+def test_async_and_stream_metrics(client):
+    name = 'mvd_run_seconds_count{mode="async",status="done"}'
+    before = scrape(client).get(name, 0)
+    headers = load(client, PROGRAM)
+    job = client.post('/run', json={'async': True}, headers=headers).get_json()['job']
+    wait_job(client, job)
+    assert wait_for(client, name, before) == before + 1
+
+    name = 'mvd_run_seconds_count{mode="stream",status="halted"}'
+    before = scrape(client).get(name, 0)
+    headers = load(client, PROGRAM)
+    resp = client.get('/stream', headers=headers, buffered=False)
+    list(resp.response)
+    resp.close()
+    assert scrape(client)[name] == before + 1
+
+
+# ~100k instruções e um RD sem input no final
+COUNT_THEN_READ = ("START\nALLOC 0 1\nLDC 0\nSTR 0\nL1 NULL\nLDV 0\nLDC 1\nADD\nSTR 0\n"
+                   "LDV 0\nLDC 10000\nCME\nJMPF L2\nJMP L1\nL2 NULL\nRD\nPRN\nHLT")
+COUNT_STEPS = 4 + 10000 * 9 + 9999 + 1     # até o RD, sem ele
+
+
+def test_instructions_before_input_wait_are_counted(client):
+    assert step_until_stop(make_vm(COUNT_THEN_READ)) == (COUNT_STEPS + 1, "RD attempted but input queue empty")
+    before = scrape(client)
+    headers = load(client, COUNT_THEN_READ)
+    body = client.post('/run', headers=headers).get_json()
+    assert body['status'] == 'error' and not body['snapshot']['halted']
+    after = scrape(client)
+
+    def delta(name):
+        return after.get(name, 0) - before.get(name, 0)
+
+    assert delta('mvd_vm_instructions_total') == COUNT_STEPS
+    assert delta('mvd_run_seconds_count{mode="sync",status="input"}') == 1
+    assert delta('mvd_run_seconds_count{mode="sync",status="error"}') == 0
+    assert delta('mvd_run_instructions_per_second_count{mode="sync"}') == 1
+
+    name = 'mvd_run_seconds_count{mode="async",status="input"}'
+    before = scrape(client).get(name, 0)
+    headers = load(client, COUNT_THEN_READ)
+    job = client.post('/run', json={'async': True}, headers=headers).get_json()['job']
+    assert wait_job(client, job)['steps'] == COUNT_STEPS
+    assert wait_for(client, name, before) == before + 1
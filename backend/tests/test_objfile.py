@@ -0,0 +1,122 @@
+# Arquivo objeto (.mvdo) e cache de programas montados
+
+import zlib
+
+import pytest
+
+import app as app_module
+import vm_objfile
+from bench import corpus
+from vm_core import VM, OP_CALL, OP_JMP, OP_JMPF, Program
+from vm_objfile import ObjectFileError, ProgramCache
+
+from tests.util import load, make_vm, state
+
+
+@pytest.mark.parametrize('prog', corpus.corpus()[:3] + [corpus.large_generated(50)],
+                         ids=lambda p: p.name)
+def test_round_trip(prog):
+    program = VM.assemble(prog.asm)
+    loaded = vm_objfile.loads(vm_objfile.dumps(program))
+    assert loaded == program
+    vm = VM()
+    vm.load_assembled(loaded)
+    ref = make_vm(prog.asm)
+    vm.run(50000000)
+    ref.run(50000000)
+    assert state(vm) == state(ref)
+
+
+def test_round_trip_keeps_bad_lines():
+    program = VM.assemble("START\nX: FOO\nALLOC 0\nHLT")
+    assert vm_objfile.loads(vm_objfile.dumps(program)) == program
+
+
+def test_rejects_bad_headers():
+    data = vm_objfile.dumps(VM.assemble("START\nHLT"))
+    with pytest.raises(ObjectFileError, match="cabeçalho incompleto"):
+        vm_objfile.loads(data[:10])
+    with pytest.raises(ObjectFileError, match="não é um arquivo MVD"):
+        vm_objfile.loads(b'XXXX' + data[4:])
+    with pytest.raises(ObjectFileError, match="corrompido"):
+        vm_objfile.loads(data[:-1] + bytes([data[-1] ^ 1]))
+
+
+def crafted(code, labels=None):
+    # arquivo objeto gerado à mão (não passou pelo montador)
+    P = [['NULL']] * len(code)
+    return vm_objfile.dumps(Program(P, labels or {}, code))
+
+
+@pytest.mark.parametrize('op', [OP_JMP, OP_JMPF, OP_CALL])
+@pytest.mark.parametrize('target', [999, 2, -1])
+def test_rejects_jump_targets_outside_the_program(op, target):
+    data = crafted([(OP_JMP, 1, None), (op, target, None)])
+    with pytest.raises(ObjectFileError, match="fora do programa"):
+        vm_objfile.loads(data)
+
+
+def test_rejects_labels_outside_the_program():
+    with pytest.raises(ObjectFileError, match="rótulo 'L1' fora do programa"):
+        vm_objfile.loads(crafted([(OP_JMP, 0, None)], {'L1': 5}))
+
+
+def test_rejects_oversized_payload():
+    body = zlib.compress(b'\0' * 100000)
+    header = vm_objfile._HEADER.pack(vm_objfile.MAGIC, vm_objfile.FORMAT_VERSION,
+                                     vm_objfile.OPCODES_CRC, b'\0' * 32, zlib.crc32(body))
+    with pytest.raises(ObjectFileError, match="maior que 1000 bytes"):
+        vm_objfile.loads(header + body, max_size=1000)
+
+
+def packed(*sections):
+    # corpo montado à mão, seção a seção, com cabeçalho e CRC válidos
+    body = bytearray()
+    for data in sections:
+        vm_objfile._put_section(body, data)
+    body = zlib.compress(bytes(body))
+    header = vm_objfile._HEADER.pack(vm_objfile.MAGIC, vm_objfile.FORMAT_VERSION,
+                                     vm_objfile.OPCODES_CRC, b'\0' * 32, zlib.crc32(body))
+    return header + body
+
+
+@pytest.mark.parametrize('errors', [b'5', b'{"a": 1}', b'[1]', b'null'])
+def test_rejects_errors_section_that_is_not_a_list_of_messages(errors):
+    data = packed(bytes([vm_objfile.OP_ERR]), b'', errors, b'NULL', b'')
+    with pytest.raises(ObjectFileError, match="seção de erros"):
+        vm_objfile.loads(data)
+
+
+def test_program_cache_memory_and_disk(tmp_path):
+    asm = corpus.loop_sum(10).asm
+    cache = ProgramCache(max_entries=2, directory=str(tmp_path))
+    a = VM()
+    a.program_cache = cache
+    a.load_program(asm)
+    a.load_program(asm)
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+    # outro processo: só o diretório é compartilhado
+    other = ProgramCache(directory=str(tmp_path))
+    program = other.get(asm)
+    assert program.code == a.code and program.labels == a.labels
+    assert other.stats()['disk_hits'] == 1
+
+
+def test_load_object_endpoint(client):
+    headers = load(client, corpus.fib_rec(5).asm)
+    data = client.get('/object', headers=headers).data
+    resp = client.post('/load_object', data=data, headers=headers)
+    assert resp.status_code == 200 and resp.get_json()['prog_len'] == 38
+    run = client.post('/run', headers=headers).get_json()
+    assert run['snapshot']['output'] == [5]
+    # alvo de salto forjado: 400, não IndexError na execução
+    resp = client.post('/load_object', data=crafted([(OP_JMP, 999, None)]), headers=headers)
+    assert resp.status_code == 400 and 'fora do programa' in resp.get_json()['message']
+    resp = client.post('/load_object', data=packed(b'', b'', b'5', b'', b''), headers=headers)
+    assert resp.status_code == 400 and 'seção de erros' in resp.get_json()['message']
+
+
+def test_load_object_body_is_capped(client, monkeypatch):
+    monkeypatch.setattr(app_module, 'MAX_OBJECT_BYTES', 100)
+    resp = client.post('/load_object', data=b'\0' * 101)
+    assert resp.status_code == 413
@@ -0,0 +1,41 @@
+# Otimizador peephole e superinstruções (vm_optimize) contra step()
+
+from bench import corpus
+from vm_core import OP_BRK, OP_VC_JMPF, OP_VC_STR
+from vm_optimize import optimize
+
+from tests.util import make_vm, state
+
+
+def test_compiler_patterns_are_fused_in_place():
+    vm = make_vm(corpus.loop_sum(10).asm)
+    ocode, spans = optimize(vm.code)
+    assert len(ocode) == len(vm.code)
+    # "LDV 1; LDC n; CME; JMPF L2" e "LDV 1; LDC 1; ADD; STR 1"
+    # (o JMPF também pula o "L2 NULL" do alvo: endereço 20)
+    assert ocode[7][0] == OP_VC_JMPF and spans[7] == (8, 9, 10, 20)
+    assert ocode[15][0] == OP_VC_STR and spans[15] == (16, 17, 18)
+    # as instruções cobertas continuam no lugar (saltos para o meio da
+    # sequência); podem ser início de outra fusão (CME; JMPF em 9)
+    assert ocode[8] == vm.code[8] and 8 not in spans and 9 in spans
+
+
+def test_step_counts_stay_exact():
+    prog = corpus.loop_sum(300)
+    for limit in range(1, 40):
+        ref = make_vm(prog.asm)
+        for _ in range(limit):
+            ref.step()
+        vm = make_vm(prog.asm, optimize=True)
+        assert vm.execute(limit) == limit
+        assert state(vm) == state(ref)
+
+
+def test_breakpoint_inside_a_fused_sequence_unfuses_it():
+    vm = make_vm(corpus.loop_sum(10).asm, optimize=True)
+    vm.set_breakpoint(9)        # CME dentro de VC_JMPF
+    assert vm._oxcode[7] == vm.code[7] and vm._oxcode[9][0] == OP_BRK
+    vm.run()
+    assert vm.stop_reason == 'breakpoint' and vm.pc == 9
+    vm.clear_breakpoint()
+    assert vm._oxcode[7][0] == OP_VC_JMPF
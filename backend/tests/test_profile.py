@@ -0,0 +1,59 @@
+# Profiler: contadores por endereço, opcode e procedimento
+
+import vm_profile
+from bench import corpus
+
+from tests.util import load, make_vm, state, step_until_stop
+
+
+def calls(n):
+    return 1 if n < 2 else 1 + calls(n - 1) + calls(n - 2)
+
+
+def test_counts_match_execution():
+    prog = corpus.fib_rec(6)
+    ref = make_vm(prog.asm)
+    steps, _ = step_until_stop(ref)
+    vm = make_vm(prog.asm)
+    profiler = vm_profile.enable(vm)
+    vm.run()
+    assert state(vm) == state(ref)
+    report = profiler.report(top=3)
+    # o passo final que só marca halted (pc fora do programa) não é instrução
+    assert report['total'] == sum(profiler.addr_counts) == steps
+    assert report['by_opcode']['CALL'] == calls(6)
+    assert [h['count'] for h in report['hot']] == sorted(profiler.addr_counts, reverse=True)[:3]
+    main, fib = report['procedures']
+    assert main['name'] == '<main>' and main['instructions'] == steps
+    assert fib['name'] == 'L1' and fib['calls'] == calls(6)
+    assert fib['instructions'] == steps - 9     # tudo menos as 9 instruções de main
+
+
+def test_reset_on_load_and_disable():
+    vm = make_vm("START\nLDC 1\nPRN\nHLT")
+    profiler = vm_profile.enable(vm)
+    assert vm_profile.enable(vm) is profiler
+    vm.run()
+    vm.load_program("START\nHLT")
+    assert profiler.total == 0 and profiler.addr_counts == [0, 0]
+    vm_profile.disable(vm)
+    assert vm_profile.profiler_of(vm) is None and vm.hooks == []
+
+
+def test_listing_annotates_program():
+    vm = make_vm("START\nL1 NULL\nHLT")
+    profiler = vm_profile.enable(vm)
+    vm.run()
+    lines = profiler.listing().splitlines()
+    assert len(lines) == 3 and lines[1].split()[:3] == ['1', '33.33%', '001']
+
+
+def test_profile_endpoint(client):
+    headers = load(client, corpus.fib_rec(5).asm)
+    assert client.get('/profile', headers=headers).get_json() == {'enabled': False}
+    client.post('/profile', json={'enabled': True}, headers=headers)
+    client.post('/run', headers=headers)
+    report = client.get('/profile?top=2', headers=headers).get_json()
+    assert report['enabled'] and len(report['hot']) == 2
+    assert client.get('/profile?format=text', headers=headers).mimetype == 'text/plain'
+    assert client.get('/profile?top=x', headers=headers).status_code == 400
@@ -0,0 +1,117 @@
+# Sessões (uma VM por cliente) e limite de memória por VM
+
+import pytest
+
+from vm_core import RUN_CHUNK, VMError
+from vm_jobs import CHUNK_STEPS, RunJob
+from vm_sessions import DEFAULT_SESSION, SessionError, SessionPool
+
+from tests.util import ENGINES, engine_id, make_vm
+
+
+def engine_vm(asm, options, max_cells):
+    options = dict(options)
+    return make_vm(asm, memory=options.pop('memory', 'dict'), max_cells=max_cells, **options)
+
+
+@pytest.mark.parametrize('options', ENGINES, ids=engine_id)
+def test_oversized_alloc_fails_without_allocating(options):
+    vm = engine_vm("START\nALLOC 0 5000000\nHLT", options, 1000)
+    with pytest.raises(VMError, match="Limite de memória excedido"):
+        vm.run()
+    assert vm.halted and vm.s == -1
+    assert len(vm.M) == 0
+
+
+@pytest.mark.parametrize('options', ENGINES, ids=engine_id)
+def test_alloc_loop_stops_at_the_cap(options):
+    vm = engine_vm("START\nL1 NULL\nALLOC 0 100\nJMP L1", options, 1000)
+    with pytest.raises(VMError, match="Limite de memória excedido"):
+        vm.run(step_limit=10000000)
+    assert len(vm.M) <= 1000 and vm.pc == 2
+
+
+@pytest.mark.parametrize('options', ENGINES, ids=engine_id)
+def test_push_loop_stops_within_a_chunk_of_the_cap(options):
+    # LDC não verifica o limite: run() confere a memória a cada RUN_CHUNK passos
+    vm = engine_vm("START\nL1 NULL\nLDC 1\nJMP L1", options, 1000)
+    with pytest.raises(VMError, match="Limite de memória excedido"):
+        vm.run(step_limit=10 ** 9)
+    assert vm.halted and len(vm.M) <= 1000 + RUN_CHUNK
+
+
+def test_async_job_checks_memory_every_chunk():
+    pool = SessionPool(max_cells=1000)
+    session = pool.create()
+    session.vm.load_program("START\nL1 NULL\nLDC 1\nJMP L1")
+    job = RunJob(session, 10 ** 9, None)
+    job._run()          # no próprio thread: termina pelo limite de memória
+    assert job.status == 'error' and job.message == "Limite de memória excedido"
+    assert job.steps == CHUNK_STEPS and session.vm.halted
+
+
+def test_alloc_cap_in_step():
+    vm = make_vm("START\nALLOC 0 10\nALLOC 0 10\nHLT", max_cells=15)
+    vm.step()
+    vm.step()
+    with pytest.raises(VMError, match="Limite de memória excedido"):
+        vm.step()
+    assert vm.s == 9 and vm.halted
+
+
+def test_alloc_within_cap_runs():
+    vm = engine_vm("START\nALLOC 0 10\nDALLOC 0 10\nHLT", {'compiled': True}, 10)
+    vm.run()
+    assert vm.halted and vm.last_error is None
+
+
+def test_changing_cap_recompiles_blocks():
+    vm = engine_vm("START\nALLOC 0 50\nHLT", {'compiled': True}, None)
+    vm.run()
+    vm.reset()
+    vm.max_cells = 10
+    with pytest.raises(VMError, match="Limite de memória excedido"):
+        vm.run()
+
+
+def test_sessions_have_separate_vms():
+    pool = SessionPool(max_sessions=4, max_cells=100)
+    a, b = pool.create(), pool.create()
+    a.vm.load_program("START\nLDC 1\nPRN\nHLT")
+    b.vm.load_program("START\nLDC 2\nPRN\nHLT")
+    a.vm.run()
+    b.vm.run()
+    assert a.vm.output == [1] and b.vm.output == [2]
+    assert a.vm.max_cells == 100 and pool.get(a.id) is a
+
+
+def test_lru_eviction_and_unknown_ids():
+    pool = SessionPool(max_sessions=2)
+    a, b = pool.create(), pool.create()
+    pool.get(a.id)          # b passa a ser a menos usada
+    c = pool.create()
+    assert len(pool) == 2 and pool.get(c.id) is c
+    with pytest.raises(SessionError):
+        pool.get(b.id)
+    # a sessão padrão é criada sob demanda
+    assert pool.get(DEFAULT_SESSION).id == DEFAULT_SESSION
+
+
+def test_idle_sessions_expire():
+    pool = SessionPool(idle_timeout=60)
+    session = pool.create()
+    session.last_used -= 120
+    with pytest.raises(SessionError):
+        pool.get(session.id)
+
+
+def test_stats_keep_retired_totals():
+    pool = SessionPool()
+    session = pool.create()
+    session.vm.load_program("START\nLDC 1\nPRN\nHLT")
+    session.vm.run()
+    executed = session.vm.executed
+    assert pool.stats()['executed'] == executed
+    pool.remove(session.id)
+    stats = pool.stats()
+    assert stats['active'] == 0 and stats['executed'] == executed
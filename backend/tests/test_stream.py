@@ -0,0 +1,80 @@
+# /stream: eventos SSE, sessão ocupada, espera por input e cancelamento
+
+import json
+import threading
+
+from tests.util import load
+
+LOOP = "START\nL1 NULL\nJMP L1"
+
+
+def events(resp):
+    """(evento, dados) de uma resposta SSE, à medida que chegam."""
+    for chunk in resp.response:
+        text = chunk.decode() if isinstance(chunk, bytes) else chunk
+        lines = dict(line.split(': ', 1) for line in text.strip().splitlines())
+        yield lines['event'], json.loads(lines['data'])
+
+
+def test_stream_events_until_halt(client):
+    headers = load(client, "START\nLDC 1\nPRN\nLDC 2\nPRN\nHLT")
+    resp = client.get('/stream', headers=headers, buffered=False)
+    assert resp.mimetype == 'text/event-stream'
+    got = list(events(resp))
+    assert got[0] == ('start', {'stream': got[0][1]['stream'], 'pc': 0})
+    assert ('output', {'offset': 0, 'values': [1, 2]}) in got
+    event, final = got[-1]
+    assert event == 'halted'
+    assert final['halted'] and final['output_len'] == 2 and final['steps'] == 6
+
+
+def test_stream_offset_and_step_limit(client):
+    headers = load(client, "START\nLDC 1\nPRN\nLDC 2\nPRN\nL1 NULL\nJMP L1")
+    got = list(events(client.post('/stream', json={'limit': 100, 'offset': 1},
+                                  headers=headers, buffered=False)))
+    assert [d['values'] for e, d in got if e == 'output'] == [[2]]
+    assert got[-1][0] == 'limit' and got[-1][1]['steps'] == 100
+    assert client.get('/stream?limit=x', headers=headers).status_code == 400
+
+
+def test_session_busy_as_soon_as_stream_is_returned(client):
+    # a sessão fica ocupada antes do primeiro evento, como no /run assíncrono
+    headers = load(client, LOOP)
+    resp = client.get('/stream?limit=1000000000000', headers=headers, buffered=False)
+    try:
+        assert client.post('/step', headers=headers).status_code == 409
+        assert client.get('/stream', headers=headers).status_code == 409
+        assert client.post('/upload_program', json={'program': "START\nHLT"},
+                           headers=headers).status_code == 409
+        assert client.post('/load', json={'asm': "START\nHLT"}, headers=headers).status_code == 409
+    finally:
+        resp.close()
+    # fechada sem ter sido lida, a resposta libera a sessão
+    assert client.post('/step', headers=headers).status_code == 200
+
+
+def test_stream_waits_for_input(client):
+    headers = load(client, "START\nRD\nPRN\nHLT")
+    stream = events(client.get('/stream', headers=headers, buffered=False))
+    assert next(stream)[0] == 'start'
+    event, data = next(stream)
+    assert event == 'waiting' and data['pc'] == 1
+    assert client.post('/input', json={'value': 7}, headers=headers).status_code == 200
+    rest = list(stream)
+    assert ('output', {'offset': 0, 'values': [7]}) in rest
+    assert rest[-1][0] == 'halted'
+
+
+def test_stream_cancel(client):
+    headers = load(client, LOOP)
+    stream = events(client.get('/stream?limit=1000000000000', headers=headers, buffered=False))
+    assert next(stream)[0] == 'start'
+    # o fluxo roda neste thread: o cancelamento chega de outro
+    timer = threading.Timer(0.1, lambda: client.post('/stream/cancel', headers=headers))
+    timer.start()
+    try:
+        final = [e for e in stream if e[0] not in ('progress', 'output')]
+    finally:
+        timer.cancel()
+    assert final[-1][0] == 'cancelled'
+    assert client.post('/step', headers=headers).status_code == 200
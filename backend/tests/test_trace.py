@@ -0,0 +1,224 @@
+# Trace de execução (vm_trace): gravação, leitura, arquivo truncado e diff
+
+import os
+import random
+
+import pytest
+
+import vm_trace
+from vm_core import VMError
+from vm_sessions import SessionPool
+from vm_trace import TraceError, TraceReader
+
+from tests.util import load, make_vm, random_program
+
+LOOP = "START\nALLOC 0 2\nLDC 0\nSTR 0\nL1 NULL\nLDV 0\nLDC 1\nADD\nSTR 0\nLDV 0\nLDC 30\nCME\nJMPF L2\nJMP L1\nL2 NULL\nLDV 0\nPRN\nDALLOC 0 2\nHLT"
+
+
+def reference(asm, inputs=(), limit=2000):
+    """(pc, op, sp, topo) de cada passo com step(), e o estado final."""
+    vm = make_vm(asm, inputs)
+    rows = []
+    while not vm.halted and len(rows) < limit:
+        pc = vm.pc
+        try:
+            vm.step()
+        except VMError:
+            break
+        rows.append((pc, vm.code[pc][0], vm.s, vm.M.get(vm.s, 0)))
+    return rows, vm
+
+
+def record(tmp_path, asm, inputs=(), chunk_steps=7, limit=2000, name='t', **options):
+    vm = make_vm(asm, inputs, **options)
+    path = str(tmp_path / f"{name}{vm_trace.EXTENSION}")
+    vm_trace.enable(vm, path, chunk_steps)
+    try:
+        vm.execute(limit)
+    except VMError:
+        pass
+    assert vm_trace.disable(vm) == path
+    return path, vm
+
+
+@pytest.mark.parametrize('options', [{}, {'compiled': True}, {'optimize': True}])
+def test_round_trip_matches_step(tmp_path, options):
+    path, vm = record(tmp_path, LOOP, **options)
+    trace = TraceReader(path)
+    rows, ref = reference(LOOP)
+    assert [(s.pc, s.op, s.sp, s.top) for s in trace] == rows
+    assert [s.step for s in trace] == list(range(len(rows)))
+    assert trace.meta == {'steps': len(rows), 'halted': True, 'last_error': None}
+    assert trace.program == vm_trace.program_hash(vm)
+    # as escritas reconstroem a memória final
+    memory = {}
+    for s in trace:
+        memory.update(s.writes)
+    assert {k: v for k, v in memory.items() if v} == {k: v for k, v in ref.M.items() if v}
+
+
+def test_random_programs_match_step(tmp_path):
+    rng = random.Random(19)
+    for i in range(40):
+        asm = random_program(rng, size=rng.randint(5, 30))
+        inputs = [rng.randint(-2, 5) for _ in range(rng.randint(0, 3))]
+        path, vm = record(tmp_path, asm, inputs, chunk_steps=rng.choice([1, 5, 64]),
+                          limit=300, name=f"r{i}")
+        rows, ref = reference(asm, inputs, limit=300)
+        trace = TraceReader(path)
+        assert [(s.pc, s.op, s.sp, s.top) for s in trace] == rows, asm
+        assert trace.meta['last_error'] == vm.last_error, asm
+
+
+def test_error_is_in_footer_not_recorded(tmp_path):
+    path, _ = record(tmp_path, "START\nLDC 1\nLDC 0\nDIVI\nHLT")
+    trace = TraceReader(path)
+    assert len(trace) == 3
+    assert trace.meta == {'steps': 3, 'halted': True, 'last_error': "Divisão por zero"}
+
+
+def test_random_access_across_chunks(tmp_path):
+    path, _ = record(tmp_path, LOOP, chunk_steps=5)
+    trace = TraceReader(path)
+    steps = list(trace)
+    n = len(trace)
+    assert n > 20
+    for k in (0, 4, 5, 6, n - 1):
+        assert trace[k] == steps[k]
+        assert list(trace.iter_from(k)) == steps[k:]
+    assert list(trace.iter_from(n)) == []
+    with pytest.raises(IndexError):
+        trace[n]
+
+
+def test_truncated_trace_keeps_complete_chunks(tmp_path):
+    path, _ = record(tmp_path, LOOP, chunk_steps=5)
+    reader = TraceReader(path)
+    full = list(reader)
+    offset, first, _ = reader._index[-1]
+    # sem o rodapé e com o último chunk cortado no meio
+    with open(path, 'rb') as f:
+        data = f.read()
+    cut = tmp_path / 'cut.mvdt'
+    cut.write_bytes(data[:offset + 10])
+    trace = TraceReader(str(cut))
+    assert trace.meta == {}
+    assert len(trace) == first
+    assert list(trace) == full[:len(trace)]
+
+
+def test_invalid_files(tmp_path):
+    bad = tmp_path / 'bad.mvdt'
+    bad.write_bytes(b'XXXX' + bytes(40))
+    with pytest.raises(TraceError, match="não é um trace MVD"):
+        TraceReader(str(bad))
+    bad.write_bytes(b'MV')
+    with pytest.raises(TraceError, match="cabeçalho incompleto"):
+        TraceReader(str(bad))
+    bad.write_bytes(vm_trace._HEADER.pack(vm_trace.MAGIC, 99, bytes(32)))
+    with pytest.raises(TraceError, match="formato 99"):
+        TraceReader(str(bad))
+
+
+def test_diff(tmp_path):
+    a, _ = record(tmp_path, "START\nLDC 1\nLDC 2\nADD\nPRN\nHLT", name='a')
+    b, _ = record(tmp_path, "START\nLDC 1\nLDC 3\nADD\nPRN\nHLT", name='b')
+    c, _ = record(tmp_path, "START\nLDC 1\nLDC 2\nADD\nHLT", name='c')
+    ta, tb, tc = TraceReader(a), TraceReader(b), TraceReader(c)
+    assert vm_trace.diff(ta, ta) == []
+    assert vm_trace.diff(ta, tb) == [(2, 'top', 2, 3)]
+    assert vm_trace.diff(ta, tb, limit=5) == [(2, 'top', 2, 3), (3, 'top', 3, 4)]
+    assert vm_trace.diff(ta, tb, fields=('pc', 'op', 'sp')) == []
+    assert vm_trace.diff(ta, tc, fields=('pc',)) == [(5, 'steps', 6, 5)]
+
+
+def test_reload_restarts_trace(tmp_path):
+    vm = make_vm("START\nLDC 1\nPRN\nHLT")
+    path = str(tmp_path / 'x.mvdt')
+    vm_trace.enable(vm, path)
+    vm.execute(100)
+    vm.load_program("START\nHLT")
+    vm.execute(100)
+    vm_trace.disable(vm)
+    assert [s.pc for s in TraceReader(path)] == [0, 1]
+    assert vm_trace.recorder_of(vm) is None and not vm.hooks
+
+
+def test_trace_endpoints(client, tmp_path):
+    import app
+    headers = load(client, LOOP)
+    session = app.sessions.get(headers['X-Session-Id'])
+    assert client.get('/trace', headers=headers).status_code == 404
+    body = client.post('/trace', json={'enabled': True}, headers=headers).get_json()
+    assert body['enabled']
+    client.post('/run', headers=headers)
+    assert client.get('/trace', headers=headers).status_code == 409
+    body = client.post('/trace', json={'enabled': False}, headers=headers).get_json()
+    assert not body['enabled']
+    resp = client.get('/trace', headers=headers)
+    assert resp.status_code == 200
+    os.remove(app.trace_path(session))
+    path = tmp_path / 'down.mvdt'
+    path.write_bytes(resp.data)
+    rows, _ = reference(LOOP)
+    assert [(s.pc, s.op, s.sp, s.top) for s in TraceReader(str(path))] == rows
+
+
+@pytest.mark.parametrize('chunk_steps', [3, 7, 64])
+def test_max_steps_stops_recording(tmp_path, chunk_steps):
+    vm = make_vm(LOOP)
+    path = str(tmp_path / 'cap.mvdt')
+    vm_trace.enable(vm, path, chunk_steps, max_steps=10)
+    vm.execute(2000)
+    vm_trace.disable(vm)
+    rows, _ = reference(LOOP)
+    trace = TraceReader(path)
+    assert [(s.pc, s.op, s.sp, s.top) for s in trace] == rows[:10]
+    # a execução continua até o fim, só a gravação para
+    assert vm.halted
+    assert trace.meta == {'steps': 10, 'halted': True, 'last_error': None, 'truncated': True}
+
+
+def test_close_while_running_discards_later_steps(tmp_path):
+    vm = make_vm(LOOP)
+    path = str(tmp_path / 'x.mvdt')
+    recorder = vm_trace.enable(vm, path, chunk_steps=4)
+    vm.execute(10)
+    recorder.close()
+    vm.execute(2000)
+    assert vm.halted
+    assert len(TraceReader(path)) == 10
+
+
+def test_retired_session_deletes_trace(tmp_path):
+    pool = SessionPool(max_sessions=1)
+    for retire in (lambda s: pool.remove(s.id), lambda s: pool.create()):
+        session = pool.create()
+        session.vm.load_program(LOOP)
+        session.trace_path = str(tmp_path / f"{session.id}.mvdt")
+        recorder = vm_trace.enable(session.vm, session.trace_path)
+        session.vm.execute(5)
+        retire(session)
+        assert recorder._file is None
+        assert not os.path.exists(str(tmp_path / f"{session.id}.mvdt"))
+    # trace já desligado: o arquivo também é apagado
+    session = pool.create()
+    session.trace_path = str(tmp_path / 'off.mvdt')
+    vm_trace.enable(session.vm, session.trace_path)
+    vm_trace.disable(session.vm)
+    pool.remove(session.id)
+    assert not os.path.exists(str(tmp_path / 'off.mvdt'))
+
+
+def test_trace_endpoint_is_capped(client, monkeypatch):
+    import app
+    monkeypatch.setattr(app, 'MAX_TRACE_STEPS', 5)
+    headers = load(client, LOOP)
+    client.post('/trace', json={'enabled': True}, headers=headers)
+    client.post('/run', headers=headers)
+    client.post('/trace', json={'enabled': False}, headers=headers)
+    session = app.sessions.get(headers['X-Session-Id'])
+    trace = TraceReader(app.trace_path(session))
+    assert len(trace) == 5 and trace.meta['truncated']
+    app.sessions.remove(session.id)
+    assert not os.path.exists(app.trace_path(session))
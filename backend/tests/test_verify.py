@@ -0,0 +1,110 @@
+# Verificador estático (vm_verify) e guardas de pilha dos blocos compilados
+
+import pytest
+
+from vm_compile import _BlockWriter, _proven_depth
+from vm_verify import analyze
+
+from tests.util import assert_same_as_step, load, make_vm, step_until_stop
+
+# o bloco de L1 lê duas células: a guarda é "if sp < 1"
+STRAIGHT = "START\nLDC 1\nLDC 2\nJMP L1\nL1 NULL\nADD\nPRN\nHLT"
+# P troca o endereço de retorno e volta para X com a pilha vazia; a análise
+# supõe que RETURN volta para depois do CALL e vê X sempre com 2 células
+FORGED = ("START\nCALL P\nLDC 1\nLDC 2\nJMP X\nX NULL\nADD\nPRN\nHLT\n"
+          "P NULL\nLDC 5\nSTR 0\nRETURN")
+
+
+def analysis(asm):
+    vm = make_vm(asm)
+    return analyze(vm.code, vm.labels)
+
+
+def block_source(asm, label):
+    vm = make_vm(asm)
+    start = vm.labels[label]
+    depth = _proven_depth(vm.code, vm.labels)(start)
+    return _BlockWriter(vm.code, start, len(vm.code), depth).source()[0]
+
+
+def diagnostics(asm):
+    return [(d['addr'], d['level'], d['message']) for d in analysis(asm).diagnostics()]
+
+
+def test_depth_and_safe_instructions():
+    report = analysis(STRAIGHT).report()
+    assert report['sound']
+    assert [i['depth'] for i in report['instructions']] == [0, 0, 1, 2, 2, 2, 1, 0]
+    assert [i['addr'] for i in report['instructions'] if i['safe']] == [5, 6]
+    assert (report['safe'], report['checked']) == (2, 2)
+
+    a = analysis("START\nRD\nJMPF L1\nLDC 1\nL1 NULL\nLDC 2\nL2 NULL\nLDC 3\nJMP L2")
+    assert a.depth(4) == (0, 1)
+    assert a.depth(6) == (1, None)   # laço que só empilha: alargado
+
+
+def test_proven_block_drops_stack_guard():
+    vm = make_vm(STRAIGHT)
+    assert _proven_depth(vm.code, vm.labels)(vm.labels['L1']) == 2
+    assert "if sp < 1:" not in block_source(STRAIGHT, 'L1')
+    # sem prova (profundidade 0) o mesmo bloco tem a guarda
+    start = vm.labels['L1']
+    assert "if sp < 1:" in _BlockWriter(vm.code, start, len(vm.code), 0).source()[0]
+    assert_same_as_step(STRAIGHT, compiled=True)
+
+
+def test_call_without_return_is_still_proven():
+    asm = "START\nLDC 1\nCALL P\nHLT\nP NULL\nADD\nPRN\nHLT"
+    assert analysis(asm).sound
+    assert "if sp < 1:" not in block_source(asm, 'P')
+    vm = make_vm(asm, compiled=True)
+    vm.execute(100)
+    assert vm.output == [4]
+
+
+def test_programs_with_return_keep_guards():
+    # o limite do verificador: com RETURN a profundidade não é usada pelos
+    # motores, porque o endereço de retorno pode ter sido alterado
+    a = analysis(FORGED)
+    assert not a.sound
+    assert a.depth(6) == (2, 2)
+    vm = make_vm(FORGED)
+    assert _proven_depth(vm.code, vm.labels)(vm.labels['X']) == 0
+    assert "if sp < 1:" in block_source(FORGED, 'X')
+    # e de fato X é alcançado com a pilha vazia
+    assert step_until_stop(make_vm(FORGED)) == (8, "Pilha vazia")
+    assert_same_as_step(FORGED, compiled=True)
+
+
+@pytest.mark.parametrize('asm, expected', [
+    ("START\nADD\nHLT", [
+        (1, 'error', "ADD: pilha insuficiente (0 células, precisa de 2)"),
+        (2, 'warning', "código inalcançável (2..2)")]),
+    ("START\nRD\nJMPF L1\nLDC 1\nL1 NULL\nADD\nHLT", [
+        (5, 'error', "ADD: pilha insuficiente (0 a 1 células, precisa de 2)")]),
+    ("START\nLDC 1\nDALLOC 0 1\nHLT", [
+        (2, 'error', "DALLOC 0 1 sem ALLOC correspondente")]),
+    ("START\nALLOC 0 2\nHLT", [
+        (2, 'warning', "HLT com ALLOC 0 2 sem DALLOC")]),
+    ("START\nRETURN", [
+        (1, 'error', "RETURN: pilha insuficiente (0 células, precisa de 1)"),
+        (1, 'warning', "RETURN fora de procedimento")]),
+    ("START\nX: FOO\nHLT", [
+        (1, 'error', "Instrução inválida: FOO"),
+        (2, 'warning', "código inalcançável (2..2)")]),
+])
+def test_diagnostics(asm, expected):
+    assert diagnostics(asm) == expected
+
+
+def test_procedure_effect():
+    report = analysis(FORGED).report()
+    assert report['procedures'] == [{'addr': 9, 'name': 'P', 'effect': [0, 0], 'calls': 1}]
+
+
+def test_load_with_verify(client):
+    resp = client.post('/load', json={'asm': "START\nADD\nHLT", 'verify': True})
+    assert resp.status_code == 200
+    assert resp.get_json()['diagnostics'][0]['message'].startswith("ADD: pilha insuficiente")
+    headers = load(client, STRAIGHT)
+    assert 'diagnostics' not in client.post('/load', json={'asm': STRAIGHT}, headers=headers).get_json()
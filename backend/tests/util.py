@@ -0,0 +1,140 @@
+# backend/tests/util.py
+# Utilitários comuns aos testes: montar VMs e comparar estados
+
+from bench import corpus
+from vm_core import VM, VMError
+
+# opções de make_vm de cada motor/modelo de memória comparado com step()
+ENGINES = [{}, {'compiled': True}, {'optimize': True}, {'memory': 'array'}]
+# programas do corpus pequenos o bastante para step() (fact_rec(40):
+# inteiros grandes no modelo de memória em array)
+SMALL_CORPUS = [corpus.loop_sum(300), corpus.fib_rec(8), corpus.fact_rec(12, 2),
+                corpus.fact_rec(40, 2), corpus.prn_heavy(50), corpus.rd_sum(40),
+                corpus.large_generated(40)]
+
+
+def engine_id(options):
+    # id dos testes parametrizados: 'fast', 'compiled', 'optimize', 'array'
+    return ','.join(name if value is True else str(value) for name, value in options.items()) or 'fast'
+
+
+def make_vm(asm, inputs=(), memory='dict', **options):
+    """VM com o programa carregado; options = atributos (compiled, optimize, max_cells...)."""
+    vm = VM(memory)
+    for name, value in options.items():
+        setattr(vm, name, value)
+    vm.load_program(asm)
+    vm.enqueue_inputs(list(inputs))
+    return vm
+
+
+def step_until_stop(vm, limit=1000000):
+    """Referência: step() um a um até parar; retorna (passos, erro)."""
+    steps = 0
+    while not vm.halted and steps < limit:
+        try:
+            vm.step()
+        except VMError as e:
+            return steps + 1, str(e)
+        steps += 1
+    return steps, None
+
+
+def execute_until_stop(vm, limit=1000000):
+    """Como step_until_stop, mas com execute() (o motor escolhido pela VM)."""
+    try:
+        return vm.execute(limit), None
+    except VMError as e:
+        return None, str(e)
+
+
+def state(vm):
+    """Estado observável (snapshot + sp), para comparar motores de execução."""
+    snap = vm.snapshot()
+    snap['sp'] = vm.s
+    snap['input_left'] = list(vm.input_queue)
+    return snap
+
+
+def nonzero_memory(vm):
+    # memória sem os zeros implícitos (compara modelos de memória diferentes)
+    return {k: v for k, v in vm.M.items() if v != 0}
+
+
+# -----------------------
+# Programas aleatórios (testes diferenciais)
+# -----------------------
+_SIMPLE_OPS = ('ADD', 'SUB', 'MULT', 'DIVI', 'INV', 'AND', 'OR', 'NEG', 'CME', 'CMA',
+               'CEQ', 'CDIF', 'CMEQ', 'CMAQ', 'PRN', 'NULL', 'RETURN', 'START', 'HLT')
+_SIMPLE_WEIGHTS = (3, 3, 3, 2, 1, 1, 1, 1, 2, 2, 2, 2, 2, 2, 2, 1, 1, .3, .3)
+
+
+def random_program(rng, size=30, nlabels=4):
+    """Programa MVD aleatório (válido para o montador), com saltos, CALL/RETURN e RD."""
+    labels = [f"L{i}" for i in range(nlabels)]
+    marks = sorted(rng.sample(range(size), nlabels))
+    lines = []
+    for i in range(size):
+        if i in marks:
+            label = labels[marks.index(i)]
+            lines.append(f"{label} NULL" if rng.random() < .5 else f"{label}:")
+        r = rng.random()
+        if r < .25:
+            lines.append(f"LDC {rng.randint(-3, 5)}")
+        elif r < .35:
+            lines.append(f"LDV {rng.randint(-1, 8)}")
+        elif r < .45:
+            lines.append(f"STR {rng.randint(-1, 8)}")
+        elif r < .55:
+            lines.append(f"{rng.choice(['JMP', 'JMPF', 'JMPF', 'CALL'])} {rng.choice(labels)}")
+        elif r < .6:
+            lines.append(f"{rng.choice(['ALLOC', 'DALLOC'])} {rng.randint(0, 6)} {rng.randint(0, 3)}")
+        elif r < .63:
+            lines.append("RD")
+        else:
+            lines.append(rng.choices(_SIMPLE_OPS, weights=_SIMPLE_WEIGHTS)[0])
+    if rng.random() < .7:
+        lines.append("HLT")
+    return "\n".join(lines)
+
+
+def assert_same_as_step(asm, inputs=(), limit=500, memory='dict', **options):
+    """execute() com as opções dadas produz o mesmo que step() um a um."""
+    ref = make_vm(asm, inputs)
+    steps, error = step_until_stop(ref, limit)
+    vm = make_vm(asm, inputs, memory, **options)
+    count, got = execute_until_stop(vm, limit)
+    assert got == error, asm
+    if error is None:
+        assert count == steps, asm
+    # executed conta os passos completos, inclusive antes de um erro
+    assert vm.executed == steps - (error is not None), asm
+    if memory == 'dict':
+        assert state(vm) == state(ref), asm
+    else:
+        expected, actual = state(ref), state(vm)
+        expected.pop('mem')
+        actual.pop('mem')
+        assert actual == expected, asm
+        assert nonzero_memory(vm) == nonzero_memory(ref), asm
+
+
+# -----------------------
+# API (cliente de teste do Flask)
+# -----------------------
+def load(client, asm, **fields):
+    """POST /load numa sessão nova; retorna o header com o id da sessão."""
+    resp = client.post('/load', json={'asm': asm, **fields})
+    assert resp.status_code == 200, resp.get_json()
+    return {'X-Session-Id': resp.get_json()['session']}
+
+
+def wait_job(client, job_id, timeout=10.0):
+    """Espera o job terminar (polling de /jobs/<id>); retorna o último progresso."""
+    import time
+    deadline = time.monotonic() + timeout
+    while True:
+        info = client.get(f'/jobs/{job_id}').get_json()
+        if info['status'] != 'running' or time.monotonic() > deadline:
+            return info
+        time.sleep(0.01)
@@ -0,0 +1,338 @@
+# backend/vm_compile.py
+# Nível compilado da MVD
+#
+# - Divide o código decodificado em blocos básicos: começam no endereço 0, nos
+#   rótulos/alvos de JMP/JMPF/CALL e depois de cada instrução que desvia
+#   (JMP, CALL, RETURN, START, HLT, instrução inválida). JMPF sai do bloco
+#   quando desvia e continua nele quando não desvia.
+# - Cada bloco vira uma função Python gerada; o topo da pilha fica em variáveis
+#   locais (a memória continua recebendo cada escrita, então M está sempre
+#   correta) e sp só é atualizado na saída do bloco.
+# - Assinatura: bloco(M, Mget, sp, out, inq, budget) -> (pc, sp, passos
+#   executados). Um bloco que termina com JMP para o próprio início vira um
+#   laço dentro da função, que devolve o controle antes de passar de budget.
+# - Casos raros saem do bloco antes da instrução ("saída lateral"): pilha
+#   insuficiente na entrada, divisão por zero, RD sem input, HLT e instruções
+#   inválidas. A VM executa essa instrução com step(), que produz exatamente os
+#   mesmos erros e efeitos do interpretador.
+# - Com limite de memória (vm.max_cells), ALLOC que passaria dele é uma saída
+#   lateral: step() levanta o erro antes de alocar. O limite entra no código
+#   gerado e na chave do cache.
+# - Em programas sem RETURN a profundidade mínima da pilha em cada endereço é
+#   provada pelo verificador estático (vm_verify); blocos cuja entrada sempre
+#   tem células suficientes são gerados sem a guarda de pilha.
+# - O código gerado é compilado uma vez e guardado num cache indexado pelo
+#   programa decodificado (VMs com o mesmo programa compartilham os blocos).
+
+import threading
+from collections import OrderedDict
+
+from vm_core import (
+    OP_HLT, OP_START, OP_LDC, OP_LDV, OP_ADD, OP_SUB, OP_MULT, OP_DIVI, OP_INV,
+    OP_AND, OP_OR, OP_NEG, OP_CME, OP_CMA, OP_CEQ, OP_CDIF, OP_CMEQ, OP_CMAQ,
+    OP_STR, OP_JMP, OP_JMPF, OP_NULL, OP_RD, OP_PRN,
+    OP_ALLOC, OP_DALLOC, OP_CALL, OP_RETURN,
+)
+from vm_verify import analyze
+
+CACHE_SIZE = 32          # programas compilados guardados
+MAX_BLOCK = 256          # instruções por bloco (programas retos muito longos)
+UNROLL_ALLOC = 8         # ALLOC/DALLOC maiores que isso viram laço
+
+_BINARY = {
+    OP_ADD: "{x} + {y}",
+    OP_SUB: "{x} - {y}",
+    OP_MULT: "{x} * {y}",
+    OP_DIVI: "{x} // {y}",
+    OP_AND: "1 if {x} == 1 and {y} == 1 else 0",
+    OP_OR: "0 if {x} == 0 and {y} == 0 else 1",
+    OP_CME: "1 if {x} < {y} else 0",
+    OP_CMA: "1 if {x} > {y} else 0",
+    OP_CEQ: "1 if {x} == {y} else 0",
+    OP_CDIF: "1 if {x} != {y} else 0",
+    OP_CMEQ: "1 if {x} <= {y} else 0",
+    OP_CMAQ: "1 if {x} >= {y} else 0",
+}
+# instruções que encerram o bloco (a seguinte começa outro); JMPF é uma saída
+# condicional no meio do bloco
+_ENDS = (OP_JMP, OP_CALL, OP_RETURN, OP_START, OP_HLT)
+_KNOWN = set(_BINARY) | set(_ENDS) | {OP_LDC, OP_LDV, OP_INV, OP_NEG, OP_STR, OP_JMPF,
+                                      OP_NULL, OP_RD, OP_PRN, OP_ALLOC, OP_DALLOC}
+
+_cache = OrderedDict()   # (tuple(code), max_cells) -> blocos
+_cache_lock = threading.Lock()
+
+
+def compile_program(code, labels=None, max_cells=None):
+    """
+    Blocos compilados do programa: lista indexada por endereço com
+    (função, nº de instruções) nos inícios de bloco e None no resto.
+    """
+    # a chave é o próprio programa: o dict compara por hash e igualdade
+    key = (tuple(code), max_cells)
+    with _cache_lock:
+        blocks = _cache.get(key)
+        if blocks is not None:
+            _cache.move_to_end(key)
+            return blocks
+    blocks = _build(code, labels or {}, max_cells)
+    with _cache_lock:
+        _cache[key] = blocks
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return blocks
+
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
+
+
+def leaders(code, labels):
+    """Endereços onde começa um bloco básico."""
+    n = len(code)
+    starts = {0}
+    starts.update(addr for addr in labels.values() if 0 <= addr < n)
+    for addr, (op, a, _) in enumerate(code):
+        if op in (OP_JMP, OP_JMPF, OP_CALL) and 0 <= a < n:
+            starts.add(a)
+        if op in _ENDS or op not in _KNOWN:
+            starts.add(addr + 1)
+    starts.discard(n)
+    return sorted(starts)
+
+
+def _build(code, labels, max_cells=None):
+    n = len(code)
+    starts = leaders(code, labels)
+    bounds = []
+    for i, start in enumerate(starts):
+        end = starts[i + 1] if i + 1 < len(starts) else n
+        while end - start > MAX_BLOCK:
+            bounds.append((start, start + MAX_BLOCK))
+            start += MAX_BLOCK
+        bounds.append((start, end))
+
+    depth = _proven_depth(code, labels)
+    sources = []
+    lengths = {}
+    for start, end in bounds:
+        src, length = _BlockWriter(code, start, end, depth(start), max_cells).source()
+        sources.append(src)
+        lengths[start] = length
+    namespace = {}
+    exec(compile("\n\n".join(sources), '<mvd-compiled>', 'exec'), namespace)
+
+    blocks = [None] * n
+    for start, length in lengths.items():
+        if length:
+            blocks[start] = (namespace[f"_b{start}"], length)
+    return blocks
+
+
+def _proven_depth(code, labels):
+    """
+    Função endereço -> profundidade mínima provada na entrada (0 = nada
+    provado). A prova só vale sem RETURN: o endereço de retorno é um valor
+    comum da pilha e pode levar a qualquer lugar.
+    """
+    if any(op == OP_RETURN for op, _, _ in code):
+        return lambda addr: 0
+    analysis = analyze(code, labels)
+
+    def depth(addr):
+        found = analysis.depth(addr)
+        return found[0] if found else 0
+    return depth
+
+
+class _BlockWriter:
+    """Gera o código de um bloco [start, end)."""
+
+    def __init__(self, code, start, end, depth=0, max_cells=None):
+        self.code = code
+        self.depth = depth   # células provadas na entrada (vm_verify)
+        self.max_cells = max_cells
+        self.start = start
+        self.end = end
+        self.lines = []
+        self.d = 0           # sp = sp da entrada + d
+        self.cache = {}      # d -> expressão com o valor da célula sp + d
+        self.need = -1       # guarda: sp da entrada >= need (sp nunca é < -1)
+        self.pending = {}    # d -> linha da última escrita em sp + d ainda não lida
+        self.temps = 0
+        # bloco que termina em "JMP início" vira um laço dentro da função,
+        # limitado pelo orçamento de passos (budget)
+        last = start
+        while last + 1 < end and code[last][0] in _KNOWN and code[last][0] not in _ENDS:
+            last += 1
+        self.loop = code[last][0] == OP_JMP and code[last][1] == start
+        self.indent = "        " if self.loop else "    "
+
+    # ----- pilha simbólica -----
+    def slot(self, d):
+        if d == 0:
+            return "sp"
+        return f"sp + {d}" if d > 0 else f"sp - {-d}"
+
+    def touch(self, d):
+        # a célula sp + d precisa existir na entrada (d <= 0) -> guarda
+        if -d > self.need:
+            self.need = -d
+
+    def read(self, d):
+        if d in self.cache:
+            return self.cache[d]
+        self.touch(d)
+        return f"M[{self.slot(d)}]"
+
+    def temp(self, expr):
+        self.temps += 1
+        name = f"t{self.temps}"
+        self.emit(f"{name} = {expr}")
+        return name
+
+    def store(self, d, value):
+        # escreve a célula e lembra o valor (constante ou variável local);
+        # uma escrita anterior na mesma célula, sem leitura de M nem saída do
+        # bloco no meio, nunca é observada e é descartada
+        if d in self.pending:
+            self.lines[self.pending[d]] = None
+        self.lines.append(f"{self.indent}M[{self.slot(d)}] = {value}")
+        self.pending[d] = len(self.lines) - 1
+        self.cache[d] = value
+
+    def push(self, value):
+        self.d += 1
+        self.store(self.d, value)
+
+    def emit(self, line):
+        # só contas em variáveis locais preservam as escritas pendentes
+        if not line.startswith('t') or 'M' in line:
+            self.pending.clear()
+        self.lines.append(self.indent + line)
+
+    def exit(self, pc, executed, sp_expr=None):
+        sp = self.slot(self.d) if sp_expr is None else sp_expr
+        if self.loop:
+            executed = f"n + {executed}" if executed else "n"
+        return f"return {pc}, {sp}, {executed}"
+
+    # ----- geração -----
+    def source(self):
+        length = 0
+        for pc in range(self.start, self.end):
+            if not self.instr(pc, pc - self.start):
+                break
+            length += 1
+            if self.code[pc][0] in _ENDS:
+                break
+        else:
+            # fim do bloco sem desvio: segue para o próximo endereço
+            self.emit(self.exit(self.end, length))
+        head = [f"def _b{self.start}(M, Mget, sp, out, inq, budget):"]
+        guard = []
+        if self.need >= self.depth:
+            guard = [f"{self.indent}if sp < {self.need}:",
+                     f"{self.indent}    {self.exit(self.start, 0, 'sp')}"]
+        if self.loop:
+            head += ["    n = 0", "    while True:"]
+        body = [line for line in self.lines if line is not None]
+        return "\n".join(head + guard + (body or ["    pass"])), length
+
+    def instr(self, pc, n):
+        """Emite a instrução pc (n = já executadas no bloco); False = saída lateral."""
+        op, a, b = self.code[pc]
+        d = self.d
+
+        if op == OP_LDC:
+            self.push(repr(a))
+        elif op == OP_LDV:
+            self.push(self.temp(f"Mget({a}, 0)"))
+        elif op in _BINARY:
+            x, y = self.read(d - 1), self.read(d)
+            if op == OP_DIVI:
+                if y == '0':
+                    self.emit(self.exit(pc, n))
+                    return False
+                if not y.lstrip('-').isdigit():
+                    self.emit(f"if {y} == 0:")
+                    self.emit("    " + self.exit(pc, n))
+            self.d -= 1
+            self.cache.pop(d, None)
+            self.store(d - 1, self.temp(_BINARY[op].format(x=x, y=y)))
+        elif op == OP_INV:
+            self.store(d, self.temp(f"-{self.read(d)}"))
+        elif op == OP_NEG:
+            self.store(d, self.temp(f"1 - {self.read(d)}"))
+        elif op == OP_STR:
+            self.emit(f"M[{a}] = {self.read(d)}")
+            self.d -= 1
+            # M[a] pode ser uma célula da pilha: descarta os valores lembrados
+            self.cache.clear()
+        elif op == OP_NULL:
+            pass
+        elif op == OP_RD:
+            self.emit("if not inq:")
+            self.emit("    " + self.exit(pc, n))
+            self.push(self.temp("inq.popleft()"))
+        elif op == OP_PRN:
+            self.emit(f"out.append({self.read(d)})")
+            self.d -= 1
+        elif op == OP_ALLOC:
+            if self.max_cells is not None and b > 0:
+                # passaria do limite de memória: step() levanta o erro
+                self.emit(f"if {self.slot(d + b)} >= {self.max_cells}:")
+                self.emit("    " + self.exit(pc, n))
+            if b > UNROLL_ALLOC:
+                self.emit(f"for k in range({b}):")
+                self.emit(f"    M[{self.slot(d + 1)} + k] = Mget({a} + k, 0)")
+                self.d += b
+            else:
+                for k in range(b):
+                    self.push(self.temp(f"Mget({a + k}, 0)"))
+        elif op == OP_DALLOC:
+            if b <= 0:
+                pass
+            elif b > UNROLL_ALLOC:
+                self.touch(d - b + 1)
+                self.emit(f"for k in range({b - 1}, -1, -1):")
+                self.emit(f"    M[{a} + k] = M[{self.slot(d - b + 1)} + k]")
+                self.d -= b
+                self.cache.clear()
+            else:
+                for k in reversed(range(b)):
+                    self.emit(f"M[{a + k}] = {self.read(self.d)}")
+                    self.d -= 1
+                    self.cache.clear()
+        elif op == OP_JMP:
+            if self.loop and a == self.start:
+                # volta ao início do laço se o orçamento comportar mais uma volta
+                if self.d:
+                    self.emit(f"sp = {self.slot(self.d)}")
+                self.emit(f"n += {n + 1}")
+                self.emit(f"if n + {n + 1} > budget:")
+                self.emit(f"    return {a}, sp, n")
+            else:
+                self.emit(self.exit(a, n + 1))
+        elif op == OP_JMPF:
+            # desvio condicional: sai do bloco se falso, senão continua nele
+            x = self.read(d)
+            self.d -= 1
+            self.cache.pop(d, None)
+            self.emit(f"if {x} == 0:")
+            self.emit("    " + self.exit(a, n + 1))
+        elif op == OP_CALL:
+            self.push(repr(pc + 1))
+            self.emit(self.exit(a, n + 1))
+        elif op == OP_RETURN:
+            x = self.read(d)
+            self.d -= 1
+            self.emit(self.exit(f"int({x})", n + 1))
+        elif op == OP_START:
+            self.emit(self.exit(pc + 1, n + 1, "-1"))
+        else:
+            # HLT, instrução inválida: step() executa
+            self.emit(self.exit(pc, n))
+            return False
+        return True
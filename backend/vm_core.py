@@ -1,27 +1,148 @@
 # backend/vm_core.py
 # Máquina Virtual Didática (MVD)
 #
-# - Montador em duas passagens (detecta labels), mas NÃO substitui tokens por endereços.
+# - Montador em duas passagens: a 1ª detecta labels e monta P (texto tokenizado);
+#   a 2ª decodifica P em self.code (opcodes inteiros, operandos já convertidos e
+#   alvos de JMP/JMPF/CALL já resolvidos para endereços).
 # - Execução (step) usa bloco de instruções fiel ao while True que você forneceu,
-#   executando exatamente uma instrução por chamada a step().
+#   executando exatamente uma instrução decodificada por chamada a step().
+# - run() usa execute(): laço rápido com pc/sp/memória em variáveis locais,
+#   que delega a step() os casos de erro para manter o mesmo comportamento.
+# - Opcional (vm.compiled = True): execute() roda blocos básicos traduzidos
+#   para Python e compilados (vm_compile), com o mesmo comportamento.
+# - Opcional (vm.optimize = True): load_program gera também um código otimizado
+#   (vm_optimize: superinstruções, dobra de constantes, NULL de rótulo
+#   pulado), alinhado com os endereços originais, usado pelo laço rápido.
+# - Verificador estático (vm.analyze(), vm_verify): profundidade da pilha por
+#   instrução, underflow, código inalcançável e ALLOC/DALLOC desbalanceados.
 # - CALL empilha retorno na pilha de dados; RETURN desempilha.
-# - RD levanta VMError quando fila de input vazia; enqueue_input "acorda" a VM.
+# - RD levanta InputWait (um VMError) quando a fila de input (deque) está vazia;
+#   enqueue_input/enqueue_inputs "acordam" a VM.
+
+import functools
+import time
+from collections import deque, namedtuple
+
+from vm_debug import compile_condition
+from vm_memory import MEMORY_MODELS
+
+# quantas versões o log de mudanças guarda para responder deltas (since=...)
+CHANGE_LOG_SIZE = 1024
+# passos de execute() entre as verificações do limite de memória em run()
+RUN_CHUNK = 50000
+
 
 class VMError(Exception):
     pass
 
 
+class InputWait(VMError):
+    # RD com a fila de input vazia: a VM espera input (não para)
+    pass
+
+
+# programa montado: texto tokenizado, rótulos e código decodificado
+# (compartilhado entre VMs pelo cache de programas: não é alterado depois de montado)
+Program = namedtuple('Program', 'P labels code')
+
+
+# -----------------------
+# Opcodes decodificados
+# -----------------------
+OP_NAMES = (
+    'HLT', 'START', 'LDC', 'LDV', 'ADD', 'SUB', 'MULT', 'DIVI', 'INV',
+    'AND', 'OR', 'NEG', 'CME', 'CMA', 'CEQ', 'CDIF', 'CMEQ', 'CMAQ',
+    'STR', 'JMP', 'JMPF', 'NULL', 'RD', 'PRN',
+    'ALLOC', 'DALLOC',
+    'CALL', 'RETURN',
+)
+OPCODES = {name: i for i, name in enumerate(OP_NAMES)}
+
+(OP_HLT, OP_START, OP_LDC, OP_LDV, OP_ADD, OP_SUB, OP_MULT, OP_DIVI, OP_INV,
+ OP_AND, OP_OR, OP_NEG, OP_CME, OP_CMA, OP_CEQ, OP_CDIF, OP_CMEQ, OP_CMAQ,
+ OP_STR, OP_JMP, OP_JMPF, OP_NULL, OP_RD, OP_PRN,
+ OP_ALLOC, OP_DALLOC,
+ OP_CALL, OP_RETURN) = range(len(OP_NAMES))
+
+# instrução que falha ao executar (opcode inválido, operando mal formado...);
+# o operando guarda a mensagem, levantada só quando a linha é executada.
+OP_ERR = len(OP_NAMES)
+# sentinela anexada ao fim do código executável: cair nela = sair do programa.
+OP_END = OP_ERR + 1
+# armadilha de breakpoint: substitui a instrução em _xcode (a original segue em code)
+OP_BRK = OP_END + 1
+
+# instruções fundidas pelo otimizador (vm_optimize); só aparecem no código
+# otimizado e cada uma consome no máximo FUSE_MAX passos
+(OP_VC_JMPF, OP_VV_JMPF, OP_VC_STR, OP_VV_STR, OP_VC_BIN, OP_VV_BIN,
+ OP_CMP_JMPF, OP_V_STR, OP_C_STR, OP_KPUSH, OP_JMP_N, OP_JMPF_N, OP_CALL_N) = range(OP_BRK + 1, OP_BRK + 14)
+FUSE_MAX = 8
+
+_INT_OPS = (OP_LDC, OP_LDV, OP_STR)
+_LABEL_OPS = (OP_JMP, OP_JMPF, OP_CALL)
+_PAIR_OPS = (OP_ALLOC, OP_DALLOC)
+
+
 class VM:
-    def __init__(self):
+    def __init__(self, memory='dict'):
+        self.set_memory_model(memory)
+        self._max_cells = None
+        self.track_changes = False # registra endereços alterados para delta()
+        self.compiled = False      # execute() usa os blocos compilados (vm_compile)
+        self.optimize = False      # load_program gera o código otimizado (vm_optimize)
+        self.program_cache = None  # cache de programas montados (vm_objfile.ProgramCache)
+        self.history = None        # histórico para voltar passos (vm_history.History)
+        # observadores por instrução (profiler, ...): after_step(vm, pc, instr, sp)
+        # e reset(vm) ao carregar/reiniciar; com algum ativo, execute() usa o
+        # laço instrumentado.
+        self.hooks = []
+        # totais desde a criação da VM (métricas, vm_metrics): somados por
+        # execute()/step(), fora dos laços de execução
+        self.executed = 0
+        self.exec_seconds = 0.0
+        self._partial = 0           # passos de execute() antes de um VMError
         self.reset_all()
 
+    @property
+    def max_cells(self):
+        # limite opcional de células de memória (sessões, corretor): ALLOC
+        # que passaria dele falha antes de alocar; o resto é verificado nas
+        # fronteiras de step/run (check_memory)
+        return self._max_cells
+
+    @max_cells.setter
+    def max_cells(self, value):
+        self._max_cells = value
+        self._blocks = None     # os blocos compilados embutem o limite
+
+    def set_memory_model(self, memory):
+        # modelo de memória: 'dict' (padrão, esparso) ou 'array' (compacto);
+        # vale a partir do próximo load_program/reset.
+        if memory not in MEMORY_MODELS:
+            raise VMError(f"Modelo de memória inválido: {memory}")
+        self.memory_model = memory
+
     def reset_all(self):
         # Programa / montagem
         self.P = []            # lista de instruções tokenizadas
         self.labels = {}       # mapa label -> endereço (índice em P)
+        self.code = []         # P decodificado: tuplas (opcode, a, b)
+        self._xcode = [(OP_END, None, None)]   # code + sentinela (+ breakpoints), usado por execute()
+        self._blocks = None    # blocos compilados de code (gerados no primeiro uso)
+        self._analysis = None  # relatório do verificador estático (gerado no primeiro uso)
+        self._ocode = None     # code otimizado (mesmos endereços) ou None
+        self._spans = {}       # instrução fundida -> endereços originais que ela cobre
+        self._oxcode = None    # _ocode + sentinela (+ breakpoints)
+
+        # Depuração
+        self.breakpoints = {}  # endereço -> (texto da condição, cond) ou (None, None)
+        self.watchpoints = {}  # endereço -> valor alvo (None = qualquer mudança)
+        self.stop_reason = None    # 'breakpoint' / 'watchpoint' quando execute() parou antes
+        self.stop_info = None
+        self._bp_resume = None     # breakpoint em que a execução parou (retomada)
 
         # Memória / pilha de dados
-        self.M = {}            # memória (endereço:int -> valor:int)
+        self.M = MEMORY_MODELS[self.memory_model]()   # memória (endereço:int -> valor:int)
         self.s = -1            # topo da pilha (sp)
 
         # Controle de execução
@@ -31,7 +152,11 @@ class VM:
         self.output = []
 
         # I/O
-        self.input_queue = []
+        self.input_queue = deque()  # valores já convertidos para int (enqueue_input)
+
+        # Versões do estado (snapshots delta)
+        self.version = 0
+        self._changes = deque(maxlen=CHANGE_LOG_SIZE)   # (versão, endereços|None, len(output))
 
     # -----------------------
     # Montador / Carregador
@@ -42,18 +167,69 @@ class VM:
          - aceita labels no início da linha (numéricos ou textuais), com ou sem ':'.
          - registra labels em self.labels -> índice em P.
          - mantém as instruções em self.P sem substituir tokens.
+         - decodifica P em self.code; rótulos indefinidos levantam VMError.
+         - com program_cache, um texto já montado antes não é montado de novo.
         """
-        # reset parcial
+        self._unload()
+        cache = self.program_cache
+        program = cache.get(asm_text) if cache is not None else None
+        if program is None:
+            try:
+                program = self.assemble(asm_text)
+            except VMError:
+                self._reset_hooks()
+                raise
+            if cache is not None:
+                cache.put(asm_text, program)
+        self._install(program)
+
+    def load_assembled(self, program):
+        """Carrega um programa já montado (Program: P, labels, code), sem o montador."""
+        self._unload()
+        self._install(program)
+
+    def _unload(self):
+        # reset parcial: descarta o programa e o estado de execução
         self.P = []
         self.labels = {}
-        self.M = {}
+        self.code = []
+        self._xcode = [(OP_END, None, None)]
+        self._blocks = None
+        self._analysis = None
+        self._ocode = None
+        self._spans = {}
+        self._oxcode = None
+        self.breakpoints = {}
+        self.watchpoints = {}
+        self._bp_resume = None
+        self.M = MEMORY_MODELS[self.memory_model]()
         self.s = -1
         self.pc = 0
         self.halted = False
         self.last_error = None
         self.output = []
-        self.input_queue = []
-
+        self.input_queue = deque()
+        self._record_change(None)
+
+    def _install(self, program):
+        self.P = program.P
+        self.labels = dict(program.labels)
+        self.code = program.code
+        if self.optimize:
+            # import tardio: vm_optimize importa os opcodes deste módulo
+            from vm_optimize import optimize
+            self._ocode, self._spans = optimize(self.code)
+        self._build_xcode()
+        self._reset_hooks()
+
+    @staticmethod
+    def assemble(asm_text):
+        """
+        Montador em duas passagens: texto -> Program(P, labels, code).
+        Rótulos indefinidos levantam VMError com todos os que faltam.
+        """
+        P = []
+        labels = {}
         valid_instr = {
             'START', 'LDC', 'LDV', 'ADD', 'SUB', 'MULT', 'DIVI', 'INV',
             'AND', 'OR', 'NEG', 'CME', 'CMA', 'CEQ', 'CDIF', 'CMEQ', 'CMAQ',
@@ -82,112 +258,198 @@ class VM:
             # se é número puro no início -> label numérico
             if t_clean.isdigit():
                 label = t_clean
-                self.labels[label] = len(self.P)
+                labels[label] = len(P)
                 # criar alias L<num>
                 l_alias = 'L' + label
-                if l_alias not in self.labels:
-                    self.labels[l_alias] = self.labels[label]
+                if l_alias not in labels:
+                    labels[l_alias] = labels[label]
                 # se tiver instrução depois do label, anexa
                 if len(parts) > 1:
-                    self.P.append(parts[1:])
+                    P.append(parts[1:])
                 else:
                     # label sozinho -> tratamos como NULL (linha de rótulo)
-                    self.P.append(['NULL'])
+                    P.append(['NULL'])
                 continue
 
             # se termina com ':' -> label textual
             if first_token.endswith(':'):
                 label = t_clean
-                self.labels[label] = len(self.P)
+                labels[label] = len(P)
                 # alias numérico se for L<num>
                 if label.upper().startswith('L') and label[1:].isdigit():
                     num = label[1:]
-                    if num not in self.labels:
-                        self.labels[num] = self.labels[label]
+                    if num not in labels:
+                        labels[num] = labels[label]
                 # se houver instrução na mesma linha
                 if len(parts) > 1:
-                    self.P.append(parts[1:])
+                    P.append(parts[1:])
                 else:
-                    self.P.append(['NULL'])
+                    P.append(['NULL'])
                 continue
 
             # se começa com instrução válida -> instrução normal
             if t_clean.upper() in valid_instr:
-                self.P.append(parts)
+                P.append(parts)
                 continue
 
             # se começa com palavra não-instrucao e próxima token é NULL, tratamos como label
             if len(parts) >= 2 and parts[1].upper() == 'NULL':
                 label = t_clean
-                self.labels[label] = len(self.P)
+                labels[label] = len(P)
                 if label.upper().startswith('L') and label[1:].isdigit():
                     num = label[1:]
-                    if num not in self.labels:
-                        self.labels[num] = self.labels[label]
+                    if num not in labels:
+                        labels[num] = labels[label]
                 if label.isdigit():
                     lalias = 'L' + label
-                    if lalias not in self.labels:
-                        self.labels[lalias] = self.labels[label]
-                self.P.append(['NULL'])
+                    if lalias not in labels:
+                        labels[lalias] = labels[label]
+                P.append(['NULL'])
                 continue
 
             # caso geral: linha começa com token não-instrucao -> tratamos como label sem ':'
             if t_clean not in valid_instr:
                 label = t_clean
-                self.labels[label] = len(self.P)
+                labels[label] = len(P)
                 if label.upper().startswith('L') and label[1:].isdigit():
                     num = label[1:]
-                    if num not in self.labels:
-                        self.labels[num] = self.labels[label]
+                    if num not in labels:
+                        labels[num] = labels[label]
                 if len(parts) > 1:
-                    self.P.append(parts[1:])
+                    P.append(parts[1:])
                 else:
-                    self.P.append(['NULL'])
+                    P.append(['NULL'])
                 continue
 
             # fallback: tratar como instrução
-            self.P.append(parts)
+            P.append(parts)
+
+        # 2ª passagem: P continua com o texto original (dump_program/snapshot);
+        # a execução usa apenas code.
+        code, missing = VM.decode(P, labels)
+        if missing:
+            raise VMError("; ".join(missing))
+        return Program(P, labels, code)
 
-        # OBS: NÃO fazemos substituição de tokens por endereços aqui.
-        # Em tempo de execução (step) usamos self.labels[label] para JMP/CALL/JMPF.
+    @staticmethod
+    def decode(P, labels):
+        """
+        Converte instruções tokenizadas em tuplas (opcode, a, b):
+         - LDC/LDV/STR: a = operando inteiro.
+         - ALLOC/DALLOC: a = m, b = n.
+         - JMP/JMPF/CALL: a = endereço do rótulo.
+        Linhas que só falhariam ao executar viram (OP_ERR, mensagem, None), com
+        a mesma mensagem que o interpretador de texto produzia.
+        Retorna (code, missing) onde missing lista os rótulos indefinidos.
+        """
+        code = []
+        missing = []
+        for addr, instr in enumerate(P):
+            if not instr:
+                # linha vazia ou None -> avança
+                code.append((OP_NULL, None, None))
+                continue
+            name = str(instr[0]).upper()
+            op = OPCODES.get(name)
+            if op is None:
+                code.append((OP_ERR, f"Instrução inválida: {name}", None))
+                continue
+            try:
+                if op in _INT_OPS:
+                    code.append((op, int(instr[1]), None))
+                elif op in _LABEL_OPS:
+                    label = str(instr[1])
+                    if label not in labels:
+                        missing.append(f"{name}: rótulo '{label}' não encontrado (endereço {addr})")
+                        code.append((OP_ERR, f"{name}: rótulo '{label}' não encontrado", None))
+                    else:
+                        code.append((op, labels[label], None))
+                elif op in _PAIR_OPS:
+                    if len(instr) < 3:
+                        code.append((OP_ERR, f"{name}: argumentos ausentes", None))
+                    else:
+                        code.append((op, int(instr[1]), int(instr[2])))
+                else:
+                    code.append((op, None, None))
+            except Exception as e:
+                code.append((OP_ERR, f"Erro inesperado: {e}", None))
+        return code, missing
 
     # -----------------------
     # Reiniciar execução (mantém programa carregado)
     # -----------------------
     def reset(self):
-        self.M = {}
+        self.M = MEMORY_MODELS[self.memory_model]()
         self.s = -1
         self.pc = 0
         self.halted = False
         self.last_error = None
         self.output = []
-        self.input_queue = []
+        self.input_queue = deque()
+        self._record_change(None)
+        self._reset_hooks()
+
+    def _reset_hooks(self):
+        for hook in self.hooks:
+            hook.reset(self)
+        if self.history is not None:
+            self.history.reset(self)
 
     # -----------------------
     # Execução: step (1 instrução por vez)
     # -----------------------
     def step(self):
+        self._bp_resume = None
+        if self.halted:
+            return self._tracked_step()
+        if self.history is not None:
+            result = self.history.step(self, self._tracked_step)
+        else:
+            result = self._tracked_step()
+        self.executed += 1
+        return result
+
+    def _tracked_step(self):
+        if not self.track_changes:
+            return self._observed_step()
+        # modo de rastreamento: registra o que esta instrução escreveu
+        sp = self.s
+        size = len(self.M)
+        instr = self.code[self.pc] if 0 <= self.pc < len(self.code) else None
+        try:
+            return self._observed_step()
+        finally:
+            addrs = self._written(instr, sp, self.s) if instr else set()
+            if len(self.M) - size > len(addrs):
+                # a memória cresceu além do que foi escrito (zero-fill): estado completo
+                addrs = None
+            self._record_change(addrs)
+
+    def _observed_step(self):
+        # _step() + notificação dos observadores (se houver)
+        if not self.hooks:
+            return self._step()
+        pc = self.pc
+        sp = self.s
+        instr = self.code[pc] if 0 <= pc < len(self.code) else None
+        self._step()
+        for hook in self.hooks:
+            hook.after_step(self, pc, instr, sp)
+
+    def _step(self):
         # condições de parada
         if self.halted or self.pc < 0 or self.pc >= len(self.P):
             self.halted = True
             return
 
         try:
-            instr = self.P[self.pc]
-            if not instr:
-                # linha vazia ou None -> avança
-                self.pc += 1
-                return
-
-            # Prepare variáveis no estilo do seu while True
-            operation = instr
-            opcode = str(operation[0]).upper()
+            # instrução já decodificada em load_program
+            opcode, a, b = self.code[self.pc]
 
             # M, sp, pc locais (iremos reatribuir para self no final)
             M = self.M
             sp = self.s
             pc = self.pc
-            labels = self.labels
 
             # helpers push/pop mantendo sp e M locais
             def push_M(v):
@@ -205,148 +467,130 @@ class VM:
 
             # ============= bloco de instruções (copiado do seu while True) =============
 
-            if opcode == "HLT":
+            if opcode == OP_HLT:
                 self.halted = True
 
-            elif opcode == "START":
+            elif opcode == OP_START:
                 sp = -1
 
-            elif opcode == "LDC":
-                value = int(operation[1])
-                push_M(value)
+            elif opcode == OP_LDC:
+                push_M(a)
 
-            elif opcode == "LDV":
-                value = int(operation[1])
-                push_M(M.get(value, 0))
+            elif opcode == OP_LDV:
+                push_M(M.get(a, 0))
 
-            elif opcode == "ADD":
+            elif opcode == OP_ADD:
                 M[sp - 1] = M.get(sp - 1, 0) + M.get(sp, 0)
                 pop_M()
 
-            elif opcode == "SUB":
+            elif opcode == OP_SUB:
                 M[sp - 1] = M.get(sp - 1, 0) - M.get(sp, 0)
                 pop_M()
 
-            elif opcode == "MULT":
+            elif opcode == OP_MULT:
                 M[sp - 1] = M.get(sp - 1, 0) * M.get(sp, 0)
                 pop_M()
 
-            elif opcode == "DIVI":
+            elif opcode == OP_DIVI:
                 # cuidado com divisão por zero (vai lançar se M[sp] == 0)
                 if M.get(sp, 0) == 0:
                     raise VMError("Divisão por zero")
                 M[sp - 1] = M.get(sp - 1, 0) // M.get(sp, 0)
                 pop_M()
 
-            elif opcode == "INV":
+            elif opcode == OP_INV:
                 M[sp] = -M.get(sp, 0)
 
-            elif opcode == "AND":
+            elif opcode == OP_AND:
                 M[sp - 1] = 1 if M.get(sp - 1, 0) == 1 and M.get(sp, 0) == 1 else 0
                 pop_M()
 
-            elif opcode == "OR":
+            elif opcode == OP_OR:
                 M[sp - 1] = 0 if M.get(sp - 1, 0) == 0 and M.get(sp, 0) == 0 else 1
                 pop_M()
 
-            elif opcode == "NEG":
+            elif opcode == OP_NEG:
                 M[sp] = 1 - M.get(sp, 0)
 
-            elif opcode == "CME":
+            elif opcode == OP_CME:
                 M[sp - 1] = 1 if M.get(sp - 1, 0) < M.get(sp, 0) else 0
                 pop_M()
 
-            elif opcode == "CMA":
+            elif opcode == OP_CMA:
                 M[sp - 1] = 1 if M.get(sp - 1, 0) > M.get(sp, 0) else 0
                 pop_M()
 
-            elif opcode == "CEQ":
+            elif opcode == OP_CEQ:
                 M[sp - 1] = 1 if M.get(sp - 1, 0) == M.get(sp, 0) else 0
                 pop_M()
 
-            elif opcode == "CDIF":
+            elif opcode == OP_CDIF:
                 M[sp - 1] = 1 if M.get(sp - 1, 0) != M.get(sp, 0) else 0
                 pop_M()
 
-            elif opcode == "CMEQ":
+            elif opcode == OP_CMEQ:
                 M[sp - 1] = 1 if M.get(sp - 1, 0) <= M.get(sp, 0) else 0
                 pop_M()
 
-            elif opcode == "CMAQ":
+            elif opcode == OP_CMAQ:
                 M[sp - 1] = 1 if M.get(sp - 1, 0) >= M.get(sp, 0) else 0
                 pop_M()
 
-            elif opcode == "STR":
-                value = int(operation[1])
-                M[value] = M.get(sp, 0)
+            elif opcode == OP_STR:
+                M[a] = M.get(sp, 0)
                 pop_M()
 
-            elif opcode == "JMP":
-                label = str(operation[1])
-                if label not in labels:
-                    raise VMError(f"JMP: rótulo '{label}' não encontrado")
-                pc = labels[label]
+            elif opcode == OP_JMP:
+                # a = endereço já resolvido no carregamento
+                pc = a
                 jumped = True
 
-            elif opcode == "JMPF":
-                label = str(operation[1])
+            elif opcode == OP_JMPF:
                 if sp < 0:
                     raise VMError("JMPF: pilha vazia")
                 if M.get(sp, 0) == 0:
-                    if label not in labels:
-                        raise VMError(f"JMPF: rótulo '{label}' não encontrado")
-                    pc = labels[label]
+                    pc = a
                 else:
                     pc += 1
                 pop_M()
                 jumped = True
 
-            elif opcode == "NULL":
+            elif opcode == OP_NULL:
                 # nada a fazer
                 pass
 
-            elif opcode == "RD":
+            elif opcode == OP_RD:
                 # consome da fila de input; se vazia, sinaliza erro para frontend
                 if not self.input_queue:
-                    raise VMError("RD attempted but input queue empty")
-                value = int(self.input_queue.pop(0))
-                push_M(value)
+                    raise InputWait("RD attempted but input queue empty")
+                push_M(self.input_queue.popleft())
 
-            elif opcode == "PRN":
+            elif opcode == OP_PRN:
                 self.output.append(M.get(sp, 0))
                 pop_M()
 
-            elif opcode == "ALLOC":
+            elif opcode == OP_ALLOC:
                 # ALLOC m n -> para k in 0..n-1: push M[m+k]
-                if len(operation) < 3:
-                    raise VMError("ALLOC: argumentos ausentes")
-                m = int(operation[1])
-                n = int(operation[2])
-                for k in range(n):
-                    push_M(M.get(m + k, 0))
-
-            elif opcode == "DALLOC":
+                if self._max_cells is not None and sp + b >= self._max_cells:
+                    raise VMError("Limite de memória excedido")
+                for k in range(b):
+                    push_M(M.get(a + k, 0))
+
+            elif opcode == OP_DALLOC:
                 # DALLOC m n -> para k=n-1..0: M[m+k] = pop()
-                if len(operation) < 3:
-                    raise VMError("DALLOC: argumentos ausentes")
-                m = int(operation[1])
-                n = int(operation[2])
-                if sp < n - 1:
+                if sp < b - 1:
                     raise VMError("DALLOC: pilha insuficiente")
-                for k in reversed(range(n)):
-                    M[m + k] = M.get(sp, 0)
+                for k in reversed(range(b)):
+                    M[a + k] = M.get(sp, 0)
                     pop_M()
 
-            elif opcode == "CALL":
-                label = str(operation[1])
-                if label not in labels:
-                    raise VMError(f"CALL: rótulo '{label}' não encontrado")
+            elif opcode == OP_CALL:
                 # empilha endereço de retorno e salta
                 push_M(pc + 1)
-                pc = labels[label]
+                pc = a
                 jumped = True
 
-            elif opcode == "RETURN":
+            elif opcode == OP_RETURN:
                 if sp < 0:
                     raise VMError("RETURN: pilha vazia")
                 pc = int(M.get(sp, 0))
@@ -354,7 +598,8 @@ class VM:
                 jumped = True
 
             else:
-                raise VMError(f"Instrução inválida: {opcode}")
+                # OP_ERR: a mensagem foi preparada na decodificação
+                raise VMError(a)
 
             # ============= fim do bloco de instruções =============
 
@@ -363,14 +608,12 @@ class VM:
             self.M = M
             # se houve salto, pc já ajustado; caso contrário incrementa
             self.pc = pc if jumped else (pc + 1)
+            self.check_memory()
 
         except VMError as e:
             # em caso de RD sem input, não marcamos halted permanentemente (frontend lida com isso)
             self.last_error = str(e)
-            if "RD attempted" in str(e):
-                self.halted = False
-            else:
-                self.halted = True
+            self.halted = not isinstance(e, InputWait)
             # propaga para o Flask (app.py captura e devolve)
             raise
         except Exception as e:
@@ -382,20 +625,703 @@ class VM:
     # run / utilitários
     # -----------------------
     def run(self, step_limit=1000000):
+        # em fatias de RUN_CHUNK passos: o limite de memória (que só ALLOC
+        # verifica dentro dos laços) é conferido depois de cada uma
         count = 0
-        while not self.halted and count < step_limit:
-            self.step()
-            count += 1
-        if count >= step_limit:
+        while count < step_limit:
+            chunk = min(RUN_CHUNK, step_limit - count)
+            n = self.execute(chunk)
+            count += n
+            self.check_memory()
+            if n < chunk or self.halted or self.stop_reason is not None:
+                break
+        if count >= step_limit and self.stop_reason is None:
             raise VMError("Limite de passos atingido")
 
+    def execute(self, max_steps):
+        """
+        Motor rápido de execução: equivale a chamar step() até max_steps vezes
+        (ou até parar), mas com pc/sp/memória em variáveis locais, gravados no
+        objeto só ao sair. Casos raros (pilha vazia, divisão por zero, RD sem
+        input, instrução inválida) são delegados a step(), que produz
+        exatamente os mesmos erros e efeitos parciais.
+        Retorna o número de passos executados. Com VMError, os passos completos
+        antes da instrução que falhou são somados a executed do mesmo jeito.
+        """
+        self.stop_reason = self.stop_info = None
+        # com watchpoints/observadores usa o laço instrumentado; sem eles, o rápido
+        # (ou os blocos compilados, se não houver breakpoints)
+        if self.watchpoints or self.hooks:
+            runner = self._execute_instrumented
+        elif self.compiled and not self.breakpoints:
+            runner = self._execute_compiled
+        else:
+            runner = self._execute
+        if self.history is not None:
+            # fatias entre os checkpoints do histórico
+            runner = functools.partial(self.history.execute, self, runner)
+        # um VMError interrompe o laço: o laço deixa em _partial os passos
+        # completos antes dele, que também entram em executed
+        self._partial = 0
+        start = time.perf_counter()
+        try:
+            count = runner(max_steps)
+        except VMError:
+            self.executed += self._partial
+            raise
+        finally:
+            self.exec_seconds += time.perf_counter() - start
+            if self.track_changes:
+                # o laço rápido não registra endereços: a versão nova vale o estado todo
+                self._record_change(None)
+        self.executed += count
+        return count
+
+    def _execute(self, max_steps):
+        ocode = self._oxcode
+        if ocode is None:
+            return self._run_fast(self._xcode, max_steps)
+        # código otimizado: cada instrução consome até FUSE_MAX passos, então
+        # roda em fatias que não passam do limite; o final vai pelo código original
+        total = 0
+        try:
+            while total < max_steps and not self.halted and self.stop_reason is None:
+                remaining = max_steps - total
+                if remaining >= FUSE_MAX:
+                    total += self._run_fast(ocode, remaining // FUSE_MAX)
+                else:
+                    total += self._run_fast(self._xcode, remaining)
+        except VMError:
+            self._partial += total
+            raise
+        return total
+
+    def _run_fast(self, code, max_steps):
+        if self.halted or max_steps <= 0:
+            return 0
+
+        n = len(self.code)
+        if not 0 <= self.pc <= n:
+            # pc fora do programa (ex.: RETURN pelo step): step() marca halted
+            self._partial = 0
+            self._step()
+            return 1
+
+        M = self.M
+        Mget = M.get
+        bulk = not isinstance(M, dict)      # ArrayMemory: ALLOC/DALLOC em bloco
+        out = self.output
+        inq = self.input_queue
+        cap = self._max_cells
+        sp = self.s
+        pc = self.pc
+        halted = False
+        count = 0
+        extra = 0       # passos a mais das instruções fundidas
+
+        try:
+            for count in range(1, max_steps + 1):
+                op, a, b = code[pc]
+
+                if op == OP_LDV:
+                    sp += 1
+                    M[sp] = Mget(a, 0)
+                    pc += 1
+                elif op == OP_LDC:
+                    sp += 1
+                    M[sp] = a
+                    pc += 1
+                elif op == OP_STR and sp >= 0:
+                    M[a] = M[sp]
+                    sp -= 1
+                    pc += 1
+                elif op == OP_JMPF and sp >= 0:
+                    pc = a if M[sp] == 0 else pc + 1
+                    sp -= 1
+                elif op == OP_JMP:
+                    pc = a
+                elif op == OP_NULL:
+                    pc += 1
+                elif op > OP_BRK:
+                    # instruções fundidas (vm_optimize): mesmos efeitos da sequência
+                    # original, inclusive as células que ficam acima de sp
+                    if op == OP_VC_JMPF:
+                        x, c, cond, target, taken = a
+                        v = Mget(x, 0)
+                        M[sp + 2] = c
+                        if cond(v, c):
+                            M[sp + 1] = 1
+                            pc += 4
+                            extra += 3
+                        else:
+                            M[sp + 1] = 0
+                            pc = target
+                            extra += taken
+                    elif op == OP_VC_STR:
+                        x, c, fn, z = a
+                        v = Mget(x, 0)
+                        M[sp + 2] = c
+                        v = M[sp + 1] = fn(v, c)
+                        M[z] = v
+                        pc += 4
+                        extra += 3
+                    elif op == OP_VV_STR:
+                        x, y, fn, z = a
+                        v = M[sp + 1] = Mget(x, 0)
+                        w = M[sp + 2] = Mget(y, 0)
+                        v = M[sp + 1] = fn(v, w)
+                        M[z] = v
+                        pc += 4
+                        extra += 3
+                    elif op == OP_VV_JMPF:
+                        x, y, cond, target, taken = a
+                        v = M[sp + 1] = Mget(x, 0)
+                        w = M[sp + 2] = Mget(y, 0)
+                        if cond(v, w):
+                            M[sp + 1] = 1
+                            pc += 4
+                            extra += 3
+                        else:
+                            M[sp + 1] = 0
+                            pc = target
+                            extra += taken
+                    elif op == OP_V_STR:
+                        v = M[sp + 1] = Mget(a, 0)
+                        M[b] = v
+                        pc += 2
+                        extra += 1
+                    elif op == OP_C_STR:
+                        M[sp + 1] = a
+                        M[b] = a
+                        pc += 2
+                        extra += 1
+                    elif op == OP_VC_BIN:
+                        x, c, fn = a
+                        v = Mget(x, 0)
+                        M[sp + 2] = c
+                        sp += 1
+                        M[sp] = fn(v, c)
+                        pc += 3
+                        extra += 2
+                    elif op == OP_VV_BIN:
+                        x, y, fn = a
+                        v = M[sp + 1] = Mget(x, 0)
+                        w = M[sp + 2] = Mget(y, 0)
+                        sp += 1
+                        M[sp] = fn(v, w)
+                        pc += 3
+                        extra += 2
+                    elif op == OP_JMP_N:
+                        pc = a
+                        extra += b
+                    elif op == OP_CALL_N:
+                        sp += 1
+                        M[sp] = pc + 1
+                        pc = a
+                        extra += b
+                    elif op == OP_KPUSH:
+                        for off, v in a:
+                            M[sp + off] = v
+                        delta, k = b
+                        sp += delta
+                        pc += k + 1
+                        extra += k
+                    elif op == OP_CMP_JMPF and sp > 0:
+                        cond, target, taken = a
+                        sp -= 1
+                        if cond(M[sp], M[sp + 1]):
+                            M[sp] = 1
+                            pc += 2
+                            extra += 1
+                        else:
+                            M[sp] = 0
+                            pc = target
+                            extra += taken
+                        sp -= 1
+                    elif op == OP_JMPF_N and sp >= 0:
+                        if M[sp] == 0:
+                            pc = a
+                            extra += b
+                        else:
+                            pc += 1
+                        sp -= 1
+                    else:
+                        # pré-condição falhou: executa só a primeira instrução original
+                        self.s, self.pc = sp, pc
+                        self._step()
+                        sp, pc = self.s, self.pc
+                elif op == OP_ADD and sp > 0:
+                    sp -= 1
+                    M[sp] += M[sp + 1]
+                    pc += 1
+                elif op == OP_SUB and sp > 0:
+                    sp -= 1
+                    M[sp] -= M[sp + 1]
+                    pc += 1
+                elif OP_CME <= op <= OP_CMAQ and sp > 0:
+                    # comparações: empilham 1 (verdadeiro) ou 0 (falso)
+                    sp -= 1
+                    x = M[sp]
+                    y = M[sp + 1]
+                    if op == OP_CME:
+                        M[sp] = 1 if x < y else 0
+                    elif op == OP_CMA:
+                        M[sp] = 1 if x > y else 0
+                    elif op == OP_CEQ:
+                        M[sp] = 1 if x == y else 0
+                    elif op == OP_CDIF:
+                        M[sp] = 1 if x != y else 0
+                    elif op == OP_CMEQ:
+                        M[sp] = 1 if x <= y else 0
+                    else:  # OP_CMAQ
+                        M[sp] = 1 if x >= y else 0
+                    pc += 1
+                elif op == OP_MULT and sp > 0:
+                    sp -= 1
+                    M[sp] *= M[sp + 1]
+                    pc += 1
+                elif op == OP_CALL:
+                    sp += 1
+                    M[sp] = pc + 1
+                    pc = a
+                elif op == OP_RETURN and sp >= 0:
+                    pc = int(M[sp])
+                    sp -= 1
+                    if not 0 <= pc <= n:
+                        # o próximo step() só marcaria halted (e contaria o passo)
+                        if count < max_steps:
+                            count += 1
+                            halted = True
+                        break
+                elif op == OP_DIVI and sp > 0 and M[sp] != 0:
+                    sp -= 1
+                    M[sp] //= M[sp + 1]
+                    pc += 1
+                elif op == OP_AND and sp > 0:
+                    sp -= 1
+                    M[sp] = 1 if M[sp] == 1 and M[sp + 1] == 1 else 0
+                    pc += 1
+                elif op == OP_OR and sp > 0:
+                    sp -= 1
+                    M[sp] = 0 if M[sp] == 0 and M[sp + 1] == 0 else 1
+                    pc += 1
+                elif op == OP_INV and sp >= 0:
+                    M[sp] = -M[sp]
+                    pc += 1
+                elif op == OP_NEG and sp >= 0:
+                    M[sp] = 1 - M[sp]
+                    pc += 1
+                elif op == OP_ALLOC and (cap is None or sp + b < cap):
+                    if bulk:
+                        sp = M.alloc(sp, a, b)
+                    else:
+                        for k in range(b):
+                            sp += 1
+                            M[sp] = Mget(a + k, 0)
+                    pc += 1
+                elif op == OP_DALLOC and sp >= b - 1:
+                    if bulk:
+                        sp = M.dalloc(sp, a, b)
+                    else:
+                        for k in reversed(range(b)):
+                            M[a + k] = M[sp]
+                            sp -= 1
+                    pc += 1
+                elif op == OP_PRN and sp >= 0:
+                    out.append(M[sp])
+                    sp -= 1
+                    pc += 1
+                elif op == OP_RD and inq:
+                    sp += 1
+                    M[sp] = inq.popleft()
+                    pc += 1
+                elif op == OP_START:
+                    sp = -1
+                    pc += 1
+                elif op == OP_HLT:
+                    halted = True
+                    pc += 1
+                    break
+                elif op == OP_END:
+                    # pc == len(P): step() apenas marcaria halted
+                    halted = True
+                    break
+                elif op == OP_BRK:
+                    if count == 1 and pc == self._bp_resume:
+                        # retomando do breakpoint em que parou
+                        self._bp_resume = None
+                    elif self._should_break(pc, M, sp):
+                        # para antes de executar a instrução do breakpoint
+                        self.stop_reason = 'breakpoint'
+                        self.stop_info = {'pc': pc}
+                        self._bp_resume = pc
+                        count -= 1
+                        break
+                    # executa a instrução original (code não tem a armadilha)
+                    self.s, self.pc = sp, pc
+                    self._step()
+                    sp, pc = self.s, self.pc
+                    if self.halted:
+                        halted = True
+                        break
+                    if not 0 <= pc <= n:
+                        # RETURN sob o breakpoint saiu do programa: como em OP_RETURN
+                        if count < max_steps:
+                            count += 1
+                            halted = True
+                        break
+                else:
+                    # caminho lento: step() trata o caso e levanta o erro certo
+                    self.s, self.pc = sp, pc
+                    self._step()
+                    sp, pc = self.s, self.pc
+        except VMError:
+            # passos completos antes da instrução que falhou (execute())
+            self._partial = count - 1 + extra
+            raise
+
+        self.s = sp
+        self.pc = pc
+        self.halted = halted
+        return count + extra
+
+    def _execute_compiled(self, max_steps):
+        """
+        Executa blocos compilados enquanto couberem em max_steps. Endereços sem
+        bloco (saídas laterais, meio de bloco, pc fora do programa) e o resto
+        do limite de passos vão por step(), um passo por vez.
+        """
+        if self.halted or max_steps <= 0:
+            return 0
+        if self._blocks is None:
+            # import tardio: vm_compile importa os opcodes deste módulo
+            from vm_compile import compile_program
+            self._blocks = compile_program(self.code, self.labels, self._max_cells)
+        blocks = self._blocks
+        nblocks = len(blocks)
+        M = self.M
+        Mget = M.get
+        out = self.output
+        inq = self.input_queue
+        sp = self.s
+        pc = self.pc
+        count = 0
+
+        while True:
+            entry = blocks[pc] if 0 <= pc < nblocks else None
+            if entry is not None and count + entry[1] <= max_steps:
+                pc, sp, n = entry[0](M, Mget, sp, out, inq, max_steps - count)
+                if n:
+                    count += n
+                    continue
+            if count >= max_steps:
+                break
+            self.s, self.pc = sp, pc
+            try:
+                self._step()
+            except VMError:
+                self._partial = count
+                raise
+            count += 1
+            sp, pc = self.s, self.pc
+            if self.halted:
+                break
+
+        self.s = sp
+        self.pc = pc
+        return count
+
+    def _execute_instrumented(self, max_steps):
+        """
+        Laço instrumentado (só usado com watchpoints ou observadores): step a
+        step, notificando os observadores e comparando os endereços vigiados
+        após cada instrução. Também respeita breakpoints.
+        """
+        count = 0
+        M = self.M
+        watched = {addr: M.get(addr, 0) for addr in self.watchpoints}
+        while count < max_steps and not self.halted:
+            pc = self.pc
+            if pc in self.breakpoints:
+                if count == 0 and pc == self._bp_resume:
+                    self._bp_resume = None
+                elif self._should_break(pc, self.M, self.s):
+                    self.stop_reason = 'breakpoint'
+                    self.stop_info = {'pc': pc}
+                    self._bp_resume = pc
+                    break
+            try:
+                self._observed_step()
+            except VMError:
+                self._partial = count
+                raise
+            count += 1
+            M = self.M
+            for addr, target in self.watchpoints.items():
+                new = M.get(addr, 0)
+                old = watched[addr]
+                if new != old:
+                    watched[addr] = new
+                    if target is None or new == target:
+                        self.stop_reason = 'watchpoint'
+                        self.stop_info = {'pc': pc, 'addr': addr, 'old': old, 'new': new}
+                        return count
+        return count
+
+    # -----------------------
+    # Breakpoints / watchpoints
+    # -----------------------
+    def set_breakpoint(self, target, condition=None):
+        """Breakpoint em endereço (int) ou rótulo (str), opcionalmente condicional."""
+        addr = self.address_of(target)
+        if not 0 <= addr < len(self.code):
+            raise VMError(f"Endereço {addr} fora do programa")
+        try:
+            cond = compile_condition(condition) if condition else None
+        except ValueError as e:
+            raise VMError(str(e))
+        self.breakpoints[addr] = (condition or None, cond)
+        self._build_xcode()
+        return addr
+
+    def clear_breakpoint(self, target=None):
+        if target is None:
+            self.breakpoints.clear()
+        else:
+            self.breakpoints.pop(self.address_of(target), None)
+        self._build_xcode()
+
+    def set_watchpoint(self, addr, value=None):
+        """Para quando M[addr] mudar (ou passar a valer value)."""
+        self.watchpoints[int(addr)] = None if value is None else int(value)
+
+    def clear_watchpoint(self, addr=None):
+        if addr is None:
+            self.watchpoints.clear()
+        else:
+            self.watchpoints.pop(int(addr), None)
+
+    def _build_xcode(self):
+        # código executável: code + sentinela, com armadilhas nos breakpoints
+        xcode = self.code + [(OP_END, None, None)]
+        for addr in self.breakpoints:
+            xcode[addr] = (OP_BRK, None, None)
+        self._xcode = xcode
+        if self._ocode is None:
+            self._oxcode = None
+            return
+        # código otimizado: uma instrução fundida que passaria por cima de um
+        # breakpoint volta a ser a instrução original
+        oxcode = self._ocode + [(OP_END, None, None)]
+        for addr, covered in self._spans.items():
+            if any(i in self.breakpoints for i in covered):
+                oxcode[addr] = self.code[addr]
+        for addr in self.breakpoints:
+            oxcode[addr] = (OP_BRK, None, None)
+        self._oxcode = oxcode
+
+    def _should_break(self, pc, M, sp):
+        _, cond = self.breakpoints[pc]
+        return cond is None or cond(M, sp, pc)
+
+    # -----------------------
+    # Passos em lote (depuração)
+    # -----------------------
+    def address_of(self, target):
+        """Endereço de um breakpoint: int = endereço, str = rótulo."""
+        if isinstance(target, str):
+            if target not in self.labels:
+                raise VMError(f"Rótulo '{target}' não encontrado")
+            return self.labels[target]
+        return int(target)
+
+    def step_many(self, count, breakpoints=(), pc_range=None, watch=None, stop_on_output=False):
+        """
+        Executa até count instruções com step(), parando antes se:
+         - pc chegar a um endereço de breakpoints;
+         - pc entrar no intervalo pc_range = (início, fim), inclusive;
+         - o valor de M[watch] mudar;
+         - a instrução produzir saída (stop_on_output).
+        Retorna (trace, motivo), com trace = [pc, opcode, sp, topo] por passo
+        executado. Um VMError (inclusive RD sem input) encerra o lote com
+        motivo 'error'; a mensagem fica em last_error.
+        """
+        trace = []
+        bps = set(breakpoints)
+        lo, hi = pc_range if pc_range else (None, None)
+        M = self.M
+        for _ in range(count):
+            if self.halted:
+                return trace, 'halted'
+            pc = self.pc
+            old = M.get(watch, 0) if watch is not None else None
+            out_len = len(self.output)
+            try:
+                self.step()
+            except VMError:
+                return trace, 'error'
+            if self.halted and not 0 <= pc < len(self.P):
+                # step() só marcou halted (pc fora do programa)
+                return trace, 'halted'
+            M = self.M
+            trace.append([pc, str(self.P[pc][0]).upper(), self.s, M.get(self.s, 0) if self.s >= 0 else None])
+            if self.halted:
+                return trace, 'halted'
+            if self.pc in bps:
+                return trace, 'breakpoint'
+            if lo is not None and lo <= self.pc <= hi:
+                return trace, 'pc_range'
+            if watch is not None and M.get(watch, 0) != old:
+                return trace, 'watch'
+            if stop_on_output and len(self.output) > out_len:
+                return trace, 'output'
+        return trace, 'count'
+
+    # -----------------------
+    # Histórico: voltar passos / ir a um passo
+    # -----------------------
+    def enable_history(self, **options):
+        """
+        Liga o histórico (vm_history.History); vale a partir do estado atual.
+        Com max_cells, os checkpoints guardam no máximo esse total de células.
+        """
+        if self.history is None:
+            # import tardio: vm_history importa os opcodes deste módulo
+            from vm_history import History
+            options.setdefault('max_cells', self.max_cells)
+            self.history = History(**options)
+            self.history.reset(self)
+        return self.history
+
+    def disable_history(self):
+        self.history = None
+
+    def step_back(self, count=1):
+        """Desfaz as últimas count instruções; retorna o passo atual."""
+        history = self._require_history()
+        history.goto(max(0, history.steps - int(count)))
+        return history.steps
+
+    def goto(self, step):
+        """Vai ao estado depois de `step` instruções (para trás ou para frente)."""
+        history = self._require_history()
+        history.goto(int(step))
+        return history.steps
+
+    def _require_history(self):
+        if self.history is None:
+            raise VMError("Histórico de execução desligado")
+        return self.history
+
+    # -----------------------
+    # Verificação estática
+    # -----------------------
+    def analyze(self):
+        """Relatório do verificador estático (vm_verify) do programa carregado."""
+        if self._analysis is None:
+            # import tardio: vm_verify importa os opcodes deste módulo
+            from vm_verify import analyze
+            self._analysis = analyze(self.code, self.labels).report()
+        return self._analysis
+
+    # -----------------------
+    # Rastreamento de mudanças / snapshots delta
+    # -----------------------
+    def enable_change_tracking(self):
+        if not self.track_changes:
+            self.track_changes = True
+            self._record_change(None)
+
+    def _record_change(self, addrs):
+        # addrs = endereços escritos nesta versão (None = qualquer um)
+        self.version += 1
+        self._changes.append((self.version, addrs, len(self.output)))
+
+    @staticmethod
+    def _written(instr, sp, new_sp):
+        """Endereços que a instrução pode ter escrito (sp antes e depois)."""
+        op, a, b = instr
+        if op in (OP_LDC, OP_LDV, OP_RD, OP_CALL):
+            return {new_sp}
+        if OP_ADD <= op <= OP_CMAQ:
+            return {sp} if op in (OP_INV, OP_NEG) else {sp - 1}
+        if op == OP_STR:
+            return {a}
+        if op == OP_ALLOC:
+            return set(range(sp + 1, new_sp + 1))
+        if op == OP_DALLOC:
+            return set(range(a, a + b))
+        return set()
+
+    def delta(self, since):
+        """
+        Mudanças desde a versão `since`: endereços alterados, sp, saída nova.
+        Se o histórico não cobre `since` (ou houve reset/run), devolve o
+        snapshot completo com "full": True.
+        """
+        changes = self._changes
+        first = changes[0][0] if changes else self.version + 1
+        addrs = set()
+        full = not self.track_changes or since < first or since > self.version
+        if not full:
+            for version, written, _ in list(changes)[since - first + 1:]:
+                if written is None:
+                    full = True
+                    break
+                addrs |= written
+        if full:
+            snap = self.snapshot()
+            snap.update({"version": self.version, "full": True, "sp": self.s})
+            return snap
+        out_len = changes[since - first][2]
+        M = self.M
+        return {
+            "version": self.version,
+            "full": False,
+            "pc": self.pc,
+            "sp": self.s,
+            "mem": {k: M[k] for k in sorted(addrs) if k in M},
+            "output": self.output[out_len:],
+            "halted": self.halted,
+            "last_error": self.last_error,
+            "next_instr": ' '.join(map(str, self.P[self.pc])) if 0 <= self.pc < len(self.P) else None
+        }
+
+    def check_memory(self):
+        # verificado nas fronteiras de step/run, fora do laço de execute()
+        # (ALLOC verifica o limite antes de alocar, dentro dos laços)
+        if self.max_cells is not None and len(self.M) > self.max_cells:
+            self.halted = True
+            self.last_error = "Limite de memória excedido"
+            raise VMError(self.last_error)
+
     def enqueue_input(self, value):
         try:
             self.input_queue.append(int(value))
         except Exception:
             raise VMError("enqueue_input: valor inválido")
-        if self.last_error and "RD attempted" in str(self.last_error):
-            # limpa erro para permitir continuação
+        self._input_arrived()
+
+    def enqueue_inputs(self, values):
+        """
+        Vários valores de uma vez: lista/iterável ou texto separado por espaços
+        e quebras de linha. Tudo ou nada: um valor inválido não enfileira os
+        outros. Retorna quantos foram enfileirados.
+        """
+        if isinstance(values, str):
+            values = values.split()
+        try:
+            values = [int(v) for v in values]
+        except (TypeError, ValueError):
+            raise VMError("enqueue_inputs: valor inválido")
+        self.input_queue.extend(values)
+        if values:
+            self._input_arrived()
+        return len(values)
+
+    def _input_arrived(self):
+        # a VM esperando por RD (erro sem halted) pode continuar
+        if self.last_error and not self.halted:
             self.last_error = None
 
     def snapshot(self):
@@ -0,0 +1,58 @@
+# backend/vm_debug.py
+# Condições de breakpoints da MVD
+#
+# - Uma condição é uma expressão Python restrita sobre o estado da VM:
+#     sp, pc, top (valor no topo da pilha) e M[endereço]
+#   com aritmética (+ - * // %), comparações, and/or/not e constantes inteiras.
+#   Ex.: "M[3] == 10 and sp > 2", "top < 0".
+# - A expressão é validada nó a nó (ast) antes de compilar; qualquer outra
+#   construção (chamadas, atributos, nomes desconhecidos) é rejeitada com
+#   ValueError (a VM converte em VMError).
+
+import ast
+
+_NAMES = {'sp', 'pc', 'top', 'M'}
+_NODES = (
+    ast.Expression, ast.BoolOp, ast.And, ast.Or, ast.UnaryOp, ast.Not, ast.USub, ast.UAdd,
+    ast.BinOp, ast.Add, ast.Sub, ast.Mult, ast.FloorDiv, ast.Mod,
+    ast.Compare, ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE,
+    ast.Name, ast.Load, ast.Subscript, ast.Constant,
+)
+
+
+class _MemView:
+    # M[i] na condição: leitura com zero-fill, sem escrita
+    __slots__ = ('M',)
+
+    def __init__(self, M):
+        self.M = M
+
+    def __getitem__(self, addr):
+        return self.M.get(addr, 0)
+
+
+def compile_condition(expr):
+    """Valida e compila a condição; retorna cond(M, sp, pc) -> bool."""
+    try:
+        tree = ast.parse(expr, mode='eval')
+    except SyntaxError as e:
+        raise ValueError(f"Condição inválida: {e.msg}")
+    for node in ast.walk(tree):
+        if not isinstance(node, _NODES):
+            raise ValueError(f"Condição inválida: '{type(node).__name__}' não permitido")
+        if isinstance(node, ast.Name) and node.id not in _NAMES:
+            raise ValueError(f"Condição inválida: nome '{node.id}' desconhecido")
+        if isinstance(node, ast.Constant) and not isinstance(node.value, int):
+            raise ValueError("Condição inválida: só constantes inteiras")
+        if isinstance(node, ast.Subscript) and not (
+                isinstance(node.value, ast.Name) and node.value.id == 'M'):
+            raise ValueError("Condição inválida: só M[...] pode ser indexado")
+    code = compile(tree, '<breakpoint>', 'eval')
+
+    def cond(M, sp, pc):
+        env = {'sp': sp, 'pc': pc, 'top': M.get(sp, 0) if sp >= 0 else 0, 'M': _MemView(M)}
+        try:
+            return bool(eval(code, {'__builtins__': {}}, env))
+        except ZeroDivisionError:
+            return False
+    return cond
@@ -0,0 +1,261 @@
+# backend/vm_history.py
+# Histórico de execução da MVD (depuração reversa: voltar passos / ir ao passo N)
+#
+# - Linha do tempo: cada instrução executada desde o último load/reset é um
+#   passo numerado (0 = estado inicial). Um RD que esperou por input não mexe
+#   no estado e não conta como passo, então reexecutar um trecho dá sempre o
+#   mesmo resultado.
+# - Checkpoints: cópia do estado (pc, sp, memória, tamanho da saída, inputs
+#   consumidos, halted, last_error) a cada `interval` passos. Com o histórico
+#   ligado, execute() roda em fatias que terminam nos checkpoints; os laços de
+#   execução em si não mudam. Quando passam de max_checkpoints (ou as células
+#   copiadas passam de max_cells), metade é descartada e o intervalo dobra: a
+#   memória fica limitada mesmo em execuções longas.
+# - Undo log: step() (o caminho do depurador) guarda as células que a
+#   instrução vai escrever com os valores antigos, num buffer circular de
+#   undo_size passos. Voltar poucos passos é só desfazer essas escritas.
+# - goto(N) para trás, além do undo log: restaura o último checkpoint antes de N
+#   e reexecuta até N com o laço rápido (sem breakpoints). Para frente: executa
+#   os passos que faltam.
+# - Os inputs consumidos ficam registrados; ao voltar, os que foram consumidos
+#   depois do ponto de destino voltam para o início da fila.
+
+import bisect
+from collections import deque, namedtuple
+from itertools import islice
+
+from vm_core import (
+    VMError, OP_LDC, OP_LDV, OP_RD, OP_CALL, OP_ADD, OP_CMAQ, OP_INV, OP_NEG,
+    OP_STR, OP_ALLOC, OP_DALLOC, OP_END,
+)
+
+INTERVAL = 1000          # passos entre checkpoints (dobra ao desbastar)
+MAX_CHECKPOINTS = 64
+UNDO_SIZE = 10000        # passos de step() desfeitos sem reexecutar
+
+_MISSING = object()      # célula que não existia antes da escrita
+
+Checkpoint = namedtuple('Checkpoint', 'step pc sp mem out_len consumed halted last_error')
+# registro do undo log: estado antes do passo e as escritas (endereço, valor antigo)
+_Undo = namedtuple('_Undo', 'pc sp halted last_error writes out_len consumed')
+
+
+def _targets(instr, sp):
+    """Células que a instrução pode escrever, a partir do sp antes dela."""
+    op, a, b = instr
+    if op in (OP_LDC, OP_LDV, OP_RD, OP_CALL):
+        return (sp + 1,)
+    if OP_ADD <= op <= OP_CMAQ:
+        return (sp,) if op in (OP_INV, OP_NEG) else (sp - 1,)
+    if op == OP_STR:
+        return (a,)
+    if op == OP_ALLOC:
+        return range(sp + 1, sp + b + 1)
+    if op == OP_DALLOC:
+        return range(a, a + b)
+    return ()
+
+
+class History:
+    def __init__(self, interval=INTERVAL, undo_size=UNDO_SIZE, max_checkpoints=MAX_CHECKPOINTS,
+                 max_cells=None):
+        if interval < 1 or max_checkpoints < 2:
+            raise VMError("Histórico: intervalo >= 1 e ao menos 2 checkpoints")
+        self.base_interval = interval
+        self.undo_size = undo_size
+        self.max_checkpoints = max_checkpoints
+        self.max_cells = max_cells      # células somadas de todos os checkpoints (None = sem limite)
+        self.vm = None
+
+    def reset(self, vm):
+        # chamado pela VM ao carregar um programa ou reiniciar a execução
+        self.vm = vm
+        self.steps = 0
+        self.interval = self.base_interval
+        self.checkpoints = []
+        self.cells = 0          # células guardadas nos checkpoints
+        self.undo = deque(maxlen=self.undo_size)
+        self.consumed = []      # inputs consumidos, em ordem
+        self._checkpoint()
+
+    # -----------------------
+    # registro
+    # -----------------------
+    def _checkpoint(self):
+        vm = self.vm
+        self.checkpoints.append(Checkpoint(self.steps, vm.pc, vm.s, vm.M.copy(), len(vm.output),
+                                           len(self.consumed), vm.halted, vm.last_error))
+        self.cells += len(vm.M)
+        while len(self.checkpoints) > 1 and (
+                len(self.checkpoints) > self.max_checkpoints
+                or (self.max_cells is not None and self.cells > self.max_cells)):
+            # desbaste: fica o passo 0 e um checkpoint a cada dois
+            self.checkpoints = self.checkpoints[::2]
+            self.cells = sum(len(c.mem) for c in self.checkpoints)
+            self.interval *= 2
+
+    def _advanced(self, n, pending, queued):
+        # depois de n passos: inputs consumidos (pending = início da fila,
+        # queued = tamanho dela antes) e checkpoint, se chegou a hora
+        consumed = queued - len(self.vm.input_queue)
+        if consumed > 0:
+            self.consumed.extend(pending[:consumed])
+        self.steps += n
+        if self.steps - self.checkpoints[-1].step >= self.interval:
+            self._checkpoint()
+
+    def step(self, vm, do_step):
+        """step() com registro no undo log (do_step executa a instrução)."""
+        pc, sp, M = vm.pc, vm.s, vm.M
+        instr = vm.code[pc] if 0 <= pc < len(vm.code) else None
+        writes = [(addr, M[addr] if addr in M else _MISSING)
+                  for addr in (_targets(instr, sp) if instr else ())]
+        created = sum(1 for _, old in writes if old is _MISSING)
+        size = len(M)
+        record = _Undo(pc, sp, vm.halted, vm.last_error, writes, len(vm.output), len(self.consumed))
+        queue = vm.input_queue
+        pending, queued = list(islice(queue, 1)), len(queue)
+        try:
+            do_step()
+        except VMError:
+            if not vm.halted:
+                # RD sem input: nada mudou, não é um passo
+                raise
+            # erro: o passo conta (efeitos parciais, halted)
+            self._commit(record, len(vm.M) - size > created, pending, queued)
+            raise
+        self._commit(record, len(vm.M) - size > created, pending, queued)
+
+    def _commit(self, record, grown, pending, queued):
+        if grown:
+            # a memória cresceu além das células escritas (zero-fill): este
+            # passo só é desfeito pelos checkpoints
+            self.undo.clear()
+        else:
+            self.undo.append(record)
+        self._advanced(1, pending, queued)
+
+    def execute(self, vm, runner, max_steps):
+        """execute() em fatias que terminam nos checkpoints."""
+        self.undo.clear()
+        total = 0
+        while total < max_steps and not vm.halted and vm.stop_reason is None:
+            n = min(max_steps - total, self.checkpoints[-1].step + self.interval - self.steps)
+            queue = vm.input_queue
+            pending, queued = list(islice(queue, n)), len(queue)
+            try:
+                done = runner(n)
+            except VMError:
+                partial = vm._partial
+                self._advanced(0, pending, queued)
+                self._recount(n)
+                vm._partial = total + partial
+                raise
+            self._advanced(done, pending, queued)
+            total += done
+            if not done:
+                break
+        return total
+
+    def _recount(self, n):
+        """
+        Uma fatia de n passos parou num VMError sem dizer quantos passos
+        executou: volta ao último checkpoint e reexecuta passo a passo até o
+        mesmo erro.
+        """
+        vm = self.vm
+        limit = self.steps - self.checkpoints[-1].step + n
+        self._restore(len(self.checkpoints) - 1)
+        for _ in range(limit):
+            queue = vm.input_queue
+            pending, queued = list(islice(queue, 1)), len(queue)
+            try:
+                vm._step()
+            except VMError:
+                if vm.halted:
+                    self._advanced(1, pending, queued)
+                return
+            self._advanced(1, pending, queued)
+            if vm.halted:
+                return
+
+    # -----------------------
+    # viagem no tempo
+    # -----------------------
+    def goto(self, step):
+        """Leva a VM ao estado depois de `step` passos."""
+        vm = self.vm
+        if step < 0:
+            raise VMError("Passo inválido")
+        if step > self.steps:
+            self._forward(step - self.steps)
+        elif self.steps - step <= len(self.undo):
+            while self.steps > step:
+                self._undo(self.undo.pop())
+            # checkpoints do trecho desfeito ficaram no futuro
+            while self.checkpoints[-1].step > step:
+                self.cells -= len(self.checkpoints.pop().mem)
+        elif step < self.steps:
+            steps = [c.step for c in self.checkpoints]
+            self._restore(bisect.bisect_right(steps, step) - 1)
+            self._forward(step - self.steps)
+        vm.stop_reason = vm.stop_info = None
+        vm._bp_resume = None
+        vm._record_change(None)
+
+    def _forward(self, n):
+        # reexecução sem breakpoints/watchpoints (laço rápido, código original)
+        vm = self.vm
+        vm.stop_reason = None
+        code = vm.code + [(OP_END, None, None)]
+        self.execute(vm, lambda k: vm._run_fast(code, k), n)
+
+    def _undo(self, record):
+        vm = self.vm
+        M = vm.M
+        created = []
+        for addr, old in reversed(record.writes):
+            if old is _MISSING:
+                created.append(addr)
+            else:
+                M[addr] = old
+        # células criadas pelo passo deixam de existir (do fim para o início)
+        for addr in sorted(created, reverse=True):
+            M.pop(addr, None)
+        vm.pc, vm.s = record.pc, record.sp
+        vm.halted, vm.last_error = record.halted, record.last_error
+        del vm.output[record.out_len:]
+        self._unconsume(record.consumed)
+        self.steps -= 1
+
+    def _restore(self, index):
+        # volta ao checkpoint index; a linha do tempo depois dele é descartada
+        vm = self.vm
+        ck = self.checkpoints[index]
+        self.cells -= sum(len(c.mem) for c in self.checkpoints[index + 1:])
+        del self.checkpoints[index + 1:]
+        self.undo.clear()
+        vm.M = ck.mem.copy()
+        vm.pc, vm.s = ck.pc, ck.sp
+        vm.halted, vm.last_error = ck.halted, ck.last_error
+        del vm.output[ck.out_len:]
+        self._unconsume(ck.consumed)
+        self.steps = ck.step
+
+    def _unconsume(self, count):
+        # inputs consumidos depois do ponto de destino voltam para a fila
+        values = self.consumed[count:]
+        if values:
+            del self.consumed[count:]
+            self.vm.input_queue.extendleft(reversed(values))
+
+    def stats(self):
+        return {
+            'step': self.steps,
+            'checkpoints': len(self.checkpoints),
+            'checkpoint_cells': self.cells,
+            'interval': self.interval,
+            'undo': len(self.undo),
+            'undo_size': self.undo_size,
+            'oldest_undo': self.steps - len(self.undo),
+        }
@@ -0,0 +1,151 @@
+# backend/vm_jobs.py
+# Execuções em segundo plano (/run assíncrono)
+#
+# - Cada /run assíncrono vira um job executado num pool de threads, em fatias
+#   de CHUNK_STEPS passos de VM.execute(); entre as fatias o job publica o
+#   progresso (passos, pc, tamanho da saída) e verifica cancelamento, o tempo
+#   limite (wall-clock) e o limite de memória da VM.
+# - O lock da sessão só é mantido durante cada fatia, então /state, /input e o
+#   progresso continuam respondendo enquanto o job roda.
+# - Os jobs vivem no mesmo processo das sessões (a VM não sai do processo);
+#   por isso o pool é de threads e não de processos.
+
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from vm_core import VMError
+
+CHUNK_STEPS = 50000
+
+RUNNING = 'running'
+DONE = 'done'
+ERROR = 'error'
+CANCELLED = 'cancelled'
+TIMEOUT = 'timeout'
+# jobs que param num breakpoint/watchpoint terminam com status = vm.stop_reason
+
+
+class RunJob:
+    def __init__(self, session, step_limit, timeout, on_finish=None):
+        self.id = secrets.token_hex(8)
+        self.session = session
+        self.step_limit = step_limit
+        self.timeout = timeout          # segundos (None = sem limite de tempo)
+        self.status = RUNNING
+        self.message = None
+        self.stop_info = None
+        self.steps = 0
+        self.pc = session.vm.pc
+        self.started = time.monotonic()
+        self.finished = None
+        self.snapshot = None            # estado final, preenchido ao terminar
+        self.on_finish = on_finish      # chamado com o job ao terminar (métricas)
+        self._cancel = threading.Event()
+
+    @property
+    def running(self):
+        return self.status == RUNNING
+
+    def cancel(self):
+        self._cancel.set()
+
+    def progress(self, since=0):
+        """Progresso para polling; since = quanto da saída o cliente já tem."""
+        vm = self.session.vm
+        out = vm.output[since:]
+        elapsed = (self.finished or time.monotonic()) - self.started
+        info = {
+            'job': self.id,
+            'status': self.status,
+            'steps': self.steps,
+            'pc': self.pc,
+            'elapsed': round(elapsed, 3),
+            'output': out,
+            'output_len': since + len(out),
+        }
+        if self.message:
+            info['message'] = self.message
+        if self.stop_info:
+            info['stop_info'] = self.stop_info
+        if self.snapshot is not None:
+            info['snapshot'] = self.snapshot
+        return info
+
+    def _run(self):
+        vm = self.session.vm
+        lock = self.session.lock
+        deadline = self.started + self.timeout if self.timeout else None
+        try:
+            while True:
+                if self._cancel.is_set():
+                    self._finish(CANCELLED, "Execução cancelada")
+                    return
+                if deadline is not None and time.monotonic() >= deadline:
+                    self._finish(TIMEOUT, "Tempo limite atingido")
+                    return
+                with lock:
+                    if vm.halted or self.steps >= self.step_limit:
+                        # mesmo final de VM.run()
+                        vm.check_memory()
+                        if self.steps >= self.step_limit:
+                            raise VMError("Limite de passos atingido")
+                        self._finish(DONE, None)
+                        return
+                    executed = vm.executed
+                    try:
+                        vm.execute(min(CHUNK_STEPS, self.step_limit - self.steps))
+                    finally:
+                        # com VMError, os passos antes dele também contam
+                        self.steps += vm.executed - executed
+                    # push/STR não verificam o limite de memória: a cada fatia
+                    vm.check_memory()
+                    self.pc = vm.pc
+                    if vm.stop_reason:
+                        # breakpoint / watchpoint: o job termina com esse status
+                        self._finish(vm.stop_reason, None)
+                        return
+        except VMError as e:
+            self._finish(ERROR, str(e))
+        except Exception as e:
+            self._finish(ERROR, f"Erro inesperado: {e}")
+
+    def _finish(self, status, message):
+        with self.session.lock:
+            self.pc = self.session.vm.pc
+            self.snapshot = self.session.vm.snapshot()
+            self.stop_info = self.session.vm.stop_info
+            self.message = message
+            self.finished = time.monotonic()
+            self.status = status
+        if self.on_finish is not None:
+            self.on_finish(self)
+
+
+class JobManager:
+    def __init__(self, max_workers=4, keep=256, on_finish=None):
+        self.on_finish = on_finish      # on_finish(job) ao fim de cada job
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='mvd-run')
+        self._jobs = OrderedDict()      # id -> RunJob, do mais antigo ao mais novo
+        self._keep = keep               # jobs terminados guardados para consulta
+        self._lock = threading.Lock()
+
+    def submit(self, session, step_limit=1000000, timeout=None):
+        job = RunJob(session, step_limit, timeout, self.on_finish)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._trim_locked()
+        session.job = job
+        self._pool.submit(job._run)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _trim_locked(self):
+        finished = [j.id for j in self._jobs.values() if not j.running]
+        for job_id in finished[:max(0, len(self._jobs) - self._keep)]:
+            del self._jobs[job_id]
@@ -0,0 +1,172 @@
+# backend/vm_memory.py
+# Modelos de memória da MVD
+#
+# - O modelo padrão continua sendo um dict (endereço -> valor): esparso e com
+#   inteiros de precisão arbitrária.
+# - ArrayMemory é o modelo compacto opcional: células contíguas em array('q')
+#   (8 bytes por célula) com semântica de zero-fill, mais cópias em bloco para
+#   ALLOC/DALLOC. Endereços negativos ou muito distantes do fim vão para um
+#   dict esparso auxiliar; valores que não cabem em 64 bits fazem a memória
+#   migrar (uma única vez) para uma lista de ints de Python.
+
+from array import array
+
+# maior "buraco" preenchido com zeros ao escrever além do fim do array;
+# escritas mais distantes ficam no dict esparso.
+MAX_GAP = 4096
+
+
+class ArrayMemory:
+    """Memória compacta com a mesma interface usada pela VM num dict."""
+
+    def __init__(self):
+        self._cells = array('q')
+        self._sparse = {}
+        self.wide = False      # True depois de migrar para lista (valores > 64 bits)
+
+    # -----------------------
+    # interface de dict
+    # -----------------------
+    def __getitem__(self, addr):
+        if 0 <= addr < len(self._cells):
+            return self._cells[addr]
+        return self._sparse.get(addr, 0)
+
+    def get(self, addr, default=0):
+        if 0 <= addr < len(self._cells):
+            return self._cells[addr]
+        return self._sparse.get(addr, default)
+
+    def __setitem__(self, addr, value):
+        cells = self._cells
+        size = len(cells)
+        if 0 <= addr < size:
+            try:
+                cells[addr] = value
+            except OverflowError:
+                self._widen()
+                self._cells[addr] = value
+        elif size <= addr <= size + MAX_GAP:
+            self._grow(addr + 1)
+            try:
+                self._cells[addr] = value
+            except OverflowError:
+                self._widen()
+                self._cells[addr] = value
+        else:
+            self._sparse[addr] = value
+
+    def __len__(self):
+        return len(self._cells) + len(self._sparse)
+
+    def __contains__(self, addr):
+        return 0 <= addr < len(self._cells) or addr in self._sparse
+
+    def pop(self, addr, default=None):
+        # remove a célula (histórico de execução desfazendo uma escrita): só a
+        # última célula do array deixa de existir; no meio dele volta a ser 0
+        if addr in self._sparse:
+            return self._sparse.pop(addr)
+        cells = self._cells
+        if not 0 <= addr < len(cells):
+            return default
+        value = cells[addr]
+        if addr == len(cells) - 1:
+            cells.pop()
+        else:
+            cells[addr] = 0
+        return value
+
+    def items(self):
+        for addr, value in enumerate(self._cells):
+            yield addr, value
+        yield from self._sparse.items()
+
+    def copy(self):
+        mem = ArrayMemory()
+        mem._cells = self._cells[:]
+        mem._sparse = dict(self._sparse)
+        mem.wide = self.wide
+        return mem
+
+    # -----------------------
+    # cópias em bloco (ALLOC / DALLOC)
+    # -----------------------
+    def alloc(self, sp, m, n):
+        """ALLOC m n: empilha M[m..m+n-1]; retorna o novo sp."""
+        if n <= 0:
+            return sp
+        if m < 0 or m <= sp < m + n - 1:
+            # origem negativa ou sobreposta ao destino: cópia célula a célula
+            for k in range(n):
+                sp += 1
+                self[sp] = self.get(m + k, 0)
+            return sp
+        block = self._read_block(m, n)
+        self._write_block(sp + 1, block)
+        return sp + n
+
+    def dalloc(self, sp, m, n):
+        """DALLOC m n: desempilha n valores para M[m..m+n-1]; retorna o novo sp."""
+        if n <= 0:
+            return sp
+        base = sp - n + 1
+        if m < 0 or 0 < base - m < n:
+            for k in reversed(range(n)):
+                self[m + k] = self.get(sp, 0)
+                sp -= 1
+            return sp
+        block = self._read_block(base, n)
+        self._write_block(m, block)
+        return base - 1
+
+    # -----------------------
+    # internos
+    # -----------------------
+    def _read_block(self, start, n):
+        cells = self._cells
+        block = cells[start:start + n]
+        missing = n - len(block)
+        if missing > 0:
+            # parte do bloco fora do array: zero-fill (ou dict esparso)
+            tail = [self._sparse.get(a, 0) for a in range(start + len(block), start + n)]
+            block = list(block) + tail
+        return block
+
+    def _write_block(self, start, block):
+        end = start + len(block)
+        if end - len(self._cells) > MAX_GAP:
+            for k, value in enumerate(block):
+                self[start + k] = value
+            return
+        if end > len(self._cells):
+            self._grow(end)
+        try:
+            self._cells[start:end] = block if self.wide else array('q', block)
+        except OverflowError:
+            self._widen()
+            self._cells[start:end] = list(block)
+
+    def _grow(self, size):
+        cells = self._cells
+        old = len(cells)
+        if self.wide:
+            cells.extend([0] * (size - old))
+        else:
+            cells.frombytes(bytes(cells.itemsize * (size - old)))
+        # endereços que estavam no dict esparso passam para o array
+        if self._sparse:
+            for addr in [a for a in self._sparse if old <= a < size]:
+                self[addr] = self._sparse.pop(addr)
+
+    def _widen(self):
+        # fallback: inteiros arbitrários, mantendo o layout contíguo
+        if not self.wide:
+            self._cells = list(self._cells)
+            self.wide = True
+
+
+MEMORY_MODELS = {
+    'dict': dict,
+    'array': ArrayMemory,
+}
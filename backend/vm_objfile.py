@@ -0,0 +1,323 @@
+# backend/vm_objfile.py
+# Arquivo objeto e cache de programas montados da MVD
+#
+# - Arquivo objeto (.mvdo): o resultado do montador (P, labels e o código
+#   decodificado) num formato binário compacto. Carregar um .mvdo não passa pelo
+#   montador (VM.load_assembled), o que importa para programas gerados grandes.
+# - Cabeçalho fixo (não comprimido):
+#     magic 'MVDO' | versão do formato (u16) | CRC32 da tabela de opcodes (u32)
+#     | sha256 do texto-fonte (32 bytes) | CRC32 do corpo (u32)
+#   Arquivos de outra versão do formato ou gerados com outra tabela de opcodes
+#   (opcode renumerado, instrução nova) são rejeitados com ObjectFileError.
+# - loads() não confia no arquivo: alvos de JMP/JMPF/CALL e endereços de
+#   rótulos fora do programa e corpos que descomprimidos passariam de
+#   MAX_PROGRAM_BYTES também são rejeitados.
+# - Corpo (zlib): cinco seções em colunas, cada uma com o tamanho (varint) na
+#   frente, para que a leitura seja feita em bloco e não byte a byte:
+#     opcodes (1 byte por instrução)
+#     operandos inteiros das instruções e endereços dos rótulos (decimal)
+#     mensagens das instruções inválidas (JSON)
+#     linhas de P (tokens separados por espaço)
+#     nomes dos rótulos
+# - ProgramCache: cache LRU indexado pelo sha256 do texto-fonte, em memória e,
+#   opcionalmente, num diretório de arquivos objeto (sobrevive a reinícios e é
+#   compartilhado entre processos). Uma VM com vm.program_cache não monta de
+#   novo um texto já visto.
+#
+# Uso na linha de comando (pré-montar um programa):
+#   python vm_objfile.py programa.asm -o programa.mvdo
+
+import hashlib
+import json
+import os
+import struct
+import tempfile
+import threading
+import zlib
+from collections import OrderedDict
+
+from vm_core import (
+    VM, VMError, Program, OP_NAMES, OP_ERR, _INT_OPS, _LABEL_OPS, _PAIR_OPS,
+)
+
+MAGIC = b'MVDO'
+FORMAT_VERSION = 1
+EXTENSION = '.mvdo'
+_HEADER = struct.Struct('<4sHI32sI')
+# maior corpo descomprimido aceito por loads() (bytes)
+MAX_PROGRAM_BYTES = 64 * 1024 * 1024
+# muda quando a tabela de opcodes muda: invalida os arquivos antigos
+OPCODES_CRC = zlib.crc32(",".join(OP_NAMES).encode())
+
+
+class ObjectFileError(VMError):
+    pass
+
+
+def source_hash(asm_text):
+    return hashlib.sha256(asm_text.encode('utf-8')).digest()
+
+
+# -----------------------
+# Codificação
+# -----------------------
+def _put_uint(buf, n):
+    while n >= 0x80:
+        buf.append((n & 0x7f) | 0x80)
+        n >>= 7
+    buf.append(n)
+
+
+def _put_section(buf, data):
+    _put_uint(buf, len(data))
+    buf += data
+
+
+def dumps(program, digest=b''):
+    """Program -> bytes do arquivo objeto (digest = sha256 do texto-fonte)."""
+    ops = bytearray()
+    ints = []       # operandos inteiros, na ordem das instruções
+    errors = []     # mensagens das instruções OP_ERR
+    for op, a, b in program.code:
+        ops.append(op)
+        if op in _INT_OPS or op in _LABEL_OPS:
+            ints.append(a)
+        elif op in _PAIR_OPS:
+            ints.append(a)
+            ints.append(b)
+        elif op == OP_ERR:
+            errors.append(a)
+    ints.extend(program.labels.values())
+    body = bytearray()
+    _put_section(body, ops)
+    _put_section(body, " ".join(map(str, ints)).encode())
+    _put_section(body, json.dumps(errors).encode())
+    # tokens de P e nomes de rótulos nunca têm espaço (vêm de split())
+    _put_section(body, "\n".join(" ".join(map(str, line)) for line in program.P).encode())
+    _put_section(body, "\n".join(program.labels).encode())
+    body = zlib.compress(bytes(body))
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, OPCODES_CRC,
+                          digest.ljust(32, b'\0'), zlib.crc32(body))
+    return header + body
+
+
+# -----------------------
+# Decodificação
+# -----------------------
+def _sections(data, count):
+    sections = []
+    pos = 0
+    for _ in range(count):
+        size = shift = 0
+        while True:
+            byte = data[pos]
+            pos += 1
+            size |= (byte & 0x7f) << shift
+            if byte < 0x80:
+                break
+            shift += 7
+        sections.append(data[pos:pos + size])
+        pos += size
+    if pos != len(data):
+        raise ObjectFileError("Arquivo objeto inválido: dados sobrando")
+    return sections
+
+
+def read_header(data):
+    """Valida o cabeçalho; retorna o sha256 do texto-fonte gravado."""
+    if len(data) < _HEADER.size:
+        raise ObjectFileError("Arquivo objeto inválido: cabeçalho incompleto")
+    magic, version, opcodes_crc, digest, body_crc = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ObjectFileError("Arquivo objeto inválido: não é um arquivo MVD")
+    if version != FORMAT_VERSION or opcodes_crc != OPCODES_CRC:
+        raise ObjectFileError(f"Arquivo objeto incompatível (formato {version}, "
+                              f"esperado {FORMAT_VERSION}): monte o programa de novo")
+    if zlib.crc32(data[_HEADER.size:]) != body_crc:
+        raise ObjectFileError("Arquivo objeto corrompido")
+    return digest
+
+
+def _decompress(body, max_size):
+    # zlib com limite: um corpo pequeno não pode virar gigabytes na memória
+    inflater = zlib.decompressobj()
+    data = inflater.decompress(body, max_size + 1)
+    if len(data) > max_size or inflater.unconsumed_tail:
+        raise ObjectFileError(f"Arquivo objeto inválido: programa maior que {max_size} bytes")
+    return data + inflater.flush()
+
+
+def loads(data, max_size=MAX_PROGRAM_BYTES):
+    """bytes do arquivo objeto -> Program. Levanta ObjectFileError."""
+    read_header(data)
+    try:
+        ops, ints, errors, text, names = _sections(_decompress(data[_HEADER.size:], max_size), 5)
+        ints = iter(list(map(int, ints.split())))
+        errors = json.loads(errors)
+        if not isinstance(errors, list) or not all(isinstance(e, str) for e in errors):
+            raise ObjectFileError("Arquivo objeto inválido: seção de erros não é uma lista de mensagens")
+        errors = iter(errors)
+        n = len(ops)
+        code = []
+        append = code.append
+        for op in ops:
+            if op in _LABEL_OPS:
+                target = next(ints)
+                if not 0 <= target < n:
+                    raise ObjectFileError(f"Arquivo objeto inválido: {OP_NAMES[op]} para o endereço "
+                                          f"{target}, fora do programa (endereço {len(code)})")
+                append((op, target, None))
+            elif op in _INT_OPS:
+                append((op, next(ints), None))
+            elif op in _PAIR_OPS:
+                append((op, next(ints), next(ints)))
+            elif op == OP_ERR:
+                append((op, next(errors), None))
+            elif op < OP_ERR:
+                append((op, None, None))
+            else:
+                raise ObjectFileError(f"Arquivo objeto inválido: opcode {op}")
+        P = [line.split() for line in text.decode('utf-8').split('\n')] if code else []
+        labels = dict(zip(names.decode('utf-8').split('\n'), ints)) if names else {}
+    except (IndexError, StopIteration, TypeError, ValueError, zlib.error) as e:
+        raise ObjectFileError(f"Arquivo objeto inválido: {e}")
+    if len(P) != len(code):
+        raise ObjectFileError("Arquivo objeto inválido: tamanhos de P e code diferem")
+    for label, addr in labels.items():
+        if not 0 <= addr < len(code):
+            raise ObjectFileError(f"Arquivo objeto inválido: rótulo '{label}' fora do programa")
+    return Program(P, labels, code)
+
+
+def save(path, program, digest=b''):
+    # grava num temporário e renomeia: um leitor nunca vê o arquivo pela metade
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(dumps(program, digest))
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def load(path):
+    with open(path, 'rb') as f:
+        return loads(f.read())
+
+
+# -----------------------
+# Cache de programas montados
+# -----------------------
+class ProgramCache:
+    """
+    Cache LRU de programas montados, indexado pelo sha256 do texto-fonte.
+    Com directory, cada programa também é gravado como <sha256>.mvdo e
+    consultado lá quando não está na memória; arquivos de outra versão são
+    descartados.
+    """
+
+    def __init__(self, max_entries=128, directory=None):
+        self.max_entries = max_entries
+        self.directory = directory
+        self._entries = OrderedDict()   # sha256 -> Program
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_env(cls):
+        # MVD_PROGRAM_CACHE_SIZE (0 desliga) e MVD_PROGRAM_CACHE_DIR (opcional)
+        size = int(os.environ.get('MVD_PROGRAM_CACHE_SIZE', 128))
+        if size <= 0:
+            return None
+        return cls(max_entries=size, directory=os.environ.get('MVD_PROGRAM_CACHE_DIR') or None)
+
+    def _path(self, digest):
+        return os.path.join(self.directory, digest.hex() + EXTENSION)
+
+    def get(self, asm_text):
+        digest = source_hash(asm_text)
+        with self._lock:
+            program = self._entries.get(digest)
+            if program is not None:
+                self._entries.move_to_end(digest)
+                self.hits += 1
+                return program
+        program = self._load_file(digest) if self.directory else None
+        with self._lock:
+            if program is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._insert(digest, program)
+        return program
+
+    def put(self, asm_text, program):
+        digest = source_hash(asm_text)
+        with self._lock:
+            self._insert(digest, program)
+        if self.directory:
+            try:
+                save(self._path(digest), program, digest)
+            except OSError:
+                pass    # o cache em disco é só uma otimização
+
+    def _insert(self, digest, program):
+        self._entries[digest] = program
+        self._entries.move_to_end(digest)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _load_file(self, digest):
+        path = self._path(digest)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        try:
+            if read_header(data) != digest:
+                raise ObjectFileError("sha256 do texto-fonte não confere")
+            return loads(data)
+        except ObjectFileError:
+            # entrada velha ou corrompida: descarta (será montada e regravada)
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'max_entries': self.max_entries,
+                    'hits': self.hits, 'disk_hits': self.disk_hits, 'misses': self.misses}
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Monta um programa MVD em arquivo objeto (.mvdo)")
+    parser.add_argument('source', help="programa Assembly da MVD")
+    parser.add_argument('-o', '--output', help="arquivo objeto (padrão: fonte com extensão .mvdo)")
+    args = parser.parse_args()
+    with open(args.source, encoding='utf-8') as f:
+        asm = f.read()
+    try:
+        prog = VM.assemble(asm)
+    except VMError as e:
+        print(f"erro: {e}", file=sys.stderr)
+        sys.exit(1)
+    output = args.output or os.path.splitext(args.source)[0] + EXTENSION
+    save(output, prog, source_hash(asm))
+    print(f"{output}: {len(prog.code)} instruções, {len(prog.labels)} rótulos")
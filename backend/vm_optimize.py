@@ -0,0 +1,179 @@
+# backend/vm_optimize.py
+# Otimizador peephole da MVD (opcional: vm.optimize = True antes de load_program)
+#
+# - Gera, a partir do código decodificado, um código otimizado do mesmo tamanho
+#   e alinhado com os endereços originais: cada instrução fundida fica no
+#   endereço da primeira instrução da sequência e as demais continuam lá como
+#   estavam. Assim pc, snapshot(), dump_program e as mensagens de erro sempre
+#   se referem às linhas do programa-fonte, e um salto para o meio de uma
+#   sequência continua válido.
+# - Só o laço rápido de execute() usa o código otimizado; step(), o laço
+#   instrumentado e o nível compilado usam o código original.
+# - Uma instrução fundida tem exatamente os efeitos da sequência (inclusive as
+#   células de pilha que ficam acima de sp) e conta os mesmos passos. Quando
+#   uma pré-condição falha (pilha insuficiente), a VM executa só a primeira
+#   instrução original, com step().
+#
+# Transformações:
+# - NULL de rótulo (e ALLOC/DALLOC m 0) no alvo de JMP/JMPF/CALL: o salto vai
+#   direto para a instrução seguinte, descontando os passos pulados.
+# - dobra de constantes: LDC seguido de operações só sobre constantes vira
+#   uma escrita direta dos valores (KPUSH).
+# - superinstruções para os padrões do compilador:
+#     LDV x; LDC c|LDV y; op            -> VC_BIN / VV_BIN
+#     LDV x; LDC c|LDV y; op; STR z     -> VC_STR / VV_STR   (x := x + 1, ...)
+#     LDV x; LDC c|LDV y; cmp; JMPF L   -> VC_JMPF / VV_JMPF (condição de laço)
+#     cmp; JMPF L                       -> CMP_JMPF
+#     LDV x; STR y  /  LDC c; STR y     -> V_STR / C_STR
+
+import operator
+
+from vm_core import (
+    OP_LDC, OP_LDV, OP_ADD, OP_SUB, OP_MULT, OP_DIVI, OP_INV,
+    OP_AND, OP_OR, OP_NEG, OP_CME, OP_CMA, OP_CEQ, OP_CDIF, OP_CMEQ, OP_CMAQ,
+    OP_STR, OP_JMP, OP_JMPF, OP_NULL, OP_ALLOC, OP_DALLOC, OP_CALL,
+    OP_VC_BIN, OP_VV_BIN, OP_VC_STR, OP_VV_STR, OP_VC_JMPF, OP_VV_JMPF,
+    OP_CMP_JMPF, OP_V_STR, OP_C_STR, OP_KPUSH, OP_JMP_N, OP_JMPF_N, OP_CALL_N,
+    FUSE_MAX,
+)
+
+# valor empilhado por cada operação binária (mesma semântica de step())
+VALUE_OPS = {
+    OP_ADD: operator.add,
+    OP_SUB: operator.sub,
+    OP_MULT: operator.mul,
+    OP_DIVI: operator.floordiv,
+    OP_AND: lambda x, y: 1 if x == 1 and y == 1 else 0,
+    OP_OR: lambda x, y: 0 if x == 0 and y == 0 else 1,
+    OP_CME: lambda x, y: 1 if x < y else 0,
+    OP_CMA: lambda x, y: 1 if x > y else 0,
+    OP_CEQ: lambda x, y: 1 if x == y else 0,
+    OP_CDIF: lambda x, y: 1 if x != y else 0,
+    OP_CMEQ: lambda x, y: 1 if x <= y else 0,
+    OP_CMAQ: lambda x, y: 1 if x >= y else 0,
+}
+# comparações seguidas de JMPF: só importa se a condição é verdadeira
+COND_OPS = {
+    OP_CME: operator.lt,
+    OP_CMA: operator.gt,
+    OP_CEQ: operator.eq,
+    OP_CDIF: operator.ne,
+    OP_CMEQ: operator.le,
+    OP_CMAQ: operator.ge,
+}
+UNARY_OPS = {
+    OP_INV: operator.neg,
+    OP_NEG: lambda x: 1 - x,
+}
+
+
+def optimize(code):
+    """
+    Retorna (ocode, spans): ocode alinhado com code, e spans = {endereço da
+    instrução fundida: endereços originais que ela também executa}. A VM usa
+    spans para desfazer a fusão quando um desses endereços tem breakpoint.
+    """
+    ocode = list(code)
+    spans = {}
+    for addr in range(len(code)):
+        fused = _fuse(code, addr)
+        if fused is not None:
+            ocode[addr], spans[addr] = fused
+    return ocode, spans
+
+
+def _filler(instr):
+    # linhas que não fazem nada: NULL de rótulo, ALLOC/DALLOC de 0 células
+    op, _, b = instr
+    return op == OP_NULL or (op in (OP_ALLOC, OP_DALLOC) and b <= 0)
+
+
+def _skip(code, addr, budget):
+    """Pula instruções vazias a partir de addr: (novo endereço, pulados)."""
+    skipped = []
+    while addr < len(code) and len(skipped) < budget and _filler(code[addr]):
+        skipped.append(addr)
+        addr += 1
+    return addr, skipped
+
+
+def _fuse(code, addr):
+    n = len(code)
+
+    def at(i):
+        return code[i] if i < n else (None, None, None)
+
+    op, a, b = code[addr]
+    op1, a1, _ = at(addr + 1)
+    op2, a2, _ = at(addr + 2)
+    op3, a3, _ = at(addr + 3)
+
+    # LDV x; LDC c|LDV y; ...
+    if op == OP_LDV and op1 in (OP_LDC, OP_LDV) and op2 in VALUE_OPS:
+        const = op1 == OP_LDC
+        if op2 == OP_DIVI and (not const or a1 == 0):
+            return None     # divisão por zero possível: fica com o caminho normal
+        if op3 == OP_JMPF and op2 in COND_OPS:
+            target, skipped = _skip(code, a3, FUSE_MAX - 4)
+            fused = (OP_VC_JMPF if const else OP_VV_JMPF,
+                     (a, a1, COND_OPS[op2], target, 3 + len(skipped)), None)
+            return fused, (addr + 1, addr + 2, addr + 3, *skipped)
+        if op3 == OP_STR:
+            return ((OP_VC_STR if const else OP_VV_STR, (a, a1, VALUE_OPS[op2], a3), None),
+                    (addr + 1, addr + 2, addr + 3))
+        return ((OP_VC_BIN if const else OP_VV_BIN, (a, a1, VALUE_OPS[op2]), None),
+                (addr + 1, addr + 2))
+
+    if op in COND_OPS and op1 == OP_JMPF:
+        target, skipped = _skip(code, a1, FUSE_MAX - 2)
+        return ((OP_CMP_JMPF, (COND_OPS[op], target, 1 + len(skipped)), None),
+                (addr + 1, *skipped))
+
+    if op == OP_LDC:
+        kpush = _fold(code, addr)
+        if kpush is not None:
+            return kpush
+        if op1 == OP_STR:
+            return (OP_C_STR, a, a1), (addr + 1,)
+        return None
+
+    if op == OP_LDV and op1 == OP_STR:
+        return (OP_V_STR, a, a1), (addr + 1,)
+
+    if op in (OP_JMP, OP_JMPF, OP_CALL) and a is not None:
+        target, skipped = _skip(code, a, FUSE_MAX - 1)
+        if skipped:
+            fused_op = {OP_JMP: OP_JMP_N, OP_JMPF: OP_JMPF_N, OP_CALL: OP_CALL_N}[op]
+            return (fused_op, target, len(skipped)), tuple(skipped)
+    return None
+
+
+def _fold(code, addr):
+    """
+    Dobra de constantes a partir de um LDC: simula a sequência enquanto só
+    operar sobre valores empilhados por ela. Retorna a KPUSH com as escritas
+    finais (deslocamento relativo a sp -> valor) e a variação de sp.
+    """
+    cells = {}      # deslocamento -> valor final da célula
+    depth = 0       # altura da pilha acima do sp de entrada
+    end = addr
+    while end < len(code) and end - addr < FUSE_MAX:
+        op, a, _ = code[end]
+        if op == OP_LDC:
+            depth += 1
+            cells[depth] = a
+        elif op in UNARY_OPS and depth >= 1:
+            cells[depth] = UNARY_OPS[op](cells[depth])
+        elif op in VALUE_OPS and depth >= 2:
+            if op == OP_DIVI and cells[depth] == 0:
+                break
+            cells[depth - 1] = VALUE_OPS[op](cells[depth - 1], cells[depth])
+            depth -= 1
+        else:
+            break
+        end += 1
+    if end - addr < 2:
+        return None
+    writes = tuple(sorted(cells.items()))
+    return (OP_KPUSH, writes, (depth, end - addr - 1)), tuple(range(addr + 1, end))
+
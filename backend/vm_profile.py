@@ -0,0 +1,150 @@
+# backend/vm_profile.py
+# Profiler da MVD
+#
+# - Observador ligado em VM.hooks: recebe cada instrução executada pelo laço
+#   instrumentado (e por step()). Com o profiler desligado a VM usa o laço
+#   rápido de execute(), sem nenhum custo extra.
+# - Conta execuções por endereço e por opcode e agrega por procedimento
+#   (rótulo alvo de CALL até o RETURN correspondente): chamadas, instruções
+#   (próprias e inclusivas), tempo inclusivo e profundidade máxima da pilha.
+# - Código fora de qualquer CALL é contabilizado em "<main>".
+
+import time
+
+from vm_core import OP_CALL, OP_RETURN, OP_NAMES
+
+MAIN = '<main>'
+
+
+class _ProcStats:
+    __slots__ = ('name', 'addr', 'calls', 'self_instr', 'instr', 'time', 'max_depth', 'active')
+
+    def __init__(self, name, addr):
+        self.name = name
+        self.addr = addr
+        self.calls = 0
+        self.self_instr = 0     # instruções executadas no próprio procedimento
+        self.instr = 0          # inclusivas (com os procedimentos chamados)
+        self.time = 0.0         # segundos, inclusivo
+        self.max_depth = 0      # maior tamanho da pilha (sp + 1) visto no procedimento
+        self.active = 0         # ativações em curso (recursão não conta tempo duas vezes)
+
+
+class Profiler:
+    def __init__(self, vm):
+        self.reset(vm)
+
+    def reset(self, vm):
+        # chamado pela VM ao carregar um programa ou reiniciar a execução
+        self.vm = vm
+        self.addr_counts = [0] * len(vm.code)
+        self.op_counts = [0] * (len(OP_NAMES) + 1)
+        self.total = 0
+        self._names = {}
+        for label, addr in vm.labels.items():
+            # mesmo critério de dump_program: o primeiro rótulo do endereço
+            self._names.setdefault(addr, label)
+        self.main = _ProcStats(MAIN, 0)
+        self.main.calls = 1
+        self.procs = {}         # endereço -> _ProcStats
+        self._frames = []       # (stats, total na entrada, tempo na entrada)
+
+    # -----------------------
+    # observador (VM.hooks)
+    # -----------------------
+    def after_step(self, vm, pc, instr, sp):
+        if instr is None:
+            return
+        op = instr[0]
+        self.addr_counts[pc] += 1
+        self.op_counts[min(op, len(OP_NAMES))] += 1
+        self.total += 1
+
+        frames = self._frames
+        stats = frames[-1][0] if frames else self.main
+        stats.self_instr += 1
+        depth = max(sp, vm.s) + 1
+        if depth > stats.max_depth:
+            stats.max_depth = depth
+
+        if op == OP_CALL:
+            target = instr[1]
+            callee = self.procs.get(target)
+            if callee is None:
+                callee = self.procs[target] = _ProcStats(self._names.get(target, f"@{target}"), target)
+            callee.calls += 1
+            callee.active += 1
+            frames.append((callee, self.total, time.perf_counter()))
+        elif op == OP_RETURN and frames:
+            callee, entry_total, entry_time = frames.pop()
+            callee.active -= 1
+            if callee.active == 0:
+                # só a ativação mais externa soma o inclusivo (recursão)
+                callee.instr += self.total - entry_total
+                callee.time += time.perf_counter() - entry_time
+
+    # -----------------------
+    # relatórios
+    # -----------------------
+    def report(self, top=20):
+        P = self.vm.P
+        self.main.instr = self.total
+        hot = sorted(range(len(self.addr_counts)), key=lambda a: -self.addr_counts[a])
+        procs = sorted(self.procs.values(), key=lambda p: -p.self_instr)
+        return {
+            'total': self.total,
+            'by_opcode': {
+                (OP_NAMES[op] if op < len(OP_NAMES) else 'ERR'): n
+                for op, n in enumerate(self.op_counts) if n
+            },
+            'hot': [
+                {'addr': a, 'count': self.addr_counts[a], 'instr': ' '.join(map(str, P[a]))}
+                for a in hot[:top] if self.addr_counts[a]
+            ],
+            'procedures': [
+                {
+                    'name': p.name,
+                    'addr': p.addr,
+                    'calls': p.calls,
+                    'instructions': p.instr,
+                    'self_instructions': p.self_instr,
+                    # "<main>" não é cronometrado (não há CALL de entrada)
+                    'time_ms': round(p.time * 1000, 3) if p is not self.main else None,
+                    'max_depth': p.max_depth,
+                }
+                for p in [self.main] + procs
+            ],
+        }
+
+    def listing(self):
+        """dump_program anotado: execuções e % do total por instrução."""
+        total = self.total or 1
+        lines = []
+        for i, instr in enumerate(self.vm.P):
+            lbl = self._names.get(i, "")
+            label_str = (lbl + ":") if lbl else ""
+            n = self.addr_counts[i]
+            lines.append(f"{n:>10} {100.0 * n / total:6.2f}%  {i:03d} {label_str}\t{' '.join(map(str, instr))}")
+        return "\n".join(lines)
+
+
+# -----------------------
+# ligar / desligar numa VM
+# -----------------------
+def profiler_of(vm):
+    for hook in vm.hooks:
+        if isinstance(hook, Profiler):
+            return hook
+    return None
+
+
+def enable(vm):
+    profiler = profiler_of(vm)
+    if profiler is None:
+        profiler = Profiler(vm)
+        vm.hooks.append(profiler)
+    return profiler
+
+
+def disable(vm):
+    vm.hooks[:] = [h for h in vm.hooks if not isinstance(h, Profiler)]
@@ -0,0 +1,170 @@
+# backend/vm_sessions.py
+# Sessões da MVD: uma VM por cliente
+#
+# - /load emite um id de sessão; as demais rotas recebem o id e operam só na
+#   VM daquela sessão.
+# - O pool é limitado: sessões ociosas expiram (idle_timeout) e, se o limite
+#   de sessões for atingido, a menos usada recentemente (LRU) é descartada.
+# - Cada sessão tem um lock próprio: requisições da mesma sessão são
+#   serializadas, sessões diferentes rodam em paralelo (servidor com threads).
+# - As sessões vivem na memória do processo: com vários processos WSGI o
+#   balanceador precisa manter cada cliente no mesmo processo (sticky).
+# - As VMs do pool compartilham um cache de programas montados
+#   (vm_objfile.ProgramCache): carregar de novo o mesmo texto não o monta outra vez.
+# - O histórico de execução (vm_history, para /step_back e /goto) é opcional
+#   por sessão: /load com "history": true. Ele custa tempo de execução e
+#   memória (checkpoints limitados a max_cells células); com history=True (ou
+#   MVD_HISTORY=1) toda VM nasce com ele ligado.
+# - Uma sessão descartada (expirada, LRU ou removida) fecha o trace em
+#   gravação (vm_trace) e apaga o arquivo dele.
+
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+import vm_trace
+from vm_core import VM
+from vm_objfile import ProgramCache
+
+DEFAULT_SESSION = 'default'
+
+
+class SessionError(Exception):
+    pass
+
+
+class Session:
+    def __init__(self, sid, vm):
+        self.id = sid
+        self.vm = vm
+        self.lock = threading.RLock()
+        self.last_used = time.monotonic()
+        self.job = None     # último /run assíncrono (vm_jobs.RunJob) ou /stream
+        self.input_ready = threading.Event()    # sinalizado por /input (vm_stream)
+        self.trace_path = None  # arquivo do trace de /trace (vm_trace), se houver
+
+    @property
+    def busy(self):
+        # True enquanto um job assíncrono executa esta VM
+        return self.job is not None and self.job.running
+
+    def touch(self):
+        self.last_used = time.monotonic()
+
+    def close(self):
+        # chamado pelo pool ao descartar a sessão, sem o lock dela: um job pode
+        # estar executando a VM (TraceRecorder.close é seguro entre threads)
+        recorder = vm_trace.recorder_of(self.vm)
+        if recorder is not None:
+            recorder.close()
+        if self.trace_path is not None:
+            try:
+                os.remove(self.trace_path)
+            except OSError:
+                pass
+            self.trace_path = None
+
+
+class SessionPool:
+    def __init__(self, max_sessions=64, idle_timeout=1800, max_cells=1000000, program_cache=None,
+                 history=False):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.max_cells = max_cells      # limite de células de memória por VM
+        self.program_cache = program_cache
+        self.history = history
+        self._sessions = OrderedDict()  # id -> Session, do menos para o mais recente
+        self._lock = threading.Lock()
+        # instruções/tempo de execução das VMs já descartadas (totais de stats())
+        self._retired_executed = 0
+        self._retired_seconds = 0.0
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            max_sessions=int(os.environ.get('MVD_MAX_SESSIONS', 64)),
+            idle_timeout=float(os.environ.get('MVD_SESSION_IDLE', 1800)),
+            max_cells=int(os.environ.get('MVD_SESSION_MAX_CELLS', 1000000)),
+            program_cache=ProgramCache.from_env(),
+            history=os.environ.get('MVD_HISTORY', '0') != '0',
+        )
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def create(self, sid=None):
+        """Cria uma sessão nova (id aleatório se sid não for dado)."""
+        session = Session(sid or secrets.token_hex(16), self._new_vm())
+        with self._lock:
+            self._expire_locked()
+            self._make_room_locked()
+            self._sessions[session.id] = session
+        return session
+
+    def get(self, sid):
+        """Retorna a sessão e a marca como usada; SessionError se não existir."""
+        with self._lock:
+            self._expire_locked()
+            session = self._sessions.get(sid)
+            if session is None:
+                if sid != DEFAULT_SESSION:
+                    raise SessionError("Sessão não encontrada ou expirada")
+                # clientes sem id compartilham a sessão padrão (criada sob demanda)
+                self._make_room_locked()
+                session = Session(sid, self._new_vm())
+                self._sessions[sid] = session
+            self._sessions.move_to_end(sid)
+            session.touch()
+            return session
+
+    def _new_vm(self):
+        vm = VM()
+        vm.max_cells = self.max_cells
+        vm.program_cache = self.program_cache
+        if self.history:
+            vm.enable_history()
+        return vm
+
+    def remove(self, sid):
+        with self._lock:
+            session = self._sessions.pop(sid, None)
+            if session is not None:
+                self._retire_locked(session)
+
+    def _expire_locked(self):
+        # descarta sessões ociosas há mais de idle_timeout
+        now = time.monotonic()
+        for sid in [s.id for s in self._sessions.values()
+                    if now - s.last_used > self.idle_timeout]:
+            self._retire_locked(self._sessions.pop(sid))
+
+    def _make_room_locked(self):
+        # LRU: abre espaço para mais uma sessão
+        while len(self._sessions) >= self.max_sessions:
+            self._retire_locked(self._sessions.popitem(last=False)[1])
+
+    def _retire_locked(self, session):
+        session.close()
+        self._retired_executed += session.vm.executed
+        self._retired_seconds += session.vm.exec_seconds
+
+    def stats(self):
+        """
+        Sessões ativas e totais das VMs (inclusive as já descartadas), lidos sem
+        o lock de cada sessão: valores aproximados de VMs em execução.
+        """
+        with self._lock:
+            sessions = list(self._sessions.values())
+            executed = self._retired_executed
+            seconds = self._retired_seconds
+        cells = [len(s.vm.M) for s in sessions]
+        return {
+            'active': len(sessions),
+            'busy': sum(1 for s in sessions if s.busy),
+            'executed': executed + sum(s.vm.executed for s in sessions),
+            'exec_seconds': seconds + sum(s.vm.exec_seconds for s in sessions),
+            'memory_cells': sum(cells),
+            'max_memory_cells': max(cells, default=0),
+        }
@@ -0,0 +1,143 @@
+# backend/vm_stream.py
+# Execução com eventos em fluxo (Server-Sent Events em /stream)
+#
+# - Executa a VM da sessão em fatias de CHUNK_STEPS passos de VM.execute(),
+#   com o lock da sessão só durante cada fatia (como os jobs de vm_jobs), e
+#   produz eventos à medida que acontecem:
+#     output    valores novos de PRN ({"offset", "values"}), só o que é novo
+#     progress  passos e pc, no máximo a cada PROGRESS_INTERVAL segundos
+#     waiting   RD com a fila vazia: o fluxo espera /input (session.input_ready)
+#     stop      parou num breakpoint/watchpoint
+#     halted / error / limit / timeout / cancelled   evento final
+#   O evento final traz pc, sp, passos e tamanho da saída, não o snapshot
+#   (o cliente pede /state?since=... se precisar). "steps" conta as
+#   instruções executadas, inclusive as da fatia interrompida por um erro ou
+#   por RD (a instrução que falhou não conta).
+# - A sessão fica ocupada (session.job) desde a criação do OutputStream, ainda
+#   na rota, como num /run assíncrono: outra requisição recebe 409 mesmo antes
+#   do primeiro evento. Fechar a conexão encerra a execução; close() libera a
+#   sessão se o fluxo nem chegou a começar.
+
+import secrets
+import threading
+import time
+
+from vm_core import VMError
+
+CHUNK_STEPS = 20000
+PROGRESS_INTERVAL = 0.5     # segundos entre eventos "progress"
+KEEPALIVE = 15.0            # segundos sem eventos enquanto espera input
+INPUT_TIMEOUT = 300.0       # espera máxima por input
+
+
+class OutputStream:
+    def __init__(self, session, step_limit, offset=0, input_timeout=INPUT_TIMEOUT):
+        self.id = secrets.token_hex(8)
+        self.session = session
+        self.step_limit = step_limit
+        self.offset = offset            # saída que o cliente já tem
+        self.input_timeout = input_timeout
+        self.steps = 0
+        self.running = True
+        self._cancel = threading.Event()
+        session.job = self      # chamado com o lock da sessão
+
+    def cancel(self):
+        self._cancel.set()
+        self.session.input_ready.set()
+
+    def close(self):
+        # fim da resposta HTTP (inclusive sem ter iterado events())
+        self.running = False
+
+    def events(self):
+        """Gerador de (evento, dados); termina com um evento final."""
+        try:
+            yield from self._run()
+        finally:
+            self.running = False
+
+    def _run(self):
+        vm = self.session.vm
+        lock = self.session.lock
+        sent = self.offset
+        last_progress = time.monotonic()
+        while True:
+            if self._cancel.is_set():
+                yield self._final('cancelled')
+                return
+            error = None
+            with lock:
+                if vm.halted:
+                    final = 'error' if vm.last_error else 'halted'
+                elif self.steps >= self.step_limit:
+                    final = 'limit'
+                else:
+                    final = None
+                    executed = vm.executed
+                    try:
+                        vm.execute(min(CHUNK_STEPS, self.step_limit - self.steps))
+                        vm.check_memory()
+                    except VMError as e:
+                        error = str(e)
+                    self.steps += vm.executed - executed
+                out = vm.output[sent:]
+                pc, stop, info = vm.pc, vm.stop_reason, vm.stop_info
+                waiting = error is not None and not vm.halted
+
+            if out:
+                yield 'output', {'offset': sent, 'values': out}
+                sent += len(out)
+            if final:
+                yield self._final(final)
+                return
+            if error is not None and not waiting:
+                yield self._final('error', error)
+                return
+            if stop:
+                yield 'stop', {'reason': stop, 'info': info, 'pc': pc, 'steps': self.steps}
+                return
+            if waiting:
+                yield 'waiting', {'pc': pc, 'steps': self.steps}
+                waited = yield from self._wait_input()
+                if not waited:
+                    return
+            now = time.monotonic()
+            if now - last_progress >= PROGRESS_INTERVAL:
+                last_progress = now
+                yield 'progress', {'steps': self.steps, 'pc': pc}
+
+    def _wait_input(self):
+        # espera /input; eventos "keepalive" mantêm a conexão (e detectam o
+        # cliente que desconectou)
+        session = self.session
+        deadline = time.monotonic() + self.input_timeout
+        while True:
+            session.input_ready.clear()
+            with session.lock:
+                if session.vm.input_queue:
+                    return True
+            if self._cancel.is_set():
+                yield self._final('cancelled')
+                return False
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                yield self._final('timeout', "Tempo de espera por input esgotado")
+                return False
+            if not session.input_ready.wait(min(KEEPALIVE, remaining)):
+                yield 'keepalive', {}
+
+    def _final(self, status, message=None):
+        vm = self.session.vm
+        with self.session.lock:
+            data = {
+                'status': status,
+                'steps': self.steps,
+                'pc': vm.pc,
+                'sp': vm.s,
+                'halted': vm.halted,
+                'output_len': len(vm.output),
+            }
+            if message or vm.last_error:
+                data['message'] = message or vm.last_error
+        return status, data
@@ -0,0 +1,426 @@
+# backend/vm_trace.py
+# Trace de execução da MVD (gravação em arquivo e leitura offline)
+#
+# - TraceRecorder: observador em VM.hooks, como o profiler. Com ele ligado,
+#   execute()/run() usam o laço instrumentado; cada instrução executada vira um
+#   registro (passo, pc, opcode, sp depois, topo da pilha depois, células
+#   escritas com os valores novos). A instrução que termina em erro não é
+#   registrada; o erro fica no rodapé.
+# - max_steps limita o tamanho do trace: ao atingi-lo a gravação para (a
+#   execução continua) e os metadados ganham "truncated": true.
+# - close() pode ser chamado de outra thread durante a execução (sessão
+#   descartada pelo pool): os chunks são gravados com um lock e, com o arquivo
+#   fechado, os passos seguintes são descartados.
+# - Os registros ficam em colunas na memória e são gravados em blocos
+#   ("chunks") de chunk_steps passos, comprimidos com zlib, por um arquivo
+#   com buffer: a gravação custa uma compressão a cada chunk, não uma escrita
+#   por passo.
+# - Formato (.mvdt):
+#     cabeçalho: magic 'MVDT' | versão (u16) | sha256 do programa (32 bytes)
+#     chunks:    tamanho comprimido (u32) | 1º passo (u64) | nº de passos (u32)
+#                | corpo zlib: pc (i32[]) | opcode (u8[]) | sp (i32[])
+#                | topos (decimal) | escritas de STR/ALLOC/DALLOC (decimal:
+#                quantidade e pares endereço valor)
+#     rodapé:    índice (offset u64, 1º passo u64, nº u32 por chunk), metadados
+#                (JSON: passos, halted, last_error) e o trailer
+#                offset do índice (u64) | nº de chunks (u32) | tamanho do JSON
+#                (u32) | 'MVDX'
+#   Sem rodapé (gravação interrompida) o leitor percorre os chunks em ordem.
+#   As demais instruções escrevem só em M[sp] (ou em nada): a escrita é
+#   reconstruída pelo leitor a partir do opcode, do sp e do topo (M[sp]).
+# - TraceReader: iterar, ir a um passo (trace[n], iter_from(n)) e diff() de
+#   dois traces, por exemplo o mesmo programa gerado por duas versões do
+#   compilador: o primeiro passo em que os campos escolhidos divergem.
+#
+# Uso na linha de comando:
+#   python vm_trace.py record programa.asm -o programa.mvdt [--input "1 2 3"]
+#   python vm_trace.py show programa.mvdt [--start N] [--count K]
+#   python vm_trace.py diff a.mvdt b.mvdt [--fields op,sp,top,writes]
+
+import bisect
+import hashlib
+import json
+import struct
+import threading
+import zlib
+from array import array
+from collections import namedtuple
+
+from vm_core import (
+    VMError, OP_NAMES, OP_LDC, OP_LDV, OP_RD, OP_CALL, OP_ADD, OP_CMAQ,
+    OP_STR, OP_ALLOC, OP_DALLOC,
+)
+
+MAGIC = b'MVDT'
+INDEX_MAGIC = b'MVDX'
+FORMAT_VERSION = 1
+EXTENSION = '.mvdt'
+CHUNK_STEPS = 16384
+BUFFER_SIZE = 1 << 20
+
+_HEADER = struct.Struct('<4sH32s')
+_CHUNK = struct.Struct('<IQI')
+_INDEX = struct.Struct('<QQI')
+_TRAILER = struct.Struct('<QII4s')
+
+Step = namedtuple('Step', 'step pc op sp top writes')
+FIELDS = Step._fields[1:]
+
+# instruções que escrevem exatamente a célula do novo topo
+_TOP_WRITE = frozenset((OP_LDC, OP_LDV, OP_RD, OP_CALL, *range(OP_ADD, OP_CMAQ + 1)))
+# instruções cujas escritas vão para a coluna de escritas
+_EXTRA_WRITE = frozenset((OP_STR, OP_ALLOC, OP_DALLOC))
+
+
+class TraceError(VMError):
+    pass
+
+
+def program_hash(vm):
+    return hashlib.sha256("\n".join(" ".join(map(str, line)) for line in vm.P).encode()).digest()
+
+
+# -----------------------
+# Gravação
+# -----------------------
+class TraceRecorder:
+    def __init__(self, vm, path, chunk_steps=CHUNK_STEPS, max_steps=None):
+        self.path = path
+        self.chunk_steps = chunk_steps
+        self.max_steps = max_steps      # None: sem limite
+        self._file = None
+        self._lock = threading.Lock()
+        self.reset(vm)
+
+    def reset(self, vm):
+        # chamado pela VM ao carregar um programa ou reiniciar a execução:
+        # recomeça o arquivo
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+            self.vm = vm
+            self._file = open(self.path, 'wb', buffering=BUFFER_SIZE)
+            self._file.write(_HEADER.pack(MAGIC, FORMAT_VERSION, program_hash(vm)))
+            self._index = []
+            self.steps = 0          # passos já gravados em chunks
+            # max_steps atingido: não grava mais
+            self.truncated = self.max_steps is not None and self.max_steps <= 0
+            self._new_chunk()
+
+    def _new_chunk(self):
+        self._rows = []         # (pc, opcode, sp, topo) por passo
+        self._add = self._rows.append
+        self._writes = []
+        # o chunk termina em max_steps: o limite é exato
+        self._chunk_limit = self.chunk_steps
+        if self.max_steps is not None:
+            self._chunk_limit = min(self._chunk_limit, self.max_steps - self.steps)
+
+    # -----------------------
+    # observador (VM.hooks)
+    # -----------------------
+    def after_step(self, vm, pc, instr, sp):
+        if instr is None or self.truncated:
+            return
+        op = instr[0]
+        new_sp = vm.s
+        self._add((pc, op, new_sp, vm.M.get(new_sp, 0)))
+        if op in _EXTRA_WRITE:
+            self._extra(vm, instr, sp, new_sp)
+        if len(self._rows) >= self._chunk_limit:
+            with self._lock:
+                self._flush()
+
+    def _extra(self, vm, instr, sp, new_sp):
+        M = vm.M
+        written = sorted(vm._written(instr, sp, new_sp))
+        writes = self._writes
+        writes.append(len(written))
+        for addr in written:
+            writes.append(addr)
+            writes.append(M.get(addr, 0))
+
+    def _flush(self):
+        # com self._lock
+        rows = self._rows
+        if self._file is None:
+            # fechado durante a execução: descarta
+            self._new_chunk()
+            return
+        if not rows:
+            return
+        pcs, ops, sps, tops = zip(*rows)
+        body = bytearray()
+        for column in (array('i', pcs).tobytes(), bytes(ops), array('i', sps).tobytes(),
+                       " ".join(map(str, tops)).encode(),
+                       " ".join(map(str, self._writes)).encode()):
+            body += struct.pack('<I', len(column))
+            body += column
+        data = zlib.compress(bytes(body), 1)
+        self._index.append((self._file.tell(), self.steps, len(rows)))
+        self._file.write(_CHUNK.pack(len(data), self.steps, len(rows)))
+        self._file.write(data)
+        self.steps += len(rows)
+        if self.max_steps is not None and self.steps >= self.max_steps:
+            self.truncated = True
+        self._new_chunk()
+
+    def close(self):
+        """Grava o que falta, o índice e os metadados e fecha o arquivo."""
+        with self._lock:
+            if self._file is None:
+                return
+            self._flush()
+            f = self._file
+            offset = f.tell()
+            for entry in self._index:
+                f.write(_INDEX.pack(*entry))
+            meta = {'steps': self.steps, 'halted': self.vm.halted,
+                    'last_error': self.vm.last_error}
+            if self.truncated:
+                meta['truncated'] = True
+            meta = json.dumps(meta).encode()
+            f.write(meta)
+            f.write(_TRAILER.pack(offset, len(self._index), len(meta), INDEX_MAGIC))
+            f.close()
+            self._file = None
+
+
+# -----------------------
+# Leitura
+# -----------------------
+class TraceReader:
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._data = f.read()
+        data = self._data
+        if len(data) < _HEADER.size:
+            raise TraceError("Trace inválido: cabeçalho incompleto")
+        magic, version, self.program = _HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise TraceError("Trace inválido: não é um trace MVD")
+        if version != FORMAT_VERSION:
+            raise TraceError(f"Trace incompatível (formato {version}, esperado {FORMAT_VERSION})")
+        self.meta = {}
+        self._index = self._read_index() or self._scan()
+        self._starts = [first for _, first, _ in self._index]
+        self._cached = (None, None)
+
+    def _read_index(self):
+        data = self._data
+        if len(data) < _HEADER.size + _TRAILER.size:
+            return None
+        offset, chunks, meta_len, magic = _TRAILER.unpack_from(data, len(data) - _TRAILER.size)
+        if magic != INDEX_MAGIC:
+            return None
+        index = [_INDEX.unpack_from(data, offset + i * _INDEX.size) for i in range(chunks)]
+        meta_at = offset + chunks * _INDEX.size
+        self.meta = json.loads(data[meta_at:meta_at + meta_len])
+        return index
+
+    def _scan(self):
+        # sem rodapé: percorre os cabeçalhos dos chunks completos
+        index = []
+        pos = _HEADER.size
+        data = self._data
+        while pos + _CHUNK.size <= len(data):
+            size, first, count = _CHUNK.unpack_from(data, pos)
+            if pos + _CHUNK.size + size > len(data):
+                break
+            index.append((pos, first, count))
+            pos += _CHUNK.size + size
+        return index
+
+    def __len__(self):
+        if not self._index:
+            return 0
+        _, first, count = self._index[-1]
+        return first + count
+
+    def _chunk(self, i):
+        if self._cached[0] == i:
+            return self._cached[1]
+        offset, first, count = self._index[i]
+        size = _CHUNK.unpack_from(self._data, offset)[0]
+        start = offset + _CHUNK.size
+        try:
+            body = zlib.decompress(self._data[start:start + size])
+            columns = []
+            pos = 0
+            for _ in range(5):
+                (length,) = struct.unpack_from('<I', body, pos)
+                columns.append(body[pos + 4:pos + 4 + length])
+                pos += 4 + length
+        except (zlib.error, struct.error) as e:
+            raise TraceError(f"Trace corrompido: {e}")
+        try:
+            steps = self._decode(first, columns)
+        except (ValueError, RuntimeError, StopIteration):
+            steps = None
+        if steps is None or len(steps) != count:
+            raise TraceError("Trace corrompido: chunk incompleto")
+        self._cached = (i, steps)
+        return steps
+
+    @staticmethod
+    def _decode(first, columns):
+        pcs = array('i', columns[0])
+        sps = array('i', columns[2])
+        tops = list(map(int, columns[3].split()))
+        extra = iter(list(map(int, columns[4].split())))
+        steps = []
+        append = steps.append
+        step = first
+        for pc, op, sp, top in zip(pcs, columns[1], sps, tops):
+            if op in _TOP_WRITE:
+                writes = ((sp, top),)
+            elif op in _EXTRA_WRITE:
+                writes = tuple((next(extra), next(extra)) for _ in range(next(extra)))
+            else:
+                writes = ()
+            append(Step(step, pc, op, sp, top, writes))
+            step += 1
+        return steps
+
+    def __getitem__(self, step):
+        if not 0 <= step < len(self):
+            raise IndexError(step)
+        i = bisect.bisect_right(self._starts, step) - 1
+        return self._chunk(i)[step - self._starts[i]]
+
+    def iter_from(self, step=0):
+        """Registros a partir do passo `step` (ir a um passo sem ler o que vem antes)."""
+        if step >= len(self):
+            return
+        i = max(bisect.bisect_right(self._starts, step) - 1, 0)
+        skip = step - self._starts[i]
+        for j in range(i, len(self._index)):
+            chunk = self._chunk(j)
+            yield from (chunk[skip:] if skip else chunk)
+            skip = 0
+
+    def __iter__(self):
+        return self.iter_from(0)
+
+
+def diff(a, b, fields=FIELDS, limit=1):
+    """
+    Compara dois traces passo a passo nos campos escolhidos (pc, op, sp, top,
+    writes). Retorna até `limit` divergências: (passo, campo, valor em a,
+    valor em b); traces de tamanhos diferentes terminam com o campo 'steps'.
+    """
+    found = []
+    for x, y in zip(a, b):
+        for field in fields:
+            vx, vy = getattr(x, field), getattr(y, field)
+            if vx != vy:
+                found.append((x.step, field, vx, vy))
+                if len(found) >= limit:
+                    return found
+                break
+    if len(a) != len(b):
+        found.append((min(len(a), len(b)), 'steps', len(a), len(b)))
+    return found
+
+
+def format_step(step):
+    name = OP_NAMES[step.op] if step.op < len(OP_NAMES) else '?'
+    writes = " ".join(f"M[{addr}]={value}" for addr, value in step.writes)
+    return f"{step.step:>10} pc={step.pc:<6} {name:<7} sp={step.sp:<5} top={step.top:<8} {writes}"
+
+
+# -----------------------
+# ligar / desligar numa VM
+# -----------------------
+def recorder_of(vm):
+    for hook in vm.hooks:
+        if isinstance(hook, TraceRecorder):
+            return hook
+    return None
+
+
+def enable(vm, path, chunk_steps=CHUNK_STEPS, max_steps=None):
+    recorder = recorder_of(vm)
+    if recorder is None:
+        recorder = TraceRecorder(vm, path, chunk_steps, max_steps)
+        vm.hooks.append(recorder)
+    return recorder
+
+
+def disable(vm):
+    """Fecha o arquivo do trace e desliga a gravação; retorna o caminho."""
+    recorder = recorder_of(vm)
+    if recorder is None:
+        return None
+    recorder.close()
+    vm.hooks[:] = [h for h in vm.hooks if not isinstance(h, TraceRecorder)]
+    return recorder.path
+
+
+if __name__ == '__main__':
+    import argparse
+    import os
+    import sys
+
+    from vm_core import VM
+
+    parser = argparse.ArgumentParser(description="Trace de execução da MVD")
+    commands = parser.add_subparsers(dest='command', required=True)
+    record = commands.add_parser('record', help="executa um programa gravando o trace")
+    record.add_argument('source', help="programa Assembly da MVD")
+    record.add_argument('-o', '--output', help="arquivo do trace (padrão: fonte com extensão .mvdt)")
+    record.add_argument('--input', default='', help="valores de input separados por espaço")
+    record.add_argument('--limit', type=int, default=10_000_000, help="limite de passos")
+    show = commands.add_parser('show', help="lista os passos de um trace")
+    show.add_argument('trace')
+    show.add_argument('--start', type=int, default=0)
+    show.add_argument('--count', type=int, default=50)
+    compare = commands.add_parser('diff', help="primeira divergência entre dois traces")
+    compare.add_argument('a')
+    compare.add_argument('b')
+    compare.add_argument('--fields', default=",".join(FIELDS))
+    compare.add_argument('--limit', type=int, default=1)
+    args = parser.parse_args()
+
+    try:
+        if args.command == 'record':
+            with open(args.source, encoding='utf-8') as f:
+                asm = f.read()
+            vm = VM()
+            vm.load_program(asm)
+            vm.enqueue_inputs(args.input)
+            output = args.output or os.path.splitext(args.source)[0] + EXTENSION
+            enable(vm, output)
+            try:
+                vm.run(args.limit)
+            except VMError as e:
+                print(f"execução: {e}", file=sys.stderr)
+            finally:
+                disable(vm)
+            print(f"{output}: {len(TraceReader(output))} passos")
+        elif args.command == 'show':
+            trace = TraceReader(args.trace)
+            for entry in trace.iter_from(args.start):
+                if entry.step >= args.start + args.count:
+                    break
+                print(format_step(entry))
+            if trace.meta:
+                print(f"# {trace.meta}")
+        else:
+            a, b = TraceReader(args.a), TraceReader(args.b)
+            fields = [name for name in args.fields.split(',') if name]
+            unknown = set(fields) - set(FIELDS)
+            if unknown:
+                parser.error(f"campos desconhecidos: {', '.join(sorted(unknown))}")
+            divergences = diff(a, b, fields, args.limit)
+            if not divergences:
+                print(f"iguais ({len(a)} passos)")
+            for step, field, va, vb in divergences:
+                print(f"passo {step}: {field} {va!r} != {vb!r}")
+                if field != 'steps':
+                    print("  a:", format_step(a[step]))
+                    print("  b:", format_step(b[step]))
+            sys.exit(1 if divergences else 0)
+    except (OSError, VMError) as e:
+        print(f"erro: {e}", file=sys.stderr)
+        sys.exit(2)
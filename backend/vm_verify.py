@@ -0,0 +1,392 @@
+# backend/vm_verify.py
+# Verificador estático da MVD
+#
+# - Grafo de fluxo de controle a partir do código decodificado: sequência,
+#   JMP, JMPF (dois sucessores), CALL (entrada do procedimento + retorno para
+#   a instrução seguinte), RETURN/HLT/instrução inválida encerram o caminho.
+# - Profundidade da pilha (nº de células, sp + 1) por instrução, como um
+#   intervalo [mín, máx], por interpretação abstrata com alargamento (laços
+#   que empilham sem desempilhar ficam com máx = None, ilimitado).
+#   - No programa principal a profundidade é absoluta (começa em 0).
+#   - Cada alvo de CALL é analisado como procedimento, com profundidade
+#     relativa à entrada (1 = só o endereço de retorno); o efeito líquido do
+#     procedimento sobre a pilha do chamador vem dos seus RETURN. Em
+#     programas sem RETURN, CALL só empilha e desvia.
+# - Diagnósticos: instruções inválidas, underflow certo ou possível, código
+#   inalcançável, ALLOC/DALLOC desbalanceados (DALLOC sem o ALLOC
+#   correspondente, alocação pendente em HLT/RETURN, caminhos que chegam com
+#   alocações diferentes) e RETURN fora de procedimento.
+# - Instruções seguras: as que desempilham e, em todo caminho, encontram
+#   células suficientes (a verificação de pilha da execução é redundante).
+# - Suposição: RETURN volta para a instrução seguinte ao CALL correspondente.
+#   Isso vale para o código gerado pelo compilador, mas o endereço de retorno
+#   é um valor comum na pilha (STR/DALLOC podem alterá-lo). Por isso a análise
+#   só é "sound" (sem suposição) em programas sem RETURN, e só nesse caso os
+#   motores de execução usam os resultados (vm_compile omite as guardas de
+#   pilha dos blocos).
+
+from collections import deque
+
+from vm_core import (
+    OP_NAMES, OP_HLT, OP_START, OP_LDC, OP_LDV, OP_ADD, OP_SUB, OP_MULT, OP_DIVI,
+    OP_INV, OP_AND, OP_OR, OP_NEG, OP_CME, OP_CMA, OP_CEQ, OP_CDIF, OP_CMEQ, OP_CMAQ,
+    OP_STR, OP_JMP, OP_JMPF, OP_NULL, OP_RD, OP_PRN, OP_ALLOC, OP_DALLOC,
+    OP_CALL, OP_RETURN, OP_ERR,
+)
+
+WIDEN_AFTER = 8          # junções que mudam um estado antes de alargar
+MAIN = None              # contexto do programa principal
+NEG_INF = float('-inf')  # limite inferior desconhecido (profundidade relativa)
+
+_BINARY = (OP_ADD, OP_SUB, OP_MULT, OP_DIVI, OP_AND, OP_OR,
+           OP_CME, OP_CMA, OP_CEQ, OP_CDIF, OP_CMEQ, OP_CMAQ)
+
+ERROR = 'error'
+WARNING = 'warning'
+
+
+def requirement(instr):
+    """Células que a instrução desempilha/lê (a verificação do laço rápido)."""
+    op, _, b = instr
+    if op in _BINARY:
+        return 2
+    if op in (OP_INV, OP_NEG, OP_STR, OP_JMPF, OP_PRN, OP_RETURN):
+        return 1
+    if op == OP_DALLOC:
+        return max(b, 0)
+    return 0
+
+
+def _after(instr, lo, hi, absolute):
+    """
+    Profundidade depois da instrução, supondo que ela não deu erro; None se
+    ela sempre dá erro. A execução só para nos limites que step() verifica:
+    ADD com uma célula, por exemplo, lê M[-1] e segue com a pilha vazia. Num
+    procedimento (profundidade relativa) não se sabe quantas células há abaixo
+    do quadro, então nada é descartado.
+    """
+    op, _, b = instr
+    if op in (OP_LDC, OP_LDV, OP_RD):
+        return lo + 1, _add(hi, 1)
+    if op in _BINARY or op in (OP_STR, OP_JMPF, OP_PRN, OP_RETURN):
+        n = 1
+    elif op == OP_DALLOC:
+        n = max(b, 0)
+    elif op == OP_ALLOC:
+        n = max(b, 0)
+        return lo + n, _add(hi, n)
+    elif op == OP_START:
+        return 0, 0
+    else:
+        return lo, hi   # INV, NEG, NULL, JMP
+    if not absolute:
+        return lo - n, _add(hi, -n)
+    if hi is not None and hi < n:
+        return None     # pilha vazia: erro em todo caminho
+    return max(lo, n) - n, _add(hi, -n)
+
+
+def _add(hi, k):
+    return None if hi is None else hi + k
+
+
+class _State:
+    __slots__ = ('lo', 'hi', 'allocs', 'joins')
+
+    def __init__(self, lo, hi, allocs):
+        self.lo = lo
+        self.hi = hi            # None = ilimitado
+        self.allocs = allocs    # tupla de (m, n) ainda não desalocados; None = desconhecido
+        self.joins = 0
+
+
+class Analysis:
+    def __init__(self, code, labels=None):
+        self.code = code
+        self.labels = labels or {}
+        self.n = len(code)
+        self.states = {}        # (contexto, endereço) -> _State
+        self.effects = {}       # procedimento -> (mín, máx) do efeito líquido, ou ausente
+        self.callers = {}       # procedimento -> {(contexto, endereço do CALL)}
+        self.conflicts = set()  # endereços onde chegam alocações diferentes
+        self.irregular = set()  # procedimentos que executam START
+        self._effect_changes = {}
+        self.sound = not any(op == OP_RETURN for op, _, _ in code)
+        self._index = None      # endereço -> [(contexto, estado)], depois do ponto fixo
+        self._run()
+
+    # -----------------------
+    # ponto fixo
+    # -----------------------
+    def _run(self):
+        self._work = deque()
+        if self.n:
+            self._join(MAIN, 0, 0, 0, ())
+        while self._work:
+            ctx, addr = self._work.popleft()
+            self._visit(ctx, addr)
+
+    def _join(self, ctx, addr, lo, hi, allocs):
+        if not 0 <= addr < self.n:
+            return
+        key = (ctx, addr)
+        state = self.states.get(key)
+        if state is None:
+            self.states[key] = _State(lo, hi, allocs)
+            self._work.append(key)
+            return
+        new_lo = min(state.lo, lo)
+        new_hi = None if state.hi is None or hi is None else max(state.hi, hi)
+        new_allocs = state.allocs
+        if allocs != state.allocs and state.allocs is not None:
+            if allocs is not None:
+                self.conflicts.add(addr)
+            new_allocs = None
+        if (new_lo, new_hi, new_allocs) == (state.lo, state.hi, state.allocs):
+            return
+        state.joins += 1
+        if state.joins > WIDEN_AFTER:
+            # alargamento: o que ainda varia vira ilimitado
+            if new_hi != state.hi:
+                new_hi = None
+            if new_lo != state.lo:
+                new_lo = 0 if ctx is MAIN else NEG_INF
+        state.lo, state.hi, state.allocs = new_lo, new_hi, new_allocs
+        self._work.append(key)
+
+    def _visit(self, ctx, addr):
+        state = self.states[(ctx, addr)]
+        instr = self.code[addr]
+        op, a, b = instr
+        lo, hi, allocs = state.lo, state.hi, state.allocs
+
+        if op == OP_HLT or op >= OP_ERR:
+            return
+        absolute = ctx is MAIN
+        if op == OP_RETURN:
+            if not absolute:
+                self._returned(ctx, *_after(instr, lo, hi, False))
+            return
+        if op == OP_CALL and self.sound:
+            # sem RETURN, CALL só empilha e desvia
+            self._join(ctx, a, lo + 1, _add(hi, 1), allocs)
+            return
+        if op == OP_CALL:
+            self._enter(a, ctx, addr)
+            effect = self.effects.get(a)
+            if effect is not None:
+                lo += effect[0]
+                hi = None if hi is None or effect[1] is None else hi + effect[1]
+                if absolute:
+                    if hi is not None and hi < 0:
+                        return      # o procedimento sempre esvazia demais a pilha
+                    lo = max(lo, 0)
+                self._join(ctx, addr + 1, lo, hi, allocs)
+            return
+        if op == OP_START and not absolute and ctx not in self.irregular:
+            # START dentro de um procedimento descarta o quadro do chamador:
+            # o efeito do procedimento na pilha fica desconhecido
+            self.irregular.add(ctx)
+            self._set_effect(ctx, (NEG_INF, None))
+
+        if allocs is not None:
+            if op == OP_ALLOC:
+                allocs = allocs + ((a, b),)
+            elif op == OP_DALLOC:
+                allocs = allocs[:-1] if allocs and allocs[-1] == (a, b) else None
+            elif op == OP_START:
+                allocs = ()
+        after = _after(instr, lo, hi, absolute)
+        if after is None:
+            return
+        lo, hi = after
+        if op == OP_JMP:
+            self._join(ctx, a, lo, hi, allocs)
+        elif op == OP_JMPF:
+            self._join(ctx, a, lo, hi, allocs)
+            self._join(ctx, addr + 1, lo, hi, allocs)
+        else:
+            self._join(ctx, addr + 1, lo, hi, allocs)
+
+    def _enter(self, proc, ctx, addr):
+        self.callers.setdefault(proc, set()).add((ctx, addr))
+        # entrada do procedimento: só o endereço de retorno (relativo)
+        self._join(proc, proc, 1, 1, ())
+
+    def _returned(self, proc, lo, hi):
+        # efeito líquido no chamador: profundidade relativa depois do RETURN
+        old = self.effects.get(proc)
+        if proc in self.irregular:
+            return
+        if old is None:
+            new = (lo, hi)
+        else:
+            new = (min(old[0], lo), None if old[1] is None or hi is None else max(old[1], hi))
+        if new == old:
+            return
+        changes = self._effect_changes[proc] = self._effect_changes.get(proc, 0) + 1
+        if old is not None and changes > WIDEN_AFTER:
+            # recursão que empilha/desempilha a cada nível: alargamento
+            new = (new[0] if new[0] == old[0] else NEG_INF, new[1] if new[1] == old[1] else None)
+        self._set_effect(proc, new)
+
+    def _set_effect(self, proc, effect):
+        self.effects[proc] = effect
+        for key in self.callers.get(proc, ()):
+            self._work.append(key)
+
+    # -----------------------
+    # resultados
+    # -----------------------
+    def depth(self, addr):
+        """
+        Intervalo (mín, máx) antes da instrução, em todos os contextos; None se
+        inalcançável. O mínimo vale para a profundidade absoluta; o máximo é
+        relativo ao procedimento quando a instrução só aparece num
+        procedimento (context()) e None quando ela aparece em vários.
+        """
+        found = self._by_addr().get(addr)
+        if not found:
+            return None
+        lo = min(state.lo for _, state in found)
+        his = [state.hi for _, state in found]
+        if None in his or len({ctx for ctx, _ in found}) > 1:
+            return lo, None
+        return lo, max(his)
+
+    def context(self, addr):
+        """Procedimento (endereço de entrada) da instrução; MAIN se for do principal ou de vários."""
+        found = self._by_addr().get(addr)
+        contexts = {ctx for ctx, _ in found} if found else ()
+        return next(iter(contexts)) if len(contexts) == 1 else MAIN
+
+    def _by_addr(self):
+        if self._index is None:
+            self._index = {}
+            for (ctx, addr), state in self.states.items():
+                self._index.setdefault(addr, []).append((ctx, state))
+        return self._index
+
+    def safe(self):
+        """Endereços cuja verificação de pilha nunca falha (em todo contexto)."""
+        result = set()
+        for addr, entries in self._by_addr().items():
+            need = requirement(self.code[addr])
+            if need and all(state.lo >= need for _, state in entries):
+                result.add(addr)
+        return result
+
+    def unreachable(self):
+        """Trechos [início, fim] nunca alcançados (ignorando linhas só de rótulo)."""
+        reached = {addr for _, addr in self.states}
+        ranges = []
+        start = None
+        for addr in range(self.n + 1):
+            dead = addr < self.n and addr not in reached
+            if dead and start is None:
+                start = addr
+            elif not dead and start is not None:
+                if any(self.code[i][0] != OP_NULL for i in range(start, addr)):
+                    ranges.append([start, addr - 1])
+                start = None
+        return ranges
+
+    def diagnostics(self):
+        diags = []
+
+        def add(addr, level, message):
+            diags.append({'addr': addr, 'level': level, 'message': message})
+
+        for addr, (op, a, b) in enumerate(self.code):
+            if op == OP_ERR:
+                add(addr, ERROR, a)
+        for addr, entries in sorted(self._by_addr().items(), key=lambda item: item[0]):
+            instr = self.code[addr]
+            op, a, b = instr
+            name = OP_NAMES[op] if op < len(OP_NAMES) else 'ERR'
+            need = requirement(instr)
+            reported = False
+            for ctx, state in entries:
+                if need and state.lo < need and not reported:
+                    reported = True
+                    certain = ctx is MAIN and state.hi is not None and state.hi < need
+                    add(addr, ERROR if certain else WARNING,
+                        f"{name}: pilha {'insuficiente' if certain else 'possivelmente insuficiente'} "
+                        f"({_fmt(state.lo, state.hi)} células, precisa de {need})")
+                if op == OP_RETURN and ctx is MAIN:
+                    add(addr, WARNING, "RETURN fora de procedimento")
+                if state.allocs is None:
+                    continue
+                if op == OP_DALLOC and b > 0:
+                    if not state.allocs:
+                        add(addr, ERROR, f"DALLOC {a} {b} sem ALLOC correspondente")
+                    elif state.allocs[-1] != (a, b):
+                        m, k = state.allocs[-1]
+                        add(addr, ERROR, f"DALLOC {a} {b} não corresponde a ALLOC {m} {k}")
+                elif op in (OP_HLT, OP_RETURN) and state.allocs:
+                    m, k = state.allocs[-1]
+                    add(addr, WARNING, f"{name} com ALLOC {m} {k} sem DALLOC")
+        for addr in sorted(self.conflicts):
+            add(addr, WARNING, "ALLOC/DALLOC desbalanceados: caminhos chegam com alocações diferentes")
+        for start, end in self.unreachable():
+            add(start, WARNING, f"código inalcançável ({start}..{end})")
+        # sem duplicatas (contextos diferentes), na ordem do programa
+        seen = set()
+        unique = []
+        for d in sorted(diags, key=lambda d: d['addr']):
+            key = (d['addr'], d['message'])
+            if key not in seen:
+                seen.add(key)
+                unique.append(d)
+        return unique
+
+    def report(self):
+        safe = self.safe()
+        names = {}
+        for label, addr in self.labels.items():
+            names.setdefault(addr, label)
+        instructions = []
+        for addr in range(self.n):
+            instructions.append({
+                'addr': addr,
+                'depth': _interval(self.depth(addr)),
+                'proc': self.context(addr),
+                'safe': addr in safe,
+            })
+        return {
+            'sound': self.sound,
+            'instructions': instructions,
+            'procedures': [
+                {'addr': proc, 'name': names.get(proc, f"@{proc}"),
+                 'effect': None if proc not in self.effects else [_bound(x) for x in self.effects[proc]],
+                 'calls': len(self.callers[proc])}
+                for proc in sorted(self.callers)
+            ],
+            'diagnostics': self.diagnostics(),
+            'unreachable': self.unreachable(),
+            'safe': len(safe),
+            'checked': sum(1 for instr in self.code if requirement(instr)),
+        }
+
+
+def _bound(x):
+    return None if x == NEG_INF else x
+
+
+def _interval(d):
+    if d is None:
+        return None
+    lo, hi = _bound(d[0]), d[1]
+    return lo if lo == hi else [lo, hi]
+
+
+def _fmt(lo, hi):
+    if lo == NEG_INF:
+        return "desconhecido" if hi is None else f"até {hi}"
+    if hi is None:
+        return f"{lo} ou mais"
+    return str(lo) if lo == hi else f"{lo} a {hi}"
+
+
+def analyze(code, labels=None):
+    return Analysis(code, labels)
@@ -5,6 +5,8 @@ const btnLoad = document.getElementById('btnLoad');
 const btnStep = document.getElementById('btnStep');
 const btnRun = document.getElementById('btnRun');
 const btnReset = document.getElementById('btnReset');
+const btnStop = document.getElementById('btnStop');
+const btnAnimate = document.getElementById('btnAnimate');
 const btnUpload = document.getElementById('btnUpload');
 const fileInput = document.getElementById('fileInput');
 
@@ -17,7 +19,13 @@ const logView = document.getElementById('logView');
 const exampleSelect = document.getElementById('exampleSelect');
 const btnLoadExample = document.getElementById('btnLoadExample');
 
+// id da sessão emitido pelo backend em /load e /upload_program
+let sessionId = null;
+
 async function api(path, opts = {}) {
+  if (sessionId) {
+    opts.headers = Object.assign({}, opts.headers, { 'X-Session-Id': sessionId });
+  }
   const res = await fetch(BACKEND + path, opts);
   return res.json();
 }
@@ -46,6 +54,7 @@ async function loadProgram() {
     headers: {'Content-Type': 'application/json'},
     body: JSON.stringify({ asm })
   });
+  if (r.session) sessionId = r.session;
   if (r.status === 'ok') {
     log('Programa carregado.');
     updateState();
@@ -72,6 +81,7 @@ btnUpload.onclick = async () => {
     body: JSON.stringify({ program: text })
   });
 
+  if (r.session) sessionId = r.session;
   if (r.status === "ok") {
     editor.value = text;
     log("Arquivo carregado com sucesso.");
@@ -82,10 +92,45 @@ btnUpload.onclick = async () => {
 };
 
 // ------------------------
-// STEP
+// STEP (com deltas: o backend só devolve o que mudou desde stepVersion)
 // ------------------------
+let stepState = null;
+
+async function stepOnce() {
+  const r = await api('/step', {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ since: stepState ? stepState.version : 0 })
+  });
+  r.snapshot = applyDelta(r.delta);
+  return r;
+}
+
+function applyDelta(d) {
+  if (!d) return null;
+  if (d.full || !stepState) {
+    stepState = { mem: Object.assign({}, d.mem), output: d.output.slice() };
+  } else {
+    Object.assign(stepState.mem, d.mem);
+    stepState.output = stepState.output.concat(d.output);
+  }
+  stepState.version = d.version;
+
+  const stack = [];
+  for (let i = 0; i <= d.sp; i++) stack.push(stepState.mem[i] ?? 0);
+  return {
+    pc: d.pc,
+    next_instr: d.next_instr,
+    stack,
+    mem: stepState.mem,
+    output: stepState.output,
+    halted: d.halted,
+    last_error: d.last_error
+  };
+}
+
 async function step() {
-  const r = await api('/step', { method: 'POST' });
+  const r = await stepOnce();
 
   if (r.status === 'error' &&
       r.message.toLowerCase().includes('rd attempted')) {
@@ -99,7 +144,7 @@ async function step() {
         body: JSON.stringify({ value: val })
       });
 
-      const again = await api('/step', { method: 'POST' });
+      const again = await stepOnce();
       updateFromSnapshot(again.snapshot);
       return;
     }
@@ -109,14 +154,65 @@ async function step() {
 }
 
 // ------------------------
-// RUN
+// ANIMAR (passos em lote: cada /step traz vários passos + trace compacto)
 // ------------------------
-async function run() {
+let animating = false;
+
+async function animate() {
+  animating = !animating;
+  while (animating) {
+    const r = await api('/step', {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ count: 20, since: stepState ? stepState.version : 0 })
+    });
+    const snap = applyDelta(r.delta);
+
+    for (const [pc, op] of (r.trace || [])) {
+      if (!animating) break;
+      pcEl.textContent = pc;
+      nextEl.textContent = op;
+      await new Promise(res => setTimeout(res, 50));
+    }
+
+    updateFromSnapshot(snap);
+    if (r.status !== 'ok') animating = false;
+  }
+}
+
+// ------------------------
+// RUN (assíncrono: /run devolve um job, acompanhado por polling)
+// ------------------------
+let currentJob = null;
+
+async function runJob() {
   const r = await api('/run', {
     method: 'POST',
     headers: {'Content-Type': 'application/json'},
-    body: JSON.stringify({ limit: 1000000 })
+    body: JSON.stringify({ limit: 1000000, async: true })
   });
+  if (r.status !== 'started') return r;
+
+  currentJob = r.job;
+  let since = 0;
+  let output = [];
+  while (true) {
+    await new Promise(res => setTimeout(res, 200));
+    const p = await api(`/jobs/${r.job}?since=${since}`);
+    since = p.output_len;
+    output = output.concat(p.output);
+    outView.textContent = JSON.stringify(output, null, 2);
+    pcEl.textContent = p.pc;
+    document.getElementById("status").textContent = `running (${p.steps} passos)`;
+    if (p.status !== 'running') {
+      currentJob = null;
+      return p;
+    }
+  }
+}
+
+async function run() {
+  const r = await runJob();
 
   if (r.status === 'error' &&
       r.message.toLowerCase().includes('rd attempted')) {
@@ -130,20 +226,22 @@ async function run() {
         body: JSON.stringify({ value: val })
       });
 
-      const again = await api('/run', {
-        method: 'POST',
-        headers: {'Content-Type': 'application/json'},
-        body: JSON.stringify({ limit: 1000000 })
-      });
-
+      const again = await runJob();
       updateFromSnapshot(again.snapshot);
       return;
     }
   }
 
+  if (r.status === 'cancelled' || r.status === 'timeout') log(r.message);
+  if (r.status === 'breakpoint' || r.status === 'watchpoint') log(`Parou em ${r.status} (pc ${r.pc})`);
   updateFromSnapshot(r.snapshot);
 }
 
+async function stop() {
+  animating = false;
+  if (currentJob) await api(`/jobs/${currentJob}/cancel`, { method: 'POST' });
+}
+
 // ------------------------
 async function reset() {
   const r = await api('/reset', { method: 'POST' });
@@ -172,6 +270,8 @@ btnLoad.addEventListener('click', loadProgram);
 btnStep.addEventListener('click', step);
 btnRun.addEventListener('click', run);
 btnReset.addEventListener('click', reset);
+btnStop.addEventListener('click', stop);
+btnAnimate.addEventListener('click', animate);
 
 btnLoadExample.addEventListener('click', () => {
   const k = exampleSelect.value;